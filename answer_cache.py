@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# File: answer_cache.py
+# 问答结果缓存：线程安全的LRU缓存，以及用于图谱重建后使缓存失效的版本戳
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+cur_dir = '/'.join(os.path.abspath(__file__).split('/')[:-1])
+# 图谱版本戳文件，每次重建图谱后更新
+GRAPH_VERSION_PATH = os.path.join(cur_dir, 'cache/graph_version')
+# 库中记录对外服务版本的单例节点（版本指针），各主机的版本戳文件是它的本地副本；
+# GraphPointer不属于图谱标签，不随命名空间改写
+POINTER_QUERY = "MATCH (v:GraphPointer {key: 'active'}) RETURN v.stamp AS stamp, v.namespace AS namespace"
+SET_POINTER_QUERY = "MERGE (v:GraphPointer {key: 'active'}) SET v.stamp = $stamp, v.namespace = $namespace"
+# 问答进程读取库中版本指针的最短间隔（秒）
+POINTER_INTERVAL = 5.0
+
+# 缓存未命中标记，区别于缓存中存放的None/空串
+MISSING = object()
+
+
+class LRUCache:
+    """线程安全的LRU缓存，支持容量上限与过期时间"""
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        with self.lock:
+            item = self.data.get(key)
+            if item is not None:
+                expire_at, value = item
+                if expire_at is None or expire_at > time.monotonic():
+                    self.data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """写入缓存，ttl为本条的过期时间（秒），默认取缓存的ttl"""
+        ttl = ttl or self.ttl
+        expire_at = time.monotonic() + ttl if ttl else None
+        with self.lock:
+            self.data[key] = (expire_at, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+def graph_version(path=GRAPH_VERSION_PATH):
+    """读取图谱版本戳，未构建过时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # 版本戳文件每次整体替换，inode与修改时间共同标识一个版本
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def bump_graph_version(path=GRAPH_VERSION_PATH, namespace=None, stamp=None):
+    """图谱重建完成后更新版本戳，使各问答进程的缓存失效
+
+    版本戳同时记录当前对外服务的图谱命名空间（见graph_namespace），namespace为None时沿用原值；
+    切换命名空间与缓存失效由同一次文件替换完成，问答进程不会以新图谱的数据命中旧缓存。
+    stamp为库中版本指针的时间戳，同步指针时传入，默认取当前时间。
+    """
+    if namespace is None:
+        namespace = active_namespace(path)
+    version_dir = os.path.dirname(path)
+    if version_dir:
+        os.makedirs(version_dir, exist_ok=True)
+    # 同一进程的多个线程可能同时同步版本指针，临时文件按线程区分
+    tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    with open(tmp_path, 'w') as f:
+        f.write('%d\n%s\n' % (stamp or time.time_ns(), namespace))
+    os.replace(tmp_path, path)
+    return graph_version(path)
+
+
+# 各版本戳文件最近读取的(版本, (时间戳, 命名空间))，版本戳未变化时不重复读文件
+_active = {}
+
+
+def read_graph_version(path=GRAPH_VERSION_PATH):
+    """版本戳文件记录的(时间戳, 命名空间)，未记录时为(None, '')"""
+    version = graph_version(path)
+    if version is None:
+        return None, ''
+    cached_version, recorded = _active.get(path, (None, (None, '')))
+    if version == cached_version:
+        return recorded
+    try:
+        with open(path) as f:
+            lines = f.read().split('\n')
+    except OSError:
+        return None, ''
+    stamp = int(lines[0]) if lines[0].strip().isdigit() else None
+    recorded = (stamp, lines[1].strip() if len(lines) > 1 else '')
+    _active[path] = (version, recorded)
+    return recorded
+
+
+def active_namespace(path=GRAPH_VERSION_PATH):
+    """当前对外服务的图谱命名空间，未记录时为空串（不带后缀的标签）"""
+    return read_graph_version(path)[1]
+
+
+def sync_graph_version(pointer, path=GRAPH_VERSION_PATH):
+    """把库中的版本指针（POINTER_QUERY的结果行）同步到本机版本戳，指针变化时返回True
+
+    其他主机切换版本或重建图谱后，本机的问答进程据此改查新版本并清空缓存；库中没有指针时沿用本机记录。
+    """
+    if not pointer or (pointer['stamp'], pointer['namespace']) == read_graph_version(path):
+        return False
+    bump_graph_version(path, pointer['namespace'], pointer['stamp'])
+    return True
+
+
+class PointerCheck:
+    """限制读取库中版本指针的频率，每interval秒最多一次"""
+    def __init__(self, interval=POINTER_INTERVAL):
+        self.interval = interval
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def due(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.checked_at is not None and now - self.checked_at < self.interval:
+                return False
+            self.checked_at = now
+            return True
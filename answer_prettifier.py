@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# File: answer_prettifier.py
+# 回复模板：与检索后端无关，不依赖图数据库驱动
+
+'''回复模板：将查询结果行组装为回复文本，各类答案检索器共用'''
+class AnswerPrettifier:
+    num_limit = 20
+
+    '''按出现顺序去重并截取前num_limit个，列表值（服务端聚合结果）会被展开'''
+    def distinct(self, values, exclude=None):
+        desc = []
+        seen = set()
+        for value in values:
+            for item in (value if isinstance(value, list) else [value]):
+                if item in seen or item == exclude:
+                    continue
+                seen.add(item)
+                desc.append(item)
+                if len(desc) >= self.num_limit:
+                    return desc
+        return desc
+
+    '''根据对应的qustion_type，调用相应的回复模板'''
+    def answer_prettify(self, question_type, answers):
+        final_answer = []
+        if not answers:
+            return ''
+        if question_type == 'disease_symptom':
+            desc = self.distinct(i['n.name'] for i in answers)
+            subject = answers[0]['m.name']
+            final_answer = '{0}的症状包括：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'symptom_disease':
+            desc = self.distinct(i['m.name'] for i in answers)
+            subject = answers[0]['n.name']
+            final_answer = '症状{0}可能染上的疾病有：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'disease_cause':
+            desc = self.distinct(i['m.cause'] for i in answers)
+            subject = answers[0]['m.name']
+            final_answer = '{0}可能的成因有：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'disease_prevent':
+            desc = self.distinct(i['m.prevent'] for i in answers)
+            subject = answers[0]['m.name']
+            final_answer = '{0}的预防措施包括：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'disease_lasttime':
+            desc = self.distinct(i['m.cure_lasttime'] for i in answers)
+            subject = answers[0]['m.name']
+            final_answer = '{0}治疗可能持续的周期为：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'disease_cureway':
+            desc = self.distinct(';'.join(i['m.cure_way']) for i in answers)
+            subject = answers[0]['m.name']
+            final_answer = '{0}可以尝试如下治疗：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'disease_cureprob':
+            desc = self.distinct(i['m.cured_prob'] for i in answers)
+            subject = answers[0]['m.name']
+            final_answer = '{0}治愈的概率为（仅供参考）：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'disease_easyget':
+            desc = self.distinct(i['m.easy_get'] for i in answers)
+            subject = answers[0]['m.name']
+
+            final_answer = '{0}的易感人群包括：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'disease_desc':
+            desc = self.distinct(i['m.desc'] for i in answers)
+            subject = answers[0]['m.name']
+            final_answer = '{0},熟悉一下：{1}'.format(subject,  '；'.join(desc))
+
+        elif question_type == 'disease_acompany':
+            desc1 = [i['n.name'] for i in answers]
+            desc2 = [i['m.name'] for i in answers]
+            subject = answers[0]['m.name']
+            desc = self.distinct(desc1 + desc2, exclude=subject)
+            final_answer = '{0}的症状包括：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'disease_not_food':
+            desc = self.distinct(i['n.name'] for i in answers)
+            subject = answers[0]['m.name']
+            final_answer = '{0}忌食的食物包括有：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'disease_do_food':
+            do_desc = self.distinct(i['n.name'] for i in answers if i['r.name'] == '宜吃')
+            recommand_desc = self.distinct(i['n.name'] for i in answers if i['r.name'] == '推荐食谱')
+            subject = answers[0]['m.name']
+            final_answer = '{0}宜食的食物包括有：{1}\n推荐食谱包括有：{2}'.format(subject, ';'.join(do_desc), ';'.join(recommand_desc))
+
+        elif question_type == 'food_not_disease':
+            desc = self.distinct(i['m.name'] for i in answers)
+            subject = answers[0]['n.name']
+            final_answer = '患有{0}的人最好不要吃{1}'.format('；'.join(desc), subject)
+
+        elif question_type == 'food_do_disease':
+            desc = self.distinct(i['m.name'] for i in answers)
+            subject = answers[0]['n.name']
+            final_answer = '患有{0}的人建议多试试{1}'.format('；'.join(desc), subject)
+
+        elif question_type == 'disease_drug':
+            desc = self.distinct(i['n.name'] for i in answers)
+            subject = answers[0]['m.name']
+            final_answer = '{0}通常的使用的药品包括：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'drug_disease':
+            desc = self.distinct(i['m.name'] for i in answers)
+            subject = answers[0]['n.name']
+            final_answer = '{0}主治的疾病有{1},可以试试'.format(subject, '；'.join(desc))
+
+        elif question_type == 'disease_check':
+            desc = self.distinct(i['n.name'] for i in answers)
+            subject = answers[0]['m.name']
+            final_answer = '{0}通常可以通过以下方式检查出来：{1}'.format(subject, '；'.join(desc))
+
+        elif question_type == 'check_disease':
+            desc = self.distinct(i['m.name'] for i in answers)
+            subject = answers[0]['n.name']
+            final_answer = '通常可以通过{0}检查出来的疾病有{1}'.format(subject, '；'.join(desc))
+
+        return final_answer
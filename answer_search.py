@@ -4,15 +4,24 @@
 # Author: lhy<lhy_in_blcu@126.com,https://huangyong.github.io>
 # Date: 18-10-5
 
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from py2neo import Graph
-
-class AnswerSearcher:
-    def __init__(self):
+from neo4j import GraphDatabase, Query, READ_ACCESS
+from question_parser import CYPHER_QUERIES, build_combined_query
+from answer_cache import active_namespace, sync_graph_version, PointerCheck, POINTER_QUERY
+from graph_namespace import namespaced
+# 回复模板独立成模块，此处保留导入供原有调用方使用
+from answer_prettifier import AnswerPrettifier
+
+class AnswerSearcher(AnswerPrettifier):
+    def __init__(self, combined=False, pool_size=4):
         # 新版本py2neo的连接方式
+        self.uri = "bolt://127.0.0.1:7687"  # Neo4j bolt协议地址
+        self.auth = ("neo4j", "password")  # 正确的用户名和密码
         try:
-            self.g = Graph(
-                "bolt://127.0.0.1:7687",  # Neo4j bolt协议地址
-                auth=("neo4j", "password"))  # 正确的用户名和密码
+            self.g = Graph(self.uri, auth=self.auth)
             print("✅ Neo4j数据库连接成功！")
         except Exception as e:
             print(f"❌ Neo4j数据库连接失败: {e}")
@@ -22,122 +31,143 @@ class AnswerSearcher:
             print("3. 或者修改代码中的用户名和密码")
             raise e
         self.num_limit = 20
+        # 合并模式：一个问句的全部问题类型合并为一条查询，一次往返
+        self.combined = combined
+        # 查询线程池：同一问句的多条查询并发执行，所有调用方共享，并发查询数不超过pool_size；
+        # 每个工作线程持有独立的Graph连接
+        self.pool_size = pool_size
+        self.local = threading.local()
+        self.executor = None
+        # 带时间预算的查询改用neo4j官方驱动：py2neo不支持设置事务超时
+        self.driver = None
+        self.driver_lock = threading.Lock()
+        # 定期读取库中的版本指针，跟随其他主机发起的版本切换
+        self.pointer_check = PointerCheck()
+        if pool_size > 1:
+            self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='answer-search')
+
+    '''当前线程使用的图谱连接，查询线程池中的每个线程各自建立一个'''
+    def graph(self):
+        if self.executor is None:
+            return self.g
+        g = getattr(self.local, 'g', None)
+        if g is None:
+            g = self.local.g = Graph(self.uri, auth=self.auth)
+        return g
+
+    '''带事务超时查询所用的驱动，首次使用时创建，连接池由各线程共享'''
+    def timeout_driver(self):
+        if self.driver is None:
+            with self.driver_lock:
+                if self.driver is None:
+                    self.driver = GraphDatabase.driver(self.uri, auth=self.auth, max_connection_pool_size=max(self.pool_size, 1))
+        return self.driver
+
+    '''把库中的版本指针同步到本机版本戳，每POINTER_INTERVAL秒最多读取一次；读取失败时沿用本机记录'''
+    def sync_graph_version(self):
+        if not self.pointer_check.due():
+            return False
+        try:
+            rows = self.graph().run(POINTER_QUERY).data()
+        except Exception as e:
+            print(f"⚠️ 读取图谱版本指针失败，沿用本机记录: {e}")
+            return False
+        return sync_graph_version(rows[0] if rows else None)
+
+    '''关闭查询线程池及驱动'''
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.driver is not None:
+            self.driver.close()
+            self.driver = None
+
+    '''执行一个问题类型的全部查询，返回结果行
+
+    给出deadline（time.monotonic()时刻）时，剩余时间作为事务超时传给服务端，
+    超时的查询由服务端终止，不再占用数据库。查询对象为当前对外服务的图谱命名空间。
+    '''
+    def run_queries(self, queries, deadline=None):
+        answers = []
+        namespace = active_namespace()
+        for query, params in queries:
+            query = namespaced(query, namespace)
+            params = dict(params, limit=self.num_limit)
+            if deadline is None:
+                answers += self.graph().run(query, params).data()
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError('question deadline exceeded')
+            with self.timeout_driver().session(default_access_mode=READ_ACCESS) as session:
+                answers += session.run(Query(query, timeout=remaining), params).data()
+        return answers
+
+    '''在截止时间前执行查询，超过截止时间（含被服务端超时终止）或查询出错时返回None，不影响其余问题类型'''
+    def run_before(self, queries, deadline):
+        try:
+            return self.run_queries(queries, deadline)
+        except Exception as e:
+            if time.monotonic() < deadline:
+                # 截止前出错并非超时，单独记录
+                print(f"❌ 查询失败: {e!r}")
+            return None
+
+    '''查询一个问题类型下一批实体的结果行，每个主体的结果行中以主体名称为首列'''
+    def query_rows(self, question_type, entities):
+        return self.run_queries([(CYPHER_QUERIES[question_type], {'names': list(entities)})])
 
     '''执行cypher查询，并返回相应结果'''
     def search_main(self, sqls):
-        final_answers = []
-        for sql_ in sqls:
-            question_type = sql_['question_type']
-            queries = sql_['sql']
-            answers = []
-            for query in queries:
-                ress = self.g.run(query).data()
-                answers += ress
-            final_answer = self.answer_prettify(question_type, answers)
-            if final_answer:
-                final_answers.append(final_answer)
-        return final_answers
-
-    '''根据对应的qustion_type，调用相应的回复模板'''
-    def answer_prettify(self, question_type, answers):
-        final_answer = []
-        if not answers:
-            return ''
-        if question_type == 'disease_symptom':
-            desc = [i['n.name'] for i in answers]
-            subject = answers[0]['m.name']
-            final_answer = '{0}的症状包括：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'symptom_disease':
-            desc = [i['m.name'] for i in answers]
-            subject = answers[0]['n.name']
-            final_answer = '症状{0}可能染上的疾病有：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'disease_cause':
-            desc = [i['m.cause'] for i in answers]
-            subject = answers[0]['m.name']
-            final_answer = '{0}可能的成因有：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'disease_prevent':
-            desc = [i['m.prevent'] for i in answers]
-            subject = answers[0]['m.name']
-            final_answer = '{0}的预防措施包括：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'disease_lasttime':
-            desc = [i['m.cure_lasttime'] for i in answers]
-            subject = answers[0]['m.name']
-            final_answer = '{0}治疗可能持续的周期为：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'disease_cureway':
-            desc = [';'.join(i['m.cure_way']) for i in answers]
-            subject = answers[0]['m.name']
-            final_answer = '{0}可以尝试如下治疗：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'disease_cureprob':
-            desc = [i['m.cured_prob'] for i in answers]
-            subject = answers[0]['m.name']
-            final_answer = '{0}治愈的概率为（仅供参考）：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'disease_easyget':
-            desc = [i['m.easy_get'] for i in answers]
-            subject = answers[0]['m.name']
-
-            final_answer = '{0}的易感人群包括：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'disease_desc':
-            desc = [i['m.desc'] for i in answers]
-            subject = answers[0]['m.name']
-            final_answer = '{0},熟悉一下：{1}'.format(subject,  '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'disease_acompany':
-            desc1 = [i['n.name'] for i in answers]
-            desc2 = [i['m.name'] for i in answers]
-            subject = answers[0]['m.name']
-            desc = [i for i in desc1 + desc2 if i != subject]
-            final_answer = '{0}的症状包括：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'disease_not_food':
-            desc = [i['n.name'] for i in answers]
-            subject = answers[0]['m.name']
-            final_answer = '{0}忌食的食物包括有：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'disease_do_food':
-            do_desc = [i['n.name'] for i in answers if i['r.name'] == '宜吃']
-            recommand_desc = [i['n.name'] for i in answers if i['r.name'] == '推荐食谱']
-            subject = answers[0]['m.name']
-            final_answer = '{0}宜食的食物包括有：{1}\n推荐食谱包括有：{2}'.format(subject, ';'.join(list(set(do_desc))[:self.num_limit]), ';'.join(list(set(recommand_desc))[:self.num_limit]))
-
-        elif question_type == 'food_not_disease':
-            desc = [i['m.name'] for i in answers]
-            subject = answers[0]['n.name']
-            final_answer = '患有{0}的人最好不要吃{1}'.format('；'.join(list(set(desc))[:self.num_limit]), subject)
-
-        elif question_type == 'food_do_disease':
-            desc = [i['m.name'] for i in answers]
-            subject = answers[0]['n.name']
-            final_answer = '患有{0}的人建议多试试{1}'.format('；'.join(list(set(desc))[:self.num_limit]), subject)
-
-        elif question_type == 'disease_drug':
-            desc = [i['n.name'] for i in answers]
-            subject = answers[0]['m.name']
-            final_answer = '{0}通常的使用的药品包括：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'drug_disease':
-            desc = [i['m.name'] for i in answers]
-            subject = answers[0]['n.name']
-            final_answer = '{0}主治的疾病有{1},可以试试'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'disease_check':
-            desc = [i['n.name'] for i in answers]
-            subject = answers[0]['m.name']
-            final_answer = '{0}通常可以通过以下方式检查出来：{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        elif question_type == 'check_disease':
-            desc = [i['m.name'] for i in answers]
-            subject = answers[0]['n.name']
-            final_answer = '通常可以通过{0}检查出来的疾病有{1}'.format(subject, '；'.join(list(set(desc))[:self.num_limit]))
-
-        return final_answer
+        return [final_answer for final_answer in self.search_answers(sqls) if final_answer]
+
+    '''执行查询，按sqls顺序返回每个问题类型的回复，无结果时为空串
+
+    timeout为整个问句的时间预算（秒），预算内未完成或查询出错的问题类型被放弃，对应位置为None。
+    '''
+    def search_answers(self, sqls, timeout=None):
+        if timeout is not None:
+            return self.search_with_deadline(sqls, time.monotonic() + timeout)
+        if self.combined and len(sqls) > 1:
+            return self.search_combined(sqls)
+        if self.executor is None:
+            results = [self.run_queries(sql_['sql']) for sql_ in sqls]
+        else:
+            # 各问题类型的查询互不依赖，并发执行，总耗时取决于最慢的一条
+            futures = [self.executor.submit(self.run_queries, sql_['sql']) for sql_ in sqls]
+            results = [future.result() for future in futures]
+        return [self.answer_prettify(sql_['question_type'], answers) for sql_, answers in zip(sqls, results)]
+
+    '''限时查询：各问题类型分别查询（不合并，以便返回部分结果），截止时间前完成的照常返回回复'''
+    def search_with_deadline(self, sqls, deadline):
+        if self.executor is None:
+            results = [self.run_before(sql_['sql'], deadline) for sql_ in sqls]
+        else:
+            futures = [self.executor.submit(self.run_before, sql_['sql'], deadline) for sql_ in sqls]
+            done, _ = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+            results = []
+            for future in futures:
+                if future in done:
+                    results.append(future.result())
+                else:
+                    # 尚未开始的直接取消，已在执行的由服务端事务超时终止
+                    future.cancel()
+                    results.append(None)
+        return [None if answers is None else self.answer_prettify(sql_['question_type'], answers)
+                for sql_, answers in zip(sqls, results)]
+
+    '''合并查询：一次往返取回全部问题类型的结果，再按question_type标签拆分'''
+    def search_combined(self, sqls):
+        queries = [build_combined_query(sqls)]
+        if self.executor is None:
+            rows = self.run_queries(queries)
+        else:
+            rows = self.executor.submit(self.run_queries, queries).result()
+        answers = {sql_['question_type']: [] for sql_ in sqls}
+        for res in rows:
+            answers[res['question_type']].append(res['row'])
+        return [self.answer_prettify(sql_['question_type'], answers[sql_['question_type']]) for sql_ in sqls]
 
 
 if __name__ == '__main__':
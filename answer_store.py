@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# File: answer_store.py
+# 预计算答案库：离线枚举全部(实体, 问题类型)的回复写入SQLite，问答时按键直接查表
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from urllib.parse import quote
+import medical_lexicon
+import lexicon_snapshot
+from answer_cache import MISSING, graph_version
+from question_parser import QUESTION_ENTITY_TYPES, CYPHER_TEMPLATES
+
+cur_dir = '/'.join(os.path.abspath(__file__).split('/')[:-1])
+STORE_PATH = os.path.join(cur_dir, 'cache/answers.sqlite')
+# 答案库格式版本，结构或回复模板变化时递增，旧库自动失效
+STORE_VERSION = 2
+
+
+def new_searcher(backend):
+    """创建答案检索器：neo4j为图数据库，memory为内存图谱"""
+    if backend == 'memory':
+        from graph_engine import LocalAnswerSearcher
+        return LocalAnswerSearcher()
+    from answer_search import AnswerSearcher
+    return AnswerSearcher(pool_size=1)
+
+
+def version_stamp(backend):
+    """答案库版本戳：记录生成时的图谱版本，内存图谱另记录medical.json签名"""
+    stamp = {
+        'store_version': STORE_VERSION,
+        'backend': backend,
+        'graph_version': graph_version(),
+        'created_at': time.time(),
+    }
+    if backend == 'memory':
+        from graph_engine import DATA_PATH
+        stamp['data_path'] = DATA_PATH
+        stamp['signatures'] = lexicon_snapshot.source_signatures([DATA_PATH])
+    return stamp
+
+
+def is_current(stamp):
+    """判断版本戳与当前图谱是否一致"""
+    if not stamp or stamp.get('store_version') != STORE_VERSION:
+        return False
+    graph_version_now = graph_version()
+    if stamp.get('graph_version') != (list(graph_version_now) if graph_version_now else None):
+        return False
+    if stamp.get('backend') == 'memory':
+        return lexicon_snapshot.is_fresh(stamp.get('signatures', {}), [stamp.get('data_path', '')])
+    return True
+
+
+def file_version(path):
+    """文件的(inode, 修改时间)，文件被替换或修改后即变化，不存在时为None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def render_answers(searcher, question_type, entities):
+    """查询一批实体在该问题类型下的结果行，按主体分组后生成回复，无结果的实体回复为空串"""
+    # 模板的首列即主体名称
+    subject = CYPHER_TEMPLATES[question_type][1][0][0]
+    grouped = {entity: [] for entity in entities}
+    for row in searcher.query_rows(question_type, entities):
+        grouped.setdefault(row[subject], []).append(row)
+    return [(entity, question_type, searcher.answer_prettify(question_type, rows) or '') for entity, rows in grouped.items()]
+
+
+# 进程池中各子进程使用的检索器
+_pool_searcher = None
+_pool_backend = None
+
+
+def _pool_start_method():
+    # fork可让子进程直接继承父进程中已加载的内存图谱
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return 'fork'
+    return None
+
+
+def _init_worker(backend):
+    # spawn启动的子进程不继承父进程的模块全局变量，后端由初始化函数传入
+    global _pool_backend
+    _pool_backend = backend
+
+
+def _render_in_worker(task):
+    global _pool_searcher
+    if _pool_searcher is None:
+        _pool_searcher = new_searcher(_pool_backend)
+    question_type, entities = task
+    return render_answers(_pool_searcher, question_type, entities)
+
+
+def build_tasks(chunksize=500):
+    """枚举全部问题类型×适用实体，按chunksize个实体一组切分"""
+    words = {type_: medical_lexicon.load_words(path) for type_, path in medical_lexicon.ENTITY_DICTS.items()}
+    tasks = []
+    for question_type, entity_type in QUESTION_ENTITY_TYPES.items():
+        entities = list(dict.fromkeys(words[entity_type]))
+        for start in range(0, len(entities), chunksize):
+            tasks.append((question_type, entities[start:start + chunksize]))
+    return tasks
+
+
+def write_answers(conn, tasks, backend, processes=None, start_time=None):
+    """渲染全部任务并写入answers表，返回写入的答案数"""
+    global _pool_searcher, _pool_backend
+    start_time = start_time or time.time()
+    processes = processes or os.cpu_count() or 1
+    _pool_backend = backend
+    if backend == 'memory':
+        # 内存图谱在父进程加载一次，fork出的子进程共享；数据库连接则由各子进程自行建立
+        _pool_searcher = new_searcher(backend)
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.get_context(_pool_start_method()).Pool(processes, initializer=_init_worker, initargs=(backend,))
+        results = pool.imap_unordered(_render_in_worker, tasks)
+    else:
+        results = map(_render_in_worker, tasks)
+    count = 0
+    try:
+        for done, answers in enumerate(results, 1):
+            conn.executemany('INSERT OR REPLACE INTO answers VALUES (?, ?, ?)', answers)
+            count += len(answers)
+            elapsed = time.time() - start_time
+            print('answer store: %d/%d chunks, %d answers, %.1f answers/sec' % (done, len(tasks), count, count / elapsed if elapsed else 0.0), file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        _pool_searcher = None
+    return count
+
+
+def build_store(path=STORE_PATH, backend='neo4j', processes=None, chunksize=500):
+    """离线生成答案库：先写临时文件，完成后原子替换，服务进程不会读到半成品"""
+    start_time = time.time()
+    # 版本戳在查询前取得，生成期间图谱若被重建，答案库随即判为过期
+    stamp = version_stamp(backend)
+    tasks = build_tasks(chunksize)
+    store_dir = os.path.dirname(path)
+    if store_dir:
+        os.makedirs(store_dir, exist_ok=True)
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute('CREATE TABLE answers (entity TEXT, question_type TEXT, answer TEXT, PRIMARY KEY (entity, question_type)) WITHOUT ROWID')
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        stamp['count'] = write_answers(conn, tasks, backend, processes, start_time)
+        conn.execute('INSERT INTO meta VALUES (?, ?)', ('stamp', json.dumps(stamp)))
+        conn.commit()
+    except BaseException:
+        # 生成失败时不留下半成品临时文件
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+    os.replace(tmp_path, path)
+    return stamp
+
+
+class AnswerStore:
+    """答案库读取端：按(问题类型, 实体)查表，答案库缺失或过期时全部视为未命中
+
+    每次查询检查答案库文件（内存图谱后端另检查medical.json）的(inode, 修改时间)，
+    答案库重新生成或数据变化后自动重新读取版本戳。
+    """
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        # 每个线程各自持有只读连接，答案库被替换后按generation重新打开
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stamp = None
+        self.current = False
+        self.watched = None
+        self.refresh()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.generation != self.generation:
+            if conn is not None:
+                conn.close()
+            conn = self.local.conn = sqlite3.connect('file:%s?mode=ro' % quote(self.path), uri=True)
+            self.local.generation = self.generation
+        return conn
+
+    '''答案库文件及其依赖的数据文件的版本'''
+    def file_versions(self, stamp):
+        data_path = stamp.get('data_path') if stamp and stamp.get('backend') == 'memory' else None
+        return file_version(self.path), file_version(data_path) if data_path else None
+
+    '''重新读取版本戳，图谱重建或答案库重新生成后调用'''
+    def refresh(self):
+        with self.lock:
+            # 先取文件版本再读取，读取期间文件若被替换，下次查询会再次刷新
+            store_version = file_version(self.path)
+            self.generation += 1
+            stamp = None
+            try:
+                row = self.connection().execute("SELECT value FROM meta WHERE key = 'stamp'").fetchone()
+                stamp = json.loads(row[0]) if row else None
+            except sqlite3.Error:
+                pass
+            self.watched = (store_version, self.file_versions(stamp)[1])
+            self.stamp = stamp
+            self.current = is_current(stamp)
+            if stamp is not None and not self.current:
+                print('答案库已过期，全部问题改为实时查询: %s' % self.path)
+            return self.current
+
+    '''查询一个问题类型的回复：仅单个实体的查询可直接命中，未命中时返回MISSING'''
+    def get(self, question_type, entities):
+        if self.file_versions(self.stamp) != self.watched:
+            self.refresh()
+        if not self.current or len(entities) != 1:
+            return MISSING
+        try:
+            row = self.connection().execute('SELECT answer FROM answers WHERE entity = ? AND question_type = ?',
+                                            (entities[0], question_type)).fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return row[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'current': self.current,
+            'count': (self.stamp or {}).get('count', 0),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+def main(argv=None):
+    """命令行入口：图谱重建后离线生成答案库"""
+    parser = argparse.ArgumentParser(description='预计算全部(实体, 问题类型)的回复')
+    parser.add_argument('--backend', choices=['neo4j', 'memory'], default='neo4j', help='生成答案所用的图谱后端')
+    parser.add_argument('--processes', type=int, default=None, help='进程数，默认为CPU核数')
+    parser.add_argument('--chunksize', type=int, default=500, help='每个任务包含的实体数')
+    parser.add_argument('--output', default=STORE_PATH, help='答案库路径')
+    args = parser.parse_args(argv)
+    stamp = build_store(args.output, args.backend, args.processes, args.chunksize)
+    print('答案库已写入: %s，共%d条' % (args.output, stamp['count']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# File: async_answer_search.py
+# 异步答案检索：基于neo4j官方驱动的asyncio接口，供asyncio网关直接await
+
+import asyncio
+from neo4j import AsyncGraphDatabase, Query, READ_ACCESS
+from answer_prettifier import AnswerPrettifier
+from question_parser import build_combined_query
+from answer_cache import active_namespace, sync_graph_version, PointerCheck, POINTER_QUERY
+from graph_namespace import namespaced
+
+class AsyncAnswerSearcher(AnswerPrettifier):
+    def __init__(self, combined=True, max_connections=10,
+                 uri="bolt://127.0.0.1:7687", auth=("neo4j", "password")):
+        # 驱动内部维护连接池，所有在途问句共享max_connections个连接，
+        # 连接用尽时后来的查询排队等待而不是新建连接
+        self.driver = AsyncGraphDatabase.driver(uri, auth=auth, max_connection_pool_size=max_connections)
+        self.num_limit = 20
+        # 合并模式：一个问句的全部问题类型合并为一条查询，一次往返
+        self.combined = combined
+        # 定期读取库中的版本指针，跟随其他主机发起的版本切换
+        self.pointer_check = PointerCheck()
+
+    '''sync_graph_version的异步版本'''
+    async def sync_graph_version(self):
+        if not self.pointer_check.due():
+            return False
+        try:
+            async with self.driver.session(default_access_mode=READ_ACCESS) as session:
+                result = await session.run(POINTER_QUERY)
+                rows = await result.data()
+        except Exception as e:
+            print(f"⚠️ 读取图谱版本指针失败，沿用本机记录: {e}")
+            return False
+        return sync_graph_version(rows[0] if rows else None)
+
+    '''关闭驱动及其连接池'''
+    async def close(self):
+        await self.driver.close()
+
+    '''执行一个问题类型的全部查询，timeout为这组查询共用的时间预算（秒）；查询对象为当前对外服务的图谱命名空间
+
+    每条查询的服务端事务超时取截止时刻前的剩余时间，预算用尽时不再发出后续查询。
+    '''
+    async def run_queries(self, queries, timeout=None):
+        answers = []
+        namespace = active_namespace()
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        async with self.driver.session(default_access_mode=READ_ACCESS) as session:
+            for query, params in queries:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - loop.time()
+                    # 驱动把0视为不限时，剩余时间用尽时直接放弃
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                result = await session.run(Query(namespaced(query, namespace), timeout=remaining), dict(params, limit=self.num_limit))
+                answers += await result.data()
+        return answers
+
+    '''执行cypher查询，并返回相应结果'''
+    async def search_main(self, sqls, timeout=None):
+        return [final_answer for final_answer in await self.search_answers(sqls, timeout) if final_answer]
+
+    '''执行查询，按sqls顺序返回每个问题类型的回复，无结果时为空串
+
+    timeout为整个问句的时间预算（秒），同时作为事务超时传给服务端，避免被放弃的查询继续占用数据库；
+    预算内未完成或查询出错的问题类型对应位置为None，不影响其余问题类型的回复。
+    '''
+    async def search_answers(self, sqls, timeout=None):
+        if timeout is None:
+            return await self.gather_answers(sqls)
+        # 限时查询时各问题类型分别执行（不合并），以便返回已完成的部分
+        tasks = [asyncio.ensure_future(self.run_queries(sql_['sql'], timeout)) for sql_ in sqls]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=timeout)
+        finally:
+            # 超时或调用方取消时，未完成的查询一并取消
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        return [self.task_answer(sql_['question_type'], task) if task in done else None
+                for sql_, task in zip(sqls, tasks)]
+
+    '''取已完成任务的回复，查询出错时为None'''
+    def task_answer(self, question_type, task):
+        error = task.exception()
+        if error is not None:
+            print(f"❌ 问题类型 {question_type} 查询失败: {error!r}")
+            return None
+        return self.answer_prettify(question_type, task.result())
+
+    async def gather_answers(self, sqls):
+        if self.combined and len(sqls) > 1:
+            rows = await self.run_queries([build_combined_query(sqls)])
+            answers = {sql_['question_type']: [] for sql_ in sqls}
+            for res in rows:
+                answers[res['question_type']].append(res['row'])
+            results = [answers[sql_['question_type']] for sql_ in sqls]
+        else:
+            results = await asyncio.gather(*[self.run_queries(sql_['sql']) for sql_ in sqls])
+        return [self.answer_prettify(sql_['question_type'], answers) for sql_, answers in zip(sqls, results)]
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# File: bench_import.py
+# 图谱导入的离线基准：用进程内的替身Graph执行完整的建点/建边流程，统计各导入策略的语句数、行数、字节数与往返次数
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+from build_medicalgraph import MedicalGraph, NODE_LABELS, DISEASE_INFOS, DISEASE_PROPERTIES, RELATIONS
+
+# 默认对比的策略：(名称, batch_size, workers)；batch_size为None即改造前的写法（见run_legacy），
+# 为1时仍是分批导入的UNWIND语句，只是每批一行
+STRATEGIES = [
+    ('legacy-per-node', None, 1),
+    ('unwind-1', 1, 1),
+    ('batch-100', 100, 1),
+    ('batch-1000', 1000, 1),
+    ('batch-5000', 5000, 1),
+    ('batch-1000-workers-4', 1000, 4),
+]
+# 与基线比较时允许的增幅
+TOLERANCE = 0.1
+
+
+class DryRunCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def data(self):
+        return self.rows
+
+    def evaluate(self):
+        return None
+
+
+class DryRunTransaction:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def run(self, query, parameters=None, **kwparameters):
+        return self.graph.execute(query, dict(parameters or {}, **kwparameters), False)
+
+
+class DryRunGraph:
+    """替身Graph：实现导入用到的run/create/begin/commit/rollback，只计数不执行
+
+    往返次数按Bolt的流水线方式估计：自动提交的语句与显式事务中的每条语句各一次（RUN与PULL同发），
+    BEGIN随事务的第一条语句发出，COMMIT/ROLLBACK各一次。字节数为语句文本与JSON编码的参数之和，
+    近似请求体大小。多个线程可共用同一实例。
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statements = 0
+        self.rows = 0
+        self.bytes = 0
+        self.transactions = 0
+        self.round_trips = 0
+
+    def execute(self, query, params, autocommit):
+        size = len(query.encode('utf-8')) + len(json.dumps(params, ensure_ascii=False, default=str).encode('utf-8'))
+        with self.lock:
+            self.statements += 1
+            self.rows += len(params.get('rows', ()))
+            self.bytes += size
+            self.round_trips += 1
+            if autocommit:
+                self.transactions += 1
+        return DryRunCursor([])
+
+    def run(self, query, parameters=None, **kwparameters):
+        return self.execute(query, dict(parameters or {}, **kwparameters), True)
+
+    '''py2neo的Graph.create：开启显式事务，以一条语句创建节点后提交'''
+    def create(self, subgraph):
+        query = 'UNWIND $data AS r CREATE (_:%s) SET _ = r RETURN id(_)' % ':'.join(sorted(subgraph.labels))
+        self.execute(query, {'rows': [dict(subgraph)]}, False)
+        self.commit(None)
+
+    def begin(self, readonly=False):
+        return DryRunTransaction(self)
+
+    def commit(self, tx):
+        with self.lock:
+            self.transactions += 1
+            self.round_trips += 1
+
+    def rollback(self, tx):
+        with self.lock:
+            self.round_trips += 1
+
+    def stats(self):
+        return {
+            'statements': self.statements,
+            'transactions': self.transactions,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'round_trips': self.round_trips,
+        }
+
+
+class DryRunMedicalGraph(MedicalGraph):
+    """写入替身Graph的导入流程，并行建边的各线程共用同一个替身"""
+    def __init__(self, graph, batch_size=1000, workers=1):
+        MedicalGraph.__init__(self, connect=False, batch_size=batch_size, node_cache=False, workers=workers)
+        self.g = graph
+        # 替身不记录命名空间，统一使用不带后缀的标签
+        self.namespace = ''
+
+    def graph(self):
+        return self.g
+
+
+def write_synthetic_data(path, diseases=2000, seed=0):
+    """生成字段与medical.json相同的合成数据，供没有真实数据的环境（如CI）运行基准"""
+    rng = random.Random(seed)
+    pools = {
+        'symptom': ['症状%d' % i for i in range(diseases)],
+        'drug': ['药品%d' % i for i in range(diseases // 2)],
+        'food': ['食物%d' % i for i in range(diseases // 2)],
+        'check': ['检查%d' % i for i in range(diseases // 3)],
+        'department': ['科室%d' % i for i in range(50)],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(diseases):
+            drugs = rng.sample(pools['drug'], 8)
+            record = {
+                'name': '疾病%d' % i,
+                'desc': '疾病%d的简介' % i,
+                'prevent': '预防措施',
+                'cause': '病因',
+                'easy_get': '易感人群',
+                'cure_way': ['药物治疗', '手术治疗'],
+                'cure_lasttime': '1-2周',
+                'cured_prob': '85%',
+                'symptom': rng.sample(pools['symptom'], 5),
+                'acompany': ['疾病%d' % rng.randrange(diseases)],
+                'cure_department': rng.sample(pools['department'], 2),
+                'common_drug': drugs[:3],
+                'recommand_drug': drugs[3:],
+                'not_eat': rng.sample(pools['food'], 3),
+                'do_eat': rng.sample(pools['food'], 3),
+                'recommand_eat': rng.sample(pools['food'], 5),
+                'check': rng.sample(pools['check'], 4),
+                'drug_detail': ['厂商%d%s(%s)' % (rng.randrange(20), drug, drug) for drug in drugs],
+            }
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return path
+
+
+class LegacyNode(dict):
+    """改造前写法所用的py2neo Node：一个标签及其属性"""
+    def __init__(self, label, **properties):
+        dict.__init__(self, properties)
+        self.labels = {label}
+
+
+def run_legacy(graph, nodes):
+    """改造前的导入写法：每个节点一次Graph.create，每条边一条名称直接拼入语句的自动提交查询"""
+    for disease_dict in nodes[DISEASE_INFOS]:
+        graph.create(LegacyNode('Disease', **{key: disease_dict[key] for key in DISEASE_PROPERTIES}))
+    for label, index in NODE_LABELS.items():
+        for node_name in nodes[index]:
+            graph.create(LegacyNode(label, name=node_name))
+    for start_node, rel_type, end_node, rel_name, index in RELATIONS:
+        for p, q in nodes[index]:
+            graph.run("match(p:%s),(q:%s) where p.name='%s'and q.name='%s' create (p)-[rel:%s{name:'%s'}]->(q)" % (
+                start_node, end_node, p, q, rel_type, rel_name))
+    # 边的名称拼入语句，没有参数行，每条语句写入一行
+    graph.rows += sum(len(nodes[index]) for _, _, _, _, index in RELATIONS)
+
+
+def run_strategy(nodes, batch_size, workers):
+    """按一种策略执行完整的建点、建边流程，返回替身的计数与耗时"""
+    graph = DryRunGraph()
+    start_time = time.time()
+    if batch_size is None:
+        run_legacy(graph, nodes)
+    else:
+        handler = DryRunMedicalGraph(graph, batch_size, workers)
+        handler.nodes = nodes
+        handler.nodes_source = handler.data_path
+        # 导入流程逐批输出吞吐量，基准只关心汇总
+        with contextlib.redirect_stdout(io.StringIO()):
+            handler.create_graphnodes()
+            handler.create_graphrels()
+    result = graph.stats()
+    result['seconds'] = time.time() - start_time
+    return result
+
+
+def run_benchmark(data_path, strategies=STRATEGIES, rtt=1.0):
+    """解析一次数据，依次执行各策略；rtt为假设的往返延迟（毫秒），用于估计网络等待时间"""
+    handler = MedicalGraph(connect=False, node_cache=False)
+    handler.data_path = data_path
+    start_time = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        nodes = handler.read_nodes()
+    report = {
+        'data': data_path,
+        'parse_seconds': time.time() - start_time,
+        'nodes': sum(len(nodes[index]) for index in NODE_LABELS.values()) + len(nodes[DISEASE_INFOS]),
+        'relationships': sum(len(nodes[index]) for _, _, _, _, index in RELATIONS),
+        'rtt_ms': rtt,
+        'strategies': {},
+    }
+    for name, batch_size, workers in strategies:
+        result = run_strategy(nodes, batch_size, workers)
+        # 并行时各线程的往返相互重叠
+        result['est_network_seconds'] = result['round_trips'] * rtt / 1000.0 / workers
+        report['strategies'][name] = result
+    return report
+
+
+def print_report(report):
+    print('data: %s' % report['data'])
+    print('parse: %.2fs, %d nodes, %d relationships' % (report['parse_seconds'], report['nodes'], report['relationships']))
+    print('%-22s %10s %10s %10s %10s %12s %10s %12s' % (
+        'strategy', 'statements', 'txs', 'rows', 'MB', 'round_trips', 'client_s', 'est_net_s'))
+    for name, result in report['strategies'].items():
+        print('%-22s %10d %10d %10d %10.1f %12d %10.2f %12.1f' % (
+            name, result['statements'], result['transactions'], result['rows'], result['bytes'] / 1e6,
+            result['round_trips'], result['seconds'], result['est_network_seconds']))
+    print('est_net_s assumes %.1fms per round trip' % report['rtt_ms'])
+
+
+def compare_baseline(report, baseline, tolerance=TOLERANCE):
+    """与基线报告比较语句数、往返次数与字节数，返回超出容差的项"""
+    regressions = []
+    for name, result in report['strategies'].items():
+        base = baseline.get('strategies', {}).get(name)
+        if base is None:
+            continue
+        for key in ('statements', 'round_trips', 'bytes'):
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append('%s %s: %d -> %d' % (name, key, base[key], result[key]))
+    return regressions
+
+
+def main(argv=None):
+    """命令行入口：无需Neo4j，可在CI中运行；给出基线时计数超出容差即返回非零"""
+    parser = argparse.ArgumentParser(description='不连接数据库，统计各导入策略的语句数与往返次数')
+    parser.add_argument('--data', help='medical.json路径，默认为data/medical.json')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='改用N个疾病的合成数据')
+    parser.add_argument('--rtt', type=float, default=1.0, help='估计网络等待时间所用的往返延迟（毫秒）')
+    parser.add_argument('--output', help='将报告以JSON写入该文件，可作为之后运行的基线')
+    parser.add_argument('--baseline', help='基线报告，语句数、往返次数或字节数增幅超过10%%时返回1')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.synthetic:
+            data_path = write_synthetic_data(os.path.join(tmp_dir, 'medical.json'), args.synthetic)
+        else:
+            data_path = args.data or MedicalGraph(connect=False).data_path
+            if not os.path.exists(data_path):
+                print('数据文件%s不存在，可用--synthetic N生成合成数据' % data_path)
+                return 1
+        report = run_benchmark(data_path, rtt=args.rtt)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_baseline(report, json.load(f))
+        for regression in regressions:
+            print('regression: %s' % regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,19 +5,132 @@
 # Date: 18-10-3
 
 import os
+import sys
+import csv
 import json
-from py2neo import Graph,Node
+import hashlib
+import time
+import zlib
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from py2neo import Graph
+except ImportError:
+    # 仅读取数据（如内存图谱引擎、本地兜底）时不需要py2neo
+    Graph = None
+import lexicon_snapshot
+from answer_cache import bump_graph_version, active_namespace, sync_graph_version, POINTER_QUERY, SET_POINTER_QUERY
+from graph_namespace import GRAPH_LABELS, label_name, namespace_of
+from build_progress import Checkpoint, ProgressReporter
+
+# 疾病节点的属性
+DISEASE_PROPERTIES = ['name', 'desc', 'prevent', 'cause', 'easy_get', 'cure_lasttime', 'cure_department', 'cure_way', 'cured_prob']
+# 列表类型的疾病属性
+DISEASE_LIST_PROPERTIES = ['cure_department', 'cure_way']
+
+# 实体节点在read_nodes返回值中的序号，疾病节点由疾病信息（序号7）单独生成
+NODE_LABELS = {
+    'Drug': 0,
+    'Food': 1,
+    'Check': 2,
+    'Department': 3,
+    'Producer': 4,
+    'Symptom': 5,
+}
+DISEASE_INFOS = 7
+# 疾病内容哈希{名称: sha1}在read_nodes返回值中的序号，同名疾病的多条记录合并计算
+DISEASE_HASHES = 19
+# 节点缓存的键，read_nodes返回值的结构变化时修改，旧缓存自动失效
+NODE_CACHE_KEY = 'medical_nodes_v2'
+
+# 关系定义：(起点标签, 关系类型, 终点标签, 关系名称, read_nodes返回值中的序号)
+RELATIONS = [
+    ('Disease', 'recommand_eat', 'Food', '推荐食谱', 9),
+    ('Disease', 'no_eat', 'Food', '忌吃', 10),
+    ('Disease', 'do_eat', 'Food', '宜吃', 11),
+    ('Department', 'belongs_to', 'Department', '属于', 12),
+    ('Disease', 'common_drug', 'Drug', '常用药品', 13),
+    ('Producer', 'drugs_of', 'Drug', '生产药品', 14),
+    ('Disease', 'recommand_drug', 'Drug', '好评药品', 15),
+    ('Disease', 'need_check', 'Check', '诊断检查', 8),
+    ('Disease', 'has_symptom', 'Symptom', '症状', 16),
+    ('Disease', 'acompany_with', 'Disease', '并发症', 17),
+    ('Disease', 'belongs_to', 'Department', '所属科室', 18),
+]
+
+# neo4j-admin导入时数组属性的元素分隔符，选用不会出现在文本中的控制字符
+CSV_ARRAY_DELIMITER = '\x1f'
+# 可重试的错误：并发事务死锁等瞬时错误，回滚后重新执行即可成功
+TRANSIENT_ERRORS = ('DeadlockDetected', 'TransientError')
+# 建边耗时测试所用的临时图谱版本，测试结束后删除
+BENCHMARK_NAMESPACE = 'bench'
+
+
+def is_transient(error):
+    """判断数据库错误是否可重试，py2neo的错误码形如Neo.TransientError.Transaction.DeadlockDetected"""
+    text = '%s %s %s' % (type(error).__name__, getattr(error, 'code', '') or '', error)
+    return any(marker in text for marker in TRANSIENT_ERRORS)
+
+
+def csv_array(value):
+    """数组属性写入CSV：列表按分隔符拼接，原始数据中为单个字符串时作为单元素数组"""
+    if isinstance(value, (list, tuple)):
+        return CSV_ARRAY_DELIMITER.join(value)
+    return value
+
+
+def partition(name, buckets):
+    """按名称把节点散列到buckets个桶，跨进程稳定，断点中的批次编号因此可复用"""
+    return zlib.crc32(name.encode('utf-8')) % buckets
 
 class MedicalGraph:
-    def __init__(self):
+    def __init__(self, connect=True, batch_size=1000, node_cache=True, workers=1):
         cur_dir = '/'.join(os.path.abspath(__file__).split('/')[:-1])
         self.data_path = os.path.join(cur_dir, 'data/medical.json')
+        # read_nodes的解析结果，一次构建内各步骤共用；node_cache为True时另存为二进制缓存
+        self.nodes = None
+        self.nodes_source = None
+        self.node_cache = node_cache
+        # 批量导入时每个事务提交的行数
+        self.batch_size = batch_size
+        # 各批量导入步骤的耗时统计：(名称, 行数, 秒)
+        self.import_stats = []
+        # 导入失败的行：{'step': 步骤, 'row': 行, 'reason': 原因}
+        self.failures = []
+        # 整批写入失败的批次：(步骤, 批次编号)；与端点不存在的行分开记录，有失败批次时导入不完整
+        self.failed_batches = []
+        self.failures_path = os.path.join(cur_dir, 'cache/import_failures.jsonl')
+        # 最近一次导入的数据快照，增量更新据此比对
+        self.snapshot_path = os.path.join(cur_dir, 'cache/graph_snapshot.pkl')
+        self.delta_report_path = os.path.join(cur_dir, 'cache/delta_report.json')
+        # 完整导入的断点与进度，由build()设置
+        self.checkpoint_path = os.path.join(cur_dir, 'cache/build_checkpoint.json')
+        self.checkpoint = None
+        self.progress = None
+        # 并行建边的线程数，各线程持有独立连接；失败列表、断点与进度由lock保护
+        self.workers = workers
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        # 死锁等瞬时错误的重试次数与退避基数（秒），retried为实际重试次数
+        self.retries = 5
+        self.retry_backoff = 0.1
+        self.retried = 0
+        # 写入的图谱命名空间，默认为当前对外服务的版本；蓝绿重建时为新版本
+        self.namespace = active_namespace()
+        self.uri = "bolt://127.0.0.1:7687"  # Neo4j bolt协议地址
+        self.auth = ("neo4j", "password")  # 正确的用户名和密码
+        # 仅读取数据（如内存图谱引擎）时无需连接数据库
+        if not connect:
+            self.g = None
+            return
+        if Graph is None:
+            raise ImportError('连接Neo4j需要安装py2neo')
         # 新版本py2neo的连接方式
         try:
             # 尝试连接Neo4j数据库
-            self.g = Graph(
-                "bolt://127.0.0.1:7687",  # Neo4j bolt协议地址
-                auth=("neo4j", "password"))  # 正确的用户名和密码
+            self.g = Graph(self.uri, auth=self.auth)
             print("✅ Neo4j数据库连接成功！")
         except Exception as e:
             print(f"❌ Neo4j数据库连接失败: {e}")
@@ -26,226 +139,599 @@ class MedicalGraph:
             print("2. 默认用户名: neo4j, 密码: password")
             print("3. 或者修改代码中的用户名和密码")
             raise e
+        self.namespace = self.active_namespace()
 
-    '''读取文件'''
+    '''读取文件：同一实例只解析一次，并可缓存到medical.json旁的二进制文件
+
+    返回(7类节点集合, 疾病信息, 11类关系, 疾病内容哈希)，关系为解析时即已去重的(起点, 终点)元组列表。
+    '''
     def read_nodes(self):
+        if self.nodes is not None and self.nodes_source == self.data_path:
+            return self.nodes
+        cache_path = os.path.splitext(self.data_path)[0] + '.nodes.pkl'
+        nodes = None
+        if self.node_cache:
+            nodes = lexicon_snapshot.load_snapshot(cache_path, [self.data_path], NODE_CACHE_KEY)
+        if nodes is None:
+            nodes = self.parse_nodes()
+            if self.node_cache:
+                try:
+                    lexicon_snapshot.save_snapshot(cache_path, [self.data_path], nodes, NODE_CACHE_KEY)
+                except OSError as e:
+                    print(f"节点缓存写入失败: {e}")
+        self.nodes = nodes
+        self.nodes_source = self.data_path
+        return nodes
+
+    '''单遍解析medical.json'''
+    def parse_nodes(self):
+        start_time = time.time()
+        intern = sys.intern
         # 共７类节点
-        drugs = [] # 药品
-        foods = [] #　食物
-        checks = [] # 检查
-        departments = [] #科室
-        producers = [] #药品大类
-        diseases = [] #疾病
-        symptoms = []#症状
+        drugs = set() # 药品
+        foods = set() #　食物
+        checks = set() # 检查
+        departments = set() #科室
+        producers = set() #药品大类
+        diseases = set() #疾病
+        symptoms = set()#症状
 
         disease_infos = []#疾病信息
-
-        # 构建节点实体关系
-        rels_department = [] #　科室－科室关系
-        rels_noteat = [] # 疾病－忌吃食物关系
-        rels_doeat = [] # 疾病－宜吃食物关系
-        rels_recommandeat = [] # 疾病－推荐吃食物关系
-        rels_commonddrug = [] # 疾病－通用药品关系
-        rels_recommanddrug = [] # 疾病－热门药品关系
-        rels_check = [] # 疾病－检查关系
-        rels_drug_producer = [] # 厂商－药物关系
-
-        rels_symptom = [] #疾病症状关系
-        rels_acompany = [] # 疾病并发关系
-        rels_category = [] #　疾病与科室之间的关系
-
-
-        count = 0
-        for data in open(self.data_path):
-            disease_dict = {}
-            count += 1
-            print(count)
-            data_json = json.loads(data)
-            disease = data_json['name']
-            disease_dict['name'] = disease
-            diseases.append(disease)
-            disease_dict['desc'] = ''
-            disease_dict['prevent'] = ''
-            disease_dict['cause'] = ''
-            disease_dict['easy_get'] = ''
-            disease_dict['cure_department'] = ''
-            disease_dict['cure_way'] = ''
-            disease_dict['cure_lasttime'] = ''
-            disease_dict['symptom'] = ''
-            disease_dict['cured_prob'] = ''
-
-            if 'symptom' in data_json:
-                symptoms += data_json['symptom']
-                for symptom in data_json['symptom']:
-                    rels_symptom.append([disease, symptom])
-
-            if 'acompany' in data_json:
-                for acompany in data_json['acompany']:
-                    rels_acompany.append([disease, acompany])
-
-            if 'desc' in data_json:
-                disease_dict['desc'] = data_json['desc']
-
-            if 'prevent' in data_json:
-                disease_dict['prevent'] = data_json['prevent']
-
-            if 'cause' in data_json:
-                disease_dict['cause'] = data_json['cause']
-
-            if 'get_prob' in data_json:
-                disease_dict['get_prob'] = data_json['get_prob']
-
-            if 'easy_get' in data_json:
-                disease_dict['easy_get'] = data_json['easy_get']
-
-            if 'cure_department' in data_json:
-                cure_department = data_json['cure_department']
-                if len(cure_department) == 1:
-                     rels_category.append([disease, cure_department[0]])
-                if len(cure_department) == 2:
-                    big = cure_department[0]
-                    small = cure_department[1]
-                    rels_department.append([small, big])
-                    rels_category.append([disease, small])
-
-                disease_dict['cure_department'] = cure_department
-                departments += cure_department
-
-            if 'cure_way' in data_json:
-                disease_dict['cure_way'] = data_json['cure_way']
-
-            if  'cure_lasttime' in data_json:
-                disease_dict['cure_lasttime'] = data_json['cure_lasttime']
-
-            if 'cured_prob' in data_json:
-                disease_dict['cured_prob'] = data_json['cured_prob']
-
-            if 'common_drug' in data_json:
-                common_drug = data_json['common_drug']
-                for drug in common_drug:
-                    rels_commonddrug.append([disease, drug])
-                drugs += common_drug
-
-            if 'recommand_drug' in data_json:
-                recommand_drug = data_json['recommand_drug']
-                drugs += recommand_drug
-                for drug in recommand_drug:
-                    rels_recommanddrug.append([disease, drug])
-
-            if 'not_eat' in data_json:
-                not_eat = data_json['not_eat']
-                for _not in not_eat:
-                    rels_noteat.append([disease, _not])
-
-                foods += not_eat
-                do_eat = data_json['do_eat']
-                for _do in do_eat:
-                    rels_doeat.append([disease, _do])
-
-                foods += do_eat
-                recommand_eat = data_json['recommand_eat']
-
-                for _recommand in recommand_eat:
-                    rels_recommandeat.append([disease, _recommand])
-                foods += recommand_eat
-
-            if 'check' in data_json:
-                check = data_json['check']
-                for _check in check:
-                    rels_check.append([disease, _check])
-                checks += check
-            if 'drug_detail' in data_json:
-                drug_detail = data_json['drug_detail']
-                producer = [i.split('(')[0] for i in drug_detail]
-                rels_drug_producer += [[i.split('(')[0], i.split('(')[-1].replace(')', '')] for i in drug_detail]
-                producers += producer
-            disease_infos.append(disease_dict)
-        return set(drugs), set(foods), set(checks), set(departments), set(producers), set(symptoms), set(diseases), disease_infos,\
-               rels_check, rels_recommandeat, rels_noteat, rels_doeat, rels_department, rels_commonddrug, rels_drug_producer, rels_recommanddrug,\
-               rels_symptom, rels_acompany, rels_category
-
-    '''建立节点'''
+        disease_hashes = {} # 疾病内容哈希
+
+        # 构建节点实体关系，以dict作有序集合，解析时即去重
+        rels_department = {} #　科室－科室关系
+        rels_noteat = {} # 疾病－忌吃食物关系
+        rels_doeat = {} # 疾病－宜吃食物关系
+        rels_recommandeat = {} # 疾病－推荐吃食物关系
+        rels_commonddrug = {} # 疾病－通用药品关系
+        rels_recommanddrug = {} # 疾病－热门药品关系
+        rels_check = {} # 疾病－检查关系
+        rels_drug_producer = {} # 厂商－药物关系
+
+        rels_symptom = {} #疾病症状关系
+        rels_acompany = {} # 疾病并发关系
+        rels_category = {} #　疾病与科室之间的关系
+
+        with open(self.data_path, encoding='utf-8') as f:
+            for data in f:
+                data_json = json.loads(data)
+                disease = intern(data_json['name'])
+                diseases.add(disease)
+                digest = hashlib.sha1(json.dumps(data_json, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+                if disease in disease_hashes:
+                    digest = hashlib.sha1((disease_hashes[disease] + digest).encode('utf-8')).hexdigest()
+                disease_hashes[disease] = digest
+                disease_dict = {
+                    'name': disease,
+                    'desc': data_json.get('desc', ''),
+                    'prevent': data_json.get('prevent', ''),
+                    'cause': data_json.get('cause', ''),
+                    'easy_get': data_json.get('easy_get', ''),
+                    'cure_department': '',
+                    'cure_way': data_json.get('cure_way', ''),
+                    'cure_lasttime': data_json.get('cure_lasttime', ''),
+                    'symptom': '',
+                    'cured_prob': data_json.get('cured_prob', ''),
+                }
+                if 'get_prob' in data_json:
+                    disease_dict['get_prob'] = data_json['get_prob']
+
+                for symptom in data_json.get('symptom', []):
+                    symptom = intern(symptom)
+                    symptoms.add(symptom)
+                    rels_symptom[(disease, symptom)] = None
+
+                for acompany in data_json.get('acompany', []):
+                    rels_acompany[(disease, intern(acompany))] = None
+
+                if 'cure_department' in data_json:
+                    cure_department = [intern(i) for i in data_json['cure_department']]
+                    if len(cure_department) == 1:
+                        rels_category[(disease, cure_department[0])] = None
+                    if len(cure_department) == 2:
+                        big = cure_department[0]
+                        small = cure_department[1]
+                        rels_department[(small, big)] = None
+                        rels_category[(disease, small)] = None
+                    disease_dict['cure_department'] = cure_department
+                    departments.update(cure_department)
+
+                for drug in data_json.get('common_drug', []):
+                    drug = intern(drug)
+                    drugs.add(drug)
+                    rels_commonddrug[(disease, drug)] = None
+
+                for drug in data_json.get('recommand_drug', []):
+                    drug = intern(drug)
+                    drugs.add(drug)
+                    rels_recommanddrug[(disease, drug)] = None
+
+                if 'not_eat' in data_json:
+                    for rels, key in ((rels_noteat, 'not_eat'), (rels_doeat, 'do_eat'), (rels_recommandeat, 'recommand_eat')):
+                        for food in data_json.get(key, []):
+                            food = intern(food)
+                            foods.add(food)
+                            rels[(disease, food)] = None
+
+                for check in data_json.get('check', []):
+                    check = intern(check)
+                    checks.add(check)
+                    rels_check[(disease, check)] = None
+
+                for detail in data_json.get('drug_detail', []):
+                    producer = intern(detail.split('(')[0])
+                    producers.add(producer)
+                    rels_drug_producer[(producer, intern(detail.split('(')[-1].replace(')', '')))] = None
+                disease_infos.append(disease_dict)
+        print('read %d diseases from %s in %.2fs' % (len(disease_infos), self.data_path, time.time() - start_time))
+        return drugs, foods, checks, departments, producers, symptoms, diseases, disease_infos,\
+               list(rels_check), list(rels_recommandeat), list(rels_noteat), list(rels_doeat), list(rels_department), list(rels_commonddrug), list(rels_drug_producer), list(rels_recommanddrug),\
+               list(rels_symptom), list(rels_acompany), list(rels_category), disease_hashes
+
+    '''分批执行UNWIND $rows语句，每批一个显式事务，返回各批语句返回的结果行（即未能写入的行）
+
+    某批执行出错时回滚该批，批内各行记入失败列表后继续后面的批次。
+    设置了断点时跳过已提交的批次，每批提交后记入断点；设置了进度时按批更新进度。
+    '''
+    def run_batches(self, name, query, rows, params=None):
+        rows = list(rows)
+        start_time = time.time()
+        batches = [(start // self.batch_size, rows[start:start + self.batch_size]) for start in range(0, len(rows), self.batch_size)]
+        results = self.run_batch_list(self.g, name, query, batches, params)
+        self.record_stats(name, len(rows), time.time() - start_time)
+        return results
+
+    '''依次执行(批次编号, 行列表)，失败、断点与进度的记录可由多个线程同时进行'''
+    def run_batch_list(self, graph, name, query, batches, params=None):
+        results = []
+        for index, batch in batches:
+            if self.checkpoint is not None and self.checkpoint.done(name, index):
+                if self.progress is not None:
+                    with self.lock:
+                        self.progress.skip(len(batch))
+                continue
+            try:
+                returned = self.run_batch(graph, query, batch, params)
+            except Exception as e:
+                print('%s: batch %s failed: %s' % (name, index, e))
+                with self.lock:
+                    self.failures += [{'step': name, 'row': row, 'reason': str(e)} for row in batch]
+                    self.failed_batches.append((name, index))
+                    if self.progress is not None:
+                        self.progress.update(len(batch), len(batch), name)
+                continue
+            results += returned
+            with self.lock:
+                if self.checkpoint is not None:
+                    self.checkpoint.commit(name, index)
+                if self.progress is not None:
+                    self.progress.update(len(batch), len(returned), name)
+        return results
+
+    '''在一个显式事务中执行一批，死锁等瞬时错误回滚后按指数退避重试，其余错误直接抛出'''
+    def run_batch(self, graph, query, batch, params=None):
+        attempt = 0
+        while True:
+            tx = graph.begin()
+            try:
+                returned = tx.run(query, dict(params or {}, rows=batch)).data()
+                graph.commit(tx)
+                return returned
+            except Exception as e:
+                graph.rollback(tx)
+                if attempt >= self.retries or not is_transient(e):
+                    raise
+            attempt += 1
+            with self.lock:
+                self.retried += 1
+            # 随机退避，避免互相死锁的事务同时重试再次冲突
+            time.sleep(self.retry_backoff * (2 ** attempt) * random.random())
+
+    '''当前线程使用的图谱连接，并行建边的每个工作线程各自建立一个'''
+    def graph(self):
+        g = getattr(self.local, 'g', None)
+        if g is None:
+            g = self.local.g = Graph(self.uri, auth=self.auth)
+        return g
+
+    '''并行写入一种关系：起点、终点按名称分别散列到workers个桶，每条边落入(起点桶, 终点桶)格
+
+    共workers轮，第r轮并发执行(i, (i + r) % workers)各格：同一轮中各格的起点桶互不相同、终点桶也互不相同，
+    并发事务不会锁住同一节点。格内仍按batch_size分批，批次编号为"起点桶.终点桶.序号"。
+    起点与终点标签相同的关系无法这样划分，由create_relationship改走串行。
+    '''
+    def run_partitioned(self, name, query, rows, params=None):
+        workers = self.workers
+        cells = {}
+        for row in rows:
+            cells.setdefault((partition(row[0], workers), partition(row[1], workers)), []).append(row)
+        start_time = time.time()
+        results = []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='graph-import') as executor:
+            for shift in range(workers):
+                futures = []
+                for start_bucket in range(workers):
+                    cell = (start_bucket, (start_bucket + shift) % workers)
+                    cell_rows = cells.get(cell, [])
+                    batches = [('%d.%d.%d' % (cell[0], cell[1], start // self.batch_size), cell_rows[start:start + self.batch_size])
+                               for start in range(0, len(cell_rows), self.batch_size)]
+                    if batches:
+                        futures.append(executor.submit(self.run_cell, name, query, batches, params))
+                for future in futures:
+                    results += future.result()
+        self.record_stats(name, len(rows), time.time() - start_time)
+        return results
+
+    '''在工作线程中执行一格的各批'''
+    def run_cell(self, name, query, batches, params=None):
+        return self.run_batch_list(self.graph(), name, query, batches, params)
+
+    '''记录一个导入步骤的耗时'''
+    def record_stats(self, name, count, elapsed):
+        self.import_stats.append((name, count, elapsed))
+        print('%s: %d rows in %.2fs, %.0f rows/sec' % (name, count, elapsed, count / elapsed if elapsed else 0.0))
+
+    '''导入吞吐量汇总'''
+    def report_stats(self):
+        total = sum(count for _, count, _ in self.import_stats)
+        seconds = sum(elapsed for _, _, elapsed in self.import_stats)
+        print('total: %d rows in %.2fs, %.0f rows/sec, batch_size=%d, workers=%d, retried=%d' % (
+            total, seconds, total / seconds if seconds else 0.0, self.batch_size, self.workers, self.retried))
+        self.report_failures()
+
+    '''汇总导入失败的行，全部写入failures_path'''
+    def report_failures(self):
+        if not self.failures:
+            return
+        counts = {}
+        for failure in self.failures:
+            counts[failure['step']] = counts.get(failure['step'], 0) + 1
+        for step, count in counts.items():
+            print('%s: %d rows failed' % (step, count))
+        os.makedirs(os.path.dirname(self.failures_path), exist_ok=True)
+        with open(self.failures_path, 'w', encoding='utf-8') as f:
+            for failure in self.failures:
+                f.write(json.dumps(failure, ensure_ascii=False) + '\n')
+        print('failed rows written to %s' % self.failures_path)
+
+    '''为各类节点的name建立约束/索引，供建边时按名称查找节点
+
+    疾病信息未去重，同名疾病会生成多个节点，只能建普通索引；其余节点由集合生成，建唯一约束。
+    '''
+    def create_indexes(self):
+        for label in ['Drug', 'Food', 'Check', 'Department', 'Producer', 'Symptom']:
+            self.g.run('CREATE CONSTRAINT %s_name IF NOT EXISTS FOR (n:%s) REQUIRE n.name IS UNIQUE' % (self.label(label).lower(), self.label(label)))
+        self.g.run('CREATE INDEX %s_name IF NOT EXISTS FOR (n:%s) ON (n.name)' % (self.label('Disease').lower(), self.label('Disease')))
+        # 等待索引填充完成再开始建边
+        self.g.run('CALL db.awaitIndexes(600)')
+
+    '''建立节点：集合的迭代顺序随进程的字符串哈希种子变化，排序后分批，断点中的批次编号跨进程对应相同的行
+
+    名称唯一约束已在导入前建立，MERGE经约束索引查找，断点恢复时重放的批次不会产生重复节点。
+    '''
     def create_node(self, label, nodes):
-        count = 0
-        for node_name in nodes:
-            node = Node(label, name=node_name)
-            self.g.create(node)
-            count += 1
-            print(count, len(nodes))
-        return
+        return self.run_batches(label, 'UNWIND $rows AS name MERGE (n:%s {name: name})' % self.label(label), sorted(nodes))
 
     '''创建知识图谱中心疾病的节点'''
     def create_diseases_nodes(self, disease_infos):
-        count = 0
-        for disease_dict in disease_infos:
-            node = Node("Disease", name=disease_dict['name'], desc=disease_dict['desc'],
-                        prevent=disease_dict['prevent'] ,cause=disease_dict['cause'],
-                        easy_get=disease_dict['easy_get'],cure_lasttime=disease_dict['cure_lasttime'],
-                        cure_department=disease_dict['cure_department']
-                        ,cure_way=disease_dict['cure_way'] , cured_prob=disease_dict['cured_prob'])
-            self.g.create(node)
-            count += 1
-            print(count)
-        return
+        rows = [{key: disease_dict[key] for key in DISEASE_PROPERTIES} for disease_dict in disease_infos]
+        return self.run_batches('Disease', 'UNWIND $rows AS row CREATE (n:%s) SET n = row' % self.label('Disease'), rows)
 
     '''创建知识图谱实体节点类型schema'''
     def create_graphnodes(self):
-        Drugs, Foods, Checks, Departments, Producers, Symptoms, Diseases, disease_infos,rels_check, rels_recommandeat, rels_noteat, rels_doeat, rels_department, rels_commonddrug, rels_drug_producer, rels_recommanddrug,rels_symptom, rels_acompany, rels_category = self.read_nodes()
+        # 唯一约束先于节点写入建立：实体节点经约束索引MERGE，重复导入或重放批次都不会产生重复节点
+        self.create_indexes()
+        Drugs, Foods, Checks, Departments, Producers, Symptoms, Diseases, disease_infos,rels_check, rels_recommandeat, rels_noteat, rels_doeat, rels_department, rels_commonddrug, rels_drug_producer, rels_recommanddrug,rels_symptom, rels_acompany, rels_category, _ = self.read_nodes()
         self.create_diseases_nodes(disease_infos)
         self.create_node('Drug', Drugs)
-        print(len(Drugs))
         self.create_node('Food', Foods)
-        print(len(Foods))
         self.create_node('Check', Checks)
-        print(len(Checks))
         self.create_node('Department', Departments)
-        print(len(Departments))
         self.create_node('Producer', Producers)
-        print(len(Producers))
         self.create_node('Symptom', Symptoms)
+        self.report_stats()
         return
 
 
     '''创建实体关系边'''
     def create_graphrels(self):
-        Drugs, Foods, Checks, Departments, Producers, Symptoms, Diseases, disease_infos, rels_check, rels_recommandeat, rels_noteat, rels_doeat, rels_department, rels_commonddrug, rels_drug_producer, rels_recommanddrug,rels_symptom, rels_acompany, rels_category = self.read_nodes()
-        self.create_relationship('Disease', 'Food', rels_recommandeat, 'recommand_eat', '推荐食谱')
-        self.create_relationship('Disease', 'Food', rels_noteat, 'no_eat', '忌吃')
-        self.create_relationship('Disease', 'Food', rels_doeat, 'do_eat', '宜吃')
-        self.create_relationship('Department', 'Department', rels_department, 'belongs_to', '属于')
-        self.create_relationship('Disease', 'Drug', rels_commonddrug, 'common_drug', '常用药品')
-        self.create_relationship('Producer', 'Drug', rels_drug_producer, 'drugs_of', '生产药品')
-        self.create_relationship('Disease', 'Drug', rels_recommanddrug, 'recommand_drug', '好评药品')
-        self.create_relationship('Disease', 'Check', rels_check, 'need_check', '诊断检查')
-        self.create_relationship('Disease', 'Symptom', rels_symptom, 'has_symptom', '症状')
-        self.create_relationship('Disease', 'Disease', rels_acompany, 'acompany_with', '并发症')
-        self.create_relationship('Disease', 'Department', rels_category, 'belongs_to', '所属科室')
-
-    '''创建实体关联边'''
-    def create_relationship(self, start_node, end_node, edges, rel_type, rel_name):
-        count = 0
-        # 去重处理
-        set_edges = []
-        for edge in edges:
-            set_edges.append('###'.join(edge))
-        all = len(set(set_edges))
-        for edge in set(set_edges):
-            edge = edge.split('###')
-            p = edge[0]
-            q = edge[1]
-            query = "match(p:%s),(q:%s) where p.name='%s'and q.name='%s' create (p)-[rel:%s{name:'%s'}]->(q)" % (
-                start_node, end_node, p, q, rel_type, rel_name)
-            try:
-                self.g.run(query)
-                count += 1
-                print(rel_type, count, all)
-            except Exception as e:
-                print(e)
+        nodes = self.read_nodes()
+        self.create_indexes()
+        for start_node, rel_type, end_node, rel_name, index in RELATIONS:
+            self.create_relationship(start_node, end_node, nodes[index], rel_type, rel_name)
+        self.report_stats()
+
+    '''创建实体关联边：按批UNWIND写入，端点匹配不到的边作为失败记录下来；merge为True时已存在的边不重复创建'''
+    def create_relationship(self, start_node, end_node, edges, rel_type, rel_name, merge=False):
+        # 边在read_nodes解析时已去重
+        rows = [list(edge) for edge in edges]
+        # 名称以参数传入，无需转义；两端均存在时才建边，否则返回该行及缺失的一端
+        query = ("UNWIND $rows AS row "
+                 "OPTIONAL MATCH (p:%s {name: row[0]}) "
+                 "OPTIONAL MATCH (q:%s {name: row[1]}) "
+                 "FOREACH (_ IN CASE WHEN p IS NULL OR q IS NULL THEN [] ELSE [1] END | "
+                 "%s (p)-[:%s {name: $rel_name}]->(q)) "
+                 "WITH row, p, q WHERE p IS NULL OR q IS NULL "
+                 "RETURN DISTINCT row, p IS NULL AS missing_start, q IS NULL AS missing_end") % (
+            self.label(start_node), self.label(end_node), 'MERGE' if merge else 'CREATE', rel_type)
+        name = '%s-%s->%s' % (start_node, rel_type, end_node)
+        # 两端标签相同时同一节点可能同时是起点与终点，无法按桶错开，串行写入
+        runner = self.run_partitioned if self.workers > 1 and start_node != end_node else self.run_batches
+        for res in runner(name, query, rows, {'rel_name': rel_name}):
+            missing = [label for label, flag in ((start_node, res['missing_start']), (end_node, res['missing_end'])) if flag]
+            self.failures.append({'step': name, 'row': res['row'], 'reason': '%s节点不存在' % '/'.join(missing)})
         return
 
+    '''完整导入：节点与关系分批写入，记录断点并限频输出进度
+
+    resume为True时从断点继续，跳过上次已提交的批次；全部完成后删除断点。
+    有批次写入失败时保留断点并返回False，排除故障后以resume重试失败的批次。
+    蓝绿切换后对外服务的是带后缀的命名空间，完整导入不写入该命名空间；目标命名空间中已有节点
+    且没有可恢复的断点时，重新导入会重复创建疾病节点，同样拒绝。拒绝时返回False。
+    '''
+    def build(self, resume=False, report_interval=5.0):
+        if self.namespace and self.namespace == self.active_namespace():
+            print('图谱版本%s正在对外服务，完整导入会改写线上数据；请用--blue-green导入新版本，或用--incremental增量更新' % self.namespace)
+            return False
+        nodes = self.read_nodes()
+        # 并行时批次按桶划分，线程数变化后批次编号不同，也需作废断点
+        fingerprint = {'data': lexicon_snapshot.file_signature(self.data_path)['sha1'], 'batch_size': self.batch_size,
+                       'workers': self.workers, 'namespace': self.namespace}
+        self.checkpoint = Checkpoint(self.checkpoint_path, fingerprint, resume)
+        if not self.checkpoint.steps and self.populated():
+            print('图谱版本%s中已有节点，完整导入会重复创建疾病节点；请用--incremental增量更新，或用--blue-green导入新版本' % (self.namespace or '(default)'))
+            self.checkpoint = None
+            return False
+        total = sum(len(nodes[index]) for index in NODE_LABELS.values()) + len(nodes[DISEASE_INFOS])
+        total += sum(len(nodes[index]) for _, _, _, _, index in RELATIONS)
+        self.progress = ProgressReporter(total, report_interval)
+        try:
+            print("step1:导入图谱节点中")
+            self.create_graphnodes()
+            print("step2:导入图谱边中")
+            self.create_graphrels()
+        finally:
+            self.progress.report('build')
+        if self.failed_batches:
+            print('%d个批次写入失败，导入不完整，断点已保留；排除故障后用--resume重试' % len(self.failed_batches))
+            self.checkpoint = None
+            self.progress = None
+            return False
+        self.save_import_snapshot()
+        self.checkpoint.clear()
+        self.checkpoint = None
+        self.progress = None
+        return True
+
+    '''本地对比串行与并行建边，返回{线程数: 秒}
+
+    在临时命名空间中导入节点，每种模式开始前删除其全部关系后重新写入，结束后删除该命名空间，
+    对外服务的图谱不受影响；该命名空间恰为对外服务的版本时拒绝执行，返回None。
+    '''
+    def benchmark_relationships(self, workers=4):
+        if BENCHMARK_NAMESPACE == self.active_namespace():
+            print('图谱版本%s正在对外服务，建边测试会删除其全部关系，已拒绝' % BENCHMARK_NAMESPACE)
+            return None
+        namespace, self.namespace = self.namespace, BENCHMARK_NAMESPACE
+        try:
+            self.drop_namespace(BENCHMARK_NAMESPACE)
+            self.create_graphnodes()
+            return self.time_relationships(workers)
+        finally:
+            self.drop_namespace(BENCHMARK_NAMESPACE)
+            self.namespace = namespace
+
+    '''在当前命名空间中分别以串行与workers个线程重建全部关系并计时'''
+    def time_relationships(self, workers):
+        nodes = self.read_nodes()
+        total = sum(len(nodes[index]) for _, _, _, _, index in RELATIONS)
+        timings = {}
+        for mode in sorted({1, workers}):
+            for start_node in sorted({start_node for start_node, _, _, _, _ in RELATIONS}):
+                self.g.run('MATCH (:%s)-[r]->() CALL { WITH r DELETE r } IN TRANSACTIONS OF 10000 ROWS' % self.label(start_node))
+            self.workers = mode
+            self.retried = 0
+            start_time = time.time()
+            for start_node, rel_type, end_node, rel_name, index in RELATIONS:
+                self.create_relationship(start_node, end_node, nodes[index], rel_type, rel_name)
+            timings[mode] = time.time() - start_time
+            print('workers=%d: %d rels in %.2fs, %.0f rows/sec, retried=%d' % (
+                mode, total, timings[mode], total / timings[mode] if timings[mode] else 0.0, self.retried))
+        if workers > 1:
+            print('speedup with %d workers: %.2fx' % (workers, timings[1] / timings[workers] if timings[workers] else 0.0))
+        self.report_failures()
+        return timings
+
+    '''当前命名空间中是否已有节点，按标签计数直接读取计数存储，不扫描节点'''
+    def populated(self):
+        for label in GRAPH_LABELS:
+            if self.g.run('MATCH (n:%s) RETURN count(n) AS count' % self.label(label)).evaluate():
+                return True
+        return False
+
+    '''命名空间内的标签名'''
+    def label(self, label):
+        return label_name(label, self.namespace)
+
+    '''库中已有的图谱命名空间，不带后缀的原有标签为空串'''
+    def list_namespaces(self):
+        namespaces = []
+        for row in self.g.run('CALL db.labels() YIELD label RETURN label').data():
+            namespace = namespace_of(row['label'])
+            if namespace is not None:
+                namespaces.append(namespace)
+        return sorted(namespaces)
+
+    '''删除一个命名空间的全部节点、关系及其约束与索引'''
+    def drop_namespace(self, namespace):
+        for label in GRAPH_LABELS:
+            name = label_name(label, namespace)
+            self.g.run('MATCH (n:%s) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS' % name)
+            self.g.run('DROP CONSTRAINT %s_name IF EXISTS' % name.lower())
+        self.g.run('DROP INDEX %s_name IF EXISTS' % label_name('Disease', namespace).lower())
+        print('已删除图谱版本%s' % (namespace or '(default)'))
+
+    '''当前对外服务的图谱命名空间：以库中的版本指针为准并同步到本机版本戳，库中没有指针时取本机记录'''
+    def active_namespace(self):
+        if self.g is not None:
+            rows = self.g.run(POINTER_QUERY).data()
+            sync_graph_version(rows[0] if rows else None)
+        return active_namespace()
+
+    '''发布图谱版本：写入库中的版本指针并更新本机版本戳；其他主机的问答进程在POINTER_INTERVAL秒内同步指针，
+    随即改查该命名空间并清空缓存'''
+    def publish_version(self, namespace):
+        stamp = time.time_ns()
+        self.g.run(SET_POINTER_QUERY, stamp=stamp, namespace=namespace)
+        bump_graph_version(namespace=namespace, stamp=stamp)
+
+    '''切换对外服务的图谱命名空间'''
+    def activate(self, namespace):
+        self.publish_version(namespace)
+        print('图谱版本已切换为%s' % (namespace or '(default)'))
+
+    '''蓝绿重建：导入到以数据哈希命名的新命名空间，期间旧版本照常服务；各类节点数校验通过后原子切换
+
+    切换前的版本保留供回退（--activate），更早的版本被删除。resume为True时继续上次未完成的同一版本，
+    否则先清空该版本的残留数据。返回新版本的命名空间，校验失败时返回None且不切换。
+    '''
+    def build_blue_green(self, resume=False, report_interval=5.0):
+        previous = self.active_namespace()
+        namespace = 'g' + lexicon_snapshot.file_signature(self.data_path)['sha1'][:12]
+        if namespace == previous:
+            print('对外服务的图谱版本%s已由当前数据构建，无需重建' % namespace)
+            return namespace
+        self.namespace = namespace
+        if not resume and namespace in self.list_namespaces():
+            self.drop_namespace(namespace)
+        if not self.build(resume, report_interval):
+            return None
+
+        nodes = self.read_nodes()
+        expected = {label: len(nodes[index]) for label, index in NODE_LABELS.items()}
+        expected['Disease'] = len(nodes[DISEASE_INFOS])
+        mismatched = []
+        for label, count in expected.items():
+            found = self.g.run('MATCH (n:%s) RETURN count(n) AS count' % self.label(label)).data()[0]['count']
+            if found != count:
+                mismatched.append('%s %d/%d' % (label, found, count))
+        if mismatched:
+            print('新版本%s节点数不符（%s），%s继续服务' % (namespace, '，'.join(mismatched), previous or '(default)'))
+            return None
+        self.activate(namespace)
+        for stale in self.list_namespaces():
+            if stale not in (namespace, previous):
+                self.drop_namespace(stale)
+        return namespace
+
+    '''每个疾病的内容哈希，同名疾病的多条记录合并计算；随节点一起解析与缓存'''
+    def disease_hashes(self):
+        return self.read_nodes()[DISEASE_HASHES]
+
+    '''记录本次导入的数据，供下次增量更新比对'''
+    def save_import_snapshot(self):
+        snapshot = {'nodes': self.read_nodes(), 'hashes': self.disease_hashes(), 'data_path': self.data_path, 'namespace': self.namespace}
+        lexicon_snapshot.save_snapshot(self.snapshot_path, [], snapshot, 'graph_import')
+
+    '''比对上次导入的快照与当前medical.json，返回变更集
+
+    疾病按内容哈希判断新增、删除与修改；实体节点与各类关系按集合求差。
+    '''
+    def diff_snapshot(self, snapshot):
+        old_nodes, old_hashes = snapshot['nodes'], snapshot['hashes']
+        new_nodes, new_hashes = self.read_nodes(), self.disease_hashes()
+        changes = {
+            'diseases': {
+                'added': [name for name in new_hashes if name not in old_hashes],
+                'removed': [name for name in old_hashes if name not in new_hashes],
+                'changed': [name for name, digest in new_hashes.items() if name in old_hashes and old_hashes[name] != digest],
+            },
+            'nodes': {},
+            'relations': {},
+        }
+        for label, index in NODE_LABELS.items():
+            changes['nodes'][label] = {
+                'added': sorted(new_nodes[index] - old_nodes[index]),
+                'removed': sorted(old_nodes[index] - new_nodes[index]),
+            }
+        for start_node, rel_type, end_node, rel_name, index in RELATIONS:
+            old_edges, new_edges = set(old_nodes[index]), set(new_nodes[index])
+            changes['relations']['%s-%s->%s' % (start_node, rel_type, end_node)] = {
+                'added': [edge for edge in new_nodes[index] if edge not in old_edges],
+                'removed': [edge for edge in old_nodes[index] if edge not in new_edges],
+            }
+        return changes
+
+    '''按变更集批量更新图谱：先补节点并重建新增、修改的疾病，再删改关系，最后删除多余节点
+
+    同名疾病在完整导入时每条记录各建一个节点，新增、修改的疾病因此先删除该名称的全部节点，
+    再与create_diseases_nodes一样逐条记录创建，并补回这些疾病的全部关系。
+    '''
+    def apply_delta(self, changes):
+        nodes = self.read_nodes()
+        diseases = changes['diseases']
+        for label, diff in changes['nodes'].items():
+            if diff['added']:
+                self.run_batches('+%s' % label, 'UNWIND $rows AS name MERGE (n:%s {name: name})' % self.label(label), diff['added'])
+        upserts = set(diseases['added']) | set(diseases['changed'])
+        if upserts:
+            self.run_batches('~Disease', 'UNWIND $rows AS name MATCH (n:%s {name: name}) DETACH DELETE n' % self.label('Disease'), sorted(upserts))
+            self.create_diseases_nodes([disease_dict for disease_dict in nodes[DISEASE_INFOS] if disease_dict['name'] in upserts])
+        for start_node, rel_type, end_node, rel_name, index in RELATIONS:
+            diff = changes['relations']['%s-%s->%s' % (start_node, rel_type, end_node)]
+            if diff['removed']:
+                query = 'UNWIND $rows AS row MATCH (p:%s {name: row[0]})-[r:%s]->(q:%s {name: row[1]}) DELETE r' % (
+                    self.label(start_node), rel_type, self.label(end_node))
+                self.run_batches('-%s-%s->%s' % (start_node, rel_type, end_node), query, [list(edge) for edge in diff['removed']])
+            added = diff['added']
+            if upserts and 'Disease' in (start_node, end_node):
+                # 重建的疾病节点已随DETACH DELETE失去原有关系，未变化的关系也需补回
+                added_set = set(added)
+                added = added + [edge for edge in nodes[index] if edge not in added_set and
+                                 ((start_node == 'Disease' and edge[0] in upserts) or (end_node == 'Disease' and edge[1] in upserts))]
+            if added:
+                self.create_relationship(start_node, end_node, added, rel_type, rel_name, merge=True)
+        if diseases['removed']:
+            self.run_batches('-Disease', 'UNWIND $rows AS name MATCH (n:%s {name: name}) DETACH DELETE n' % self.label('Disease'), diseases['removed'])
+        for label, diff in changes['nodes'].items():
+            if diff['removed']:
+                self.run_batches('-%s' % label, 'UNWIND $rows AS name MATCH (n:%s {name: name}) DETACH DELETE n' % self.label(label), diff['removed'])
+
+    '''输出变更集摘要，完整变更集写入delta_report_path'''
+    def report_delta(self, changes):
+        for kind, diff in changes['diseases'].items():
+            print('Disease %s: %d %s' % (kind, len(diff), '、'.join(diff[:10])))
+        for group in ('nodes', 'relations'):
+            for name, diff in changes[group].items():
+                if diff['added'] or diff['removed']:
+                    print('%s: +%d -%d' % (name, len(diff['added']), len(diff['removed'])))
+        os.makedirs(os.path.dirname(self.delta_report_path), exist_ok=True)
+        with open(self.delta_report_path, 'w', encoding='utf-8') as f:
+            json.dump(changes, f, ensure_ascii=False, indent=1)
+        print('change set written to %s' % self.delta_report_path)
+
+    '''增量更新：与上次导入的快照比对，只写入变化的部分，图谱保持在线'''
+    def update_graph(self, dry_run=False):
+        snapshot = lexicon_snapshot.load_snapshot(self.snapshot_path, [], 'graph_import')
+        if snapshot is None:
+            print('未找到上次导入的快照%s，请先完整导入一次' % self.snapshot_path)
+            return None
+        if snapshot.get('namespace', '') != self.namespace:
+            print('快照%s对应的图谱版本不是当前版本%s，请先完整导入一次' % (self.snapshot_path, self.namespace or '(default)'))
+            return None
+        changes = self.diff_snapshot(snapshot)
+        self.report_delta(changes)
+        if dry_run:
+            return changes
+        self.apply_delta(changes)
+        self.report_stats()
+        self.save_import_snapshot()
+        return changes
+
     '''导出数据'''
     def export_data(self):
-        Drugs, Foods, Checks, Departments, Producers, Symptoms, Diseases, disease_infos, rels_check, rels_recommandeat, rels_noteat, rels_doeat, rels_department, rels_commonddrug, rels_drug_producer, rels_recommanddrug, rels_symptom, rels_acompany, rels_category = self.read_nodes()
+        Drugs, Foods, Checks, Departments, Producers, Symptoms, Diseases, disease_infos, rels_check, rels_recommandeat, rels_noteat, rels_doeat, rels_department, rels_commonddrug, rels_drug_producer, rels_recommanddrug, rels_symptom, rels_acompany, rels_category, _ = self.read_nodes()
         f_drug = open('drug.txt', 'w+')
         f_food = open('food.txt', 'w+')
         f_check = open('check.txt', 'w+')
@@ -273,11 +759,114 @@ class MedicalGraph:
         return
 
 
+    '''导出neo4j-admin离线导入所需的CSV：每类节点、每种关系各一个带表头的文件
+
+    节点编号为整数，疾病按medical.json中的顺序、其余实体按名称排序编号，同一数据多次导出编号不变；
+    端点不存在的边不写入文件，记入失败列表。返回导入命令。
+    '''
+    def export_csv(self, output_dir):
+        nodes = self.read_nodes()
+        os.makedirs(output_dir, exist_ok=True)
+        start_time = time.time()
+        files = {'nodes': [], 'relationships': []}
+        # 名称 -> 节点编号列表，同名疾病对应多个节点
+        ids = {}
+
+        path = os.path.join(output_dir, 'disease.csv')
+        header = ['id:ID(Disease)'] + ['%s:string[]' % key if key in DISEASE_LIST_PROPERTIES else key for key in DISEASE_PROPERTIES]
+        disease_ids = ids['Disease'] = {}
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for node_id, disease_dict in enumerate(nodes[DISEASE_INFOS]):
+                disease_ids.setdefault(disease_dict['name'], []).append(node_id)
+                writer.writerow([node_id] + [csv_array(disease_dict[key]) if key in DISEASE_LIST_PROPERTIES else disease_dict[key]
+                                             for key in DISEASE_PROPERTIES])
+        files['nodes'].append(('Disease', path))
+
+        for label, index in NODE_LABELS.items():
+            path = os.path.join(output_dir, '%s.csv' % label.lower())
+            label_ids = ids[label] = {}
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['id:ID(%s)' % label, 'name'])
+                for node_id, name in enumerate(sorted(nodes[index])):
+                    label_ids[name] = [node_id]
+                    writer.writerow([node_id, name])
+            files['nodes'].append((label, path))
+
+        for start_node, rel_type, end_node, rel_name, index in RELATIONS:
+            step = '%s-%s->%s' % (start_node, rel_type, end_node)
+            path = os.path.join(output_dir, 'rels_%s_%s_%s.csv' % (start_node.lower(), rel_type, end_node.lower()))
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow([':START_ID(%s)' % start_node, ':END_ID(%s)' % end_node, ':TYPE', 'name'])
+                for p, q in nodes[index]:
+                    start_ids = ids[start_node].get(p)
+                    end_ids = ids[end_node].get(q)
+                    if start_ids is None or end_ids is None:
+                        missing = [label for label, found in ((start_node, start_ids), (end_node, end_ids)) if found is None]
+                        self.failures.append({'step': step, 'row': [p, q], 'reason': '%s节点不存在' % '/'.join(missing)})
+                        continue
+                    for start_id in start_ids:
+                        for end_id in end_ids:
+                            writer.writerow([start_id, end_id, rel_type, rel_name])
+            files['relationships'].append(path)
+
+        command = ['neo4j-admin', 'database', 'import', 'full', '--overwrite-destination', '--id-type=integer',
+                   '--multiline-fields=true', '--array-delimiter=U+%04X' % ord(CSV_ARRAY_DELIMITER)]
+        command += ['--nodes=%s=%s' % (label, path) for label, path in files['nodes']]
+        command += ['--relationships=%s' % path for path in files['relationships']]
+        command.append('neo4j')
+        command = ' '.join(command)
+        with open(os.path.join(output_dir, 'import_command.txt'), 'w', encoding='utf-8') as f:
+            f.write(command + '\n')
+        print('csv exported to %s in %.2fs' % (output_dir, time.time() - start_time))
+        self.report_failures()
+        return command
+
 
 if __name__ == '__main__':
-    handler = MedicalGraph()
-    print("step1:导入图谱节点中")
-    handler.create_graphnodes()
-    print("step2:导入图谱边中")      
-    handler.create_graphrels()
+    arg_parser = argparse.ArgumentParser(description='导入医疗知识图谱')
+    arg_parser.add_argument('--batch-size', type=int, default=1000, help='每个事务提交的行数')
+    arg_parser.add_argument('--export-csv', metavar='DIR', help='不连接数据库，导出neo4j-admin离线导入所需的CSV到DIR')
+    arg_parser.add_argument('--incremental', action='store_true', help='与上次导入比对，只更新变化的疾病、实体与关系')
+    arg_parser.add_argument('--dry-run', action='store_true', help='与--incremental同用，只输出变更集，不写数据库')
+    arg_parser.add_argument('--data', help='medical.json路径，默认为data/medical.json')
+    arg_parser.add_argument('--resume', action='store_true', help='从上次中断处继续完整导入')
+    arg_parser.add_argument('--blue-green', action='store_true', help='导入到新版本命名空间，旧版本继续服务，完成后原子切换')
+    arg_parser.add_argument('--activate', metavar='NAMESPACE', help='切换对外服务的图谱版本，如回退到上一版本；空串为不带后缀的原有标签')
+    arg_parser.add_argument('--workers', type=int, default=1, help='并行建边的线程数，1为串行')
+    arg_parser.add_argument('--benchmark-rels', action='store_true',
+                            help='对比串行与--workers个线程的建边耗时；在临时图谱版本%s中进行，结束后删除' % BENCHMARK_NAMESPACE)
+    args = arg_parser.parse_args()
+    if args.export_csv:
+        handler = MedicalGraph(connect=False)
+        handler.data_path = args.data or handler.data_path
+        print(handler.export_csv(args.export_csv))
+        raise SystemExit(0)
+    handler = MedicalGraph(connect=not (args.incremental and args.dry_run), batch_size=args.batch_size, workers=args.workers)
+    handler.data_path = args.data or handler.data_path
+    if args.benchmark_rels:
+        raise SystemExit(0 if handler.benchmark_relationships(args.workers) is not None else 1)
+    if args.activate is not None:
+        if args.activate not in handler.list_namespaces():
+            print('库中没有图谱版本%s，已有版本: %s' % (args.activate, ', '.join(handler.list_namespaces())))
+            raise SystemExit(1)
+        handler.activate(args.activate)
+        raise SystemExit(0)
+    if args.blue_green:
+        # 切换时已更新版本戳
+        raise SystemExit(0 if handler.build_blue_green(resume=args.resume) is not None else 1)
+    if args.incremental:
+        changes = handler.update_graph(dry_run=args.dry_run)
+        if changes is None:
+            raise SystemExit(1)
+        if not args.dry_run:
+            handler.publish_version(handler.namespace)
+        raise SystemExit(0)
+    if not handler.build(resume=args.resume):
+        raise SystemExit(1)
+    # 更新图谱版本，问答进程据此清空缓存
+    handler.publish_version(handler.namespace)
     
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# File: build_progress.py
+# 图谱导入的断点记录与进度输出：按步骤记录已提交的批次，重启后跳过；进度按时间间隔限频输出
+
+import os
+import json
+import time
+
+
+class Checkpoint:
+    """导入断点：记录每个步骤已提交的批次序号，写入JSON文件
+
+    fingerprint标识数据文件、批大小与并行线程数，任一变化后批次划分不同，旧断点作废。
+    数据库提交成功与断点写入之间若进程退出，重启后该批会再执行一次。
+    """
+    def __init__(self, path, fingerprint, resume=True):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.steps = {}
+        if resume:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('fingerprint') != self.fingerprint:
+            print('断点%s与当前数据或批大小不符，从头开始导入' % self.path)
+            return
+        self.steps = {step: set(batches) for step, batches in data.get('steps', {}).items()}
+        print('从断点%s恢复，已完成%d批' % (self.path, sum(len(batches) for batches in self.steps.values())))
+
+    def save(self):
+        checkpoint_dir = os.path.dirname(self.path)
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint, 'steps': {step: sorted(batches) for step, batches in self.steps.items()}}, f)
+        os.replace(tmp_path, self.path)
+
+    '''该步骤的第batch批是否已提交'''
+    def done(self, step, batch):
+        return batch in self.steps.get(step, ())
+
+    '''记录已提交的批次'''
+    def commit(self, step, batch):
+        self.steps.setdefault(step, set()).add(batch)
+        self.save()
+
+    '''导入全部完成后删除断点'''
+    def clear(self):
+        self.steps = {}
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class ProgressReporter:
+    """导入进度：每隔interval秒最多输出一行，包含已完成行数、速率、预计剩余时间与失败数"""
+    def __init__(self, total, interval=5.0):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        # 本次运行实际写入的行数，断点跳过的行不计入速率
+        self.written = 0
+        self.failures = 0
+        self.start_time = time.time()
+        self.last_report = 0.0
+
+    '''断点中已完成的行'''
+    def skip(self, rows):
+        self.done += rows
+
+    def update(self, rows, failures=0, step=''):
+        self.done += rows
+        self.written += rows
+        self.failures += failures
+        now = time.time()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report(step)
+
+    def report(self, step=''):
+        elapsed = time.time() - self.start_time
+        rate = self.written / elapsed if elapsed else 0.0
+        remaining = self.total - self.done
+        eta = remaining / rate if rate else float('inf')
+        print('[%s] %d/%d rows (%.1f%%), %.0f rows/sec, ETA %s, failures %d' % (
+            step or 'progress', self.done, self.total, 100.0 * self.done / self.total if self.total else 100.0,
+            rate, '%.0fs' % eta if eta != float('inf') else '-', self.failures))
@@ -4,28 +4,264 @@
 # Author: lhy<lhy_in_blcu@126.com,https://huangyong.github.io>
 # Date: 18-10-4
 
+import time
+import threading
 from question_classifier import *
 from question_parser import *
 from answer_search import *
+from answer_cache import LRUCache, MISSING, graph_version
+from circuit_breaker import CLOSED
+
+DEFAULT_ANSWER = '您好，我是小勇医药智能助理，希望可以帮到您。如果没答上来，可联系https://liuhuanyong.github.io/。祝您身体棒棒！'
+# 时间预算内未完成或查询出错的问题类型提示
+DROPPED_MARKER = '（部分查询未能完成，以下内容暂未给出：{0}）'
 
 '''问答类'''
 class ChatBotGraph:
-    def __init__(self):
+    def __init__(self, cache_size=2048, cache_ttl=3600, combined=False, backend='neo4j', answer_store=None, timeout=None,
+                 fallback=False, fallback_ttl=30):
         self.classifier = QuestionClassifier()
         self.parser = QuestionPaser()
-        self.searcher = AnswerSearcher()
+        # 检索后端：neo4j为图数据库查询，memory为由medical.json构建的内存图谱
+        self.backend = backend
+        if backend == 'memory':
+            from graph_engine import LocalAnswerSearcher
+            self.searcher = LocalAnswerSearcher()
+        else:
+            # 默认各问题类型在查询线程池中并发执行，耗时取决于最慢的一条；
+            # combined为True时合并为一条查询、一次往返，适合与数据库之间往返延迟较高的部署
+            self.searcher = AnswerSearcher(combined=combined)
+        # 熔断与本地兜底：图数据库出错或变慢时暂停访问，改由内存图谱应答；
+        # 内存图谱在首次需要兜底时才构建，兜底回复只缓存fallback_ttl秒，恢复后尽快换回图谱结果
+        self.breaker = None
+        self.fallback = None
+        self.fallback_lock = threading.Lock()
+        self.fallback_ttl = fallback_ttl
+        if fallback and backend != 'memory':
+            from circuit_breaker import CircuitBreaker
+            self.breaker = CircuitBreaker(self.probe_graph)
+        # 一级缓存：规范化问句 -> 最终回复
+        self.answer_cache = LRUCache(cache_size, cache_ttl)
+        # 二级缓存：(question_type, 实体) -> 该类型的回复
+        self.query_cache = LRUCache(cache_size * 4, cache_ttl)
+        # 负缓存：未识别出实体的问句
+        self.negative_cache = LRUCache(cache_size, cache_ttl)
+        self.graph_version = graph_version()
+        # 预计算答案库（路径或AnswerStore），命中时不再查询图谱
+        if isinstance(answer_store, str):
+            from answer_store import AnswerStore
+            answer_store = AnswerStore(answer_store)
+        self.answer_store = answer_store
+        # 每个问句的默认时间预算（秒），None为不限时
+        self.timeout = timeout
+        # 异步检索器，供achat_main使用
+        self.asearcher = None
+
+    '''问句规范化，作为缓存键'''
+    def normalize(self, sent):
+        return ' '.join(sent.split())
+
+    '''清空全部缓存'''
+    def invalidate_cache(self):
+        self.answer_cache.clear()
+        self.query_cache.clear()
+        self.negative_cache.clear()
+
+    '''图谱重建后版本戳变化，清空缓存'''
+    def check_graph_version(self):
+        version = graph_version()
+        if version != self.graph_version:
+            self.graph_version = version
+            self.invalidate_cache()
+            if self.answer_store is not None:
+                self.answer_store.refresh()
 
-    def chat_main(self, sent):
-        answer = '您好，我是小勇医药智能助理，希望可以帮到您。如果没答上来，可联系https://liuhuanyong.github.io/。祝您身体棒棒！'
+    '''是否读取库中的版本指针：内存图谱后端无需读取，熔断期间不访问图数据库，沿用本机记录'''
+    def pointer_readable(self):
+        return self.backend != 'memory' and (self.breaker is None or self.breaker.state == CLOSED)
+
+    '''同步库中的版本指针，其他主机切换版本后本进程随之改查新版本并清空缓存'''
+    def sync_graph_version(self):
+        if self.pointer_readable():
+            self.searcher.sync_graph_version()
+
+    '''缓存命中统计'''
+    def cache_stats(self):
+        stats = {
+            'answer': self.answer_cache.stats(),
+            'query': self.query_cache.stats(),
+            'negative': self.negative_cache.stats(),
+        }
+        if self.answer_store is not None:
+            stats['store'] = self.answer_store.stats()
+        if self.breaker is not None:
+            stats['breaker'] = self.breaker.stats()
+        return stats
+
+    '''分类并查缓存：命中时返回(key, 回复, None)，否则返回(key, None, 待查询信息)'''
+    def prepare_answer(self, sent):
+        self.check_graph_version()
+        key = self.normalize(sent)
+        cached = self.answer_cache.get(key)
+        if cached is not MISSING:
+            return key, cached, None
+        if self.negative_cache.get(key) is not MISSING:
+            return key, DEFAULT_ANSWER, None
         res_classify = self.classifier.classify(sent)
         if not res_classify:
-            return answer
+            self.negative_cache.set(key, True)
+            return key, DEFAULT_ANSWER, None
         res_sql = self.parser.parser_main(res_classify)
-        final_answers = self.searcher.search_main(res_sql)
+        query_keys = [(sql_['question_type'], tuple(sql_['entities'])) for sql_ in res_sql]
+        type_answers = [self.query_cache.get(query_key) for query_key in query_keys]
+        if self.answer_store is not None:
+            # 二级缓存未命中时查预计算答案库
+            for index, (question_type, entities) in enumerate(query_keys):
+                if type_answers[index] is MISSING:
+                    type_answers[index] = self.answer_store.get(question_type, entities)
+        # 未命中二级缓存的问题类型一起查询，合并模式下只需一次往返
+        misses = [index for index, final_answer in enumerate(type_answers) if final_answer is MISSING]
+        return key, None, (res_sql, query_keys, type_answers, misses)
+
+    '''写回查询结果并组装最终回复，超时或出错而被放弃的问题类型（None）不缓存，并在回复末尾注明；
+    degraded为True时回复含本地兜底结果，只缓存fallback_ttl秒'''
+    def complete_answer(self, key, pending, searched, degraded=False):
+        res_sql, query_keys, type_answers, misses = pending
+        ttl = self.fallback_ttl if degraded else None
+        dropped = []
+        for index, final_answer in zip(misses, searched):
+            if final_answer is None:
+                dropped.append(res_sql[index]['question_type'])
+                continue
+            type_answers[index] = final_answer
+            self.query_cache.set(query_keys[index], final_answer, ttl)
+        final_answers = [final_answer for final_answer in type_answers if final_answer and final_answer is not MISSING]
         if not final_answers:
-            return answer
+            result = DEFAULT_ANSWER
         else:
-            return '\n'.join(final_answers)
+            result = '\n'.join(final_answers)
+        if dropped:
+            # 部分回复不写入问句缓存，下次重新查询
+            return result + '\n' + DROPPED_MARKER.format('、'.join(QUESTION_TYPE_NAMES[question_type] for question_type in dropped))
+        self.answer_cache.set(key, result, ttl)
+        return result
+
+    '''扣除分类等已用时间后的剩余时间预算'''
+    def remaining(self, timeout, start_time):
+        if timeout is None:
+            return None
+        return max(timeout - (time.monotonic() - start_time), 0.0)
+
+    '''熔断探测：执行一条最简单的查询'''
+    def probe_graph(self):
+        self.searcher.run_queries([('RETURN 1 AS ok', {})])
+
+    '''本地兜底检索器，首次需要兜底时构建'''
+    def fallback_searcher(self):
+        if self.fallback is None:
+            with self.fallback_lock:
+                if self.fallback is None:
+                    from graph_engine import LocalAnswerSearcher
+                    self.fallback = LocalAnswerSearcher()
+        return self.fallback
+
+    '''由本地后端应答；本地后端也无法构建（如缺少medical.json）时记录错误，各问题类型的回复取default'''
+    def local_answers(self, sqls, default=''):
+        try:
+            return self.fallback_searcher().search_answers(sqls)
+        except Exception as e:
+            print(f"❌ 本地后端不可用: {e}")
+            return [default] * len(sqls)
+
+    '''本地后端补上超时或出错而被放弃的问题类型，返回(回复列表, 是否含兜底回复)'''
+    def fill_dropped(self, sqls, searched):
+        dropped = [index for index, final_answer in enumerate(searched) if final_answer is None]
+        if dropped:
+            for index, final_answer in zip(dropped, self.local_answers([sqls[index] for index in dropped], None)):
+                searched[index] = final_answer
+        return searched, bool(dropped)
+
+    '''经熔断器查询：熔断打开或查询出错时由本地后端应答，并记录每次调用的结果与耗时；
+    返回(回复列表, 是否含兜底回复)'''
+    def search_answers(self, sqls, timeout=None):
+        if self.breaker is None:
+            return self.searcher.search_answers(sqls, timeout), False
+        if not self.breaker.allow():
+            return self.local_answers(sqls), True
+        start_time = time.monotonic()
+        try:
+            searched = self.searcher.search_answers(sqls, timeout)
+        except Exception as e:
+            self.breaker.record(False, time.monotonic() - start_time)
+            print(f"❌ 图谱查询失败，改由本地后端应答: {e}")
+            return self.local_answers(sqls), True
+        except BaseException:
+            # 调用被中断，结果未知，归还半开状态下占用的试探名额
+            self.breaker.release()
+            raise
+        self.breaker.record(None not in searched, time.monotonic() - start_time)
+        return self.fill_dropped(sqls, searched)
+
+    '''search_answers的异步版本'''
+    async def asearch_answers(self, sqls, timeout=None):
+        if self.backend == 'memory':
+            # 内存图谱查询不涉及IO，直接同步执行
+            return self.searcher.search_answers(sqls), False
+        if self.breaker is None:
+            return await self.async_searcher().search_answers(sqls, timeout), False
+        if not self.breaker.allow():
+            return self.local_answers(sqls), True
+        start_time = time.monotonic()
+        try:
+            searched = await self.async_searcher().search_answers(sqls, timeout)
+        except Exception as e:
+            self.breaker.record(False, time.monotonic() - start_time)
+            print(f"❌ 图谱查询失败，改由本地后端应答: {e}")
+            return self.local_answers(sqls), True
+        except BaseException:
+            # 被取消（asyncio.CancelledError）等情况结果未知，归还半开状态下占用的试探名额
+            self.breaker.release()
+            raise
+        self.breaker.record(None not in searched, time.monotonic() - start_time)
+        return self.fill_dropped(sqls, searched)
+
+    '''问答主函数：timeout为整个问句的时间预算（秒），默认取构造时的设置，
+    预算内未完成的问题类型被放弃，返回已完成部分并注明未回答的内容'''
+    def chat_main(self, sent, timeout=None):
+        start_time = time.monotonic()
+        timeout = self.timeout if timeout is None else timeout
+        self.sync_graph_version()
+        key, result, pending = self.prepare_answer(sent)
+        if pending is None:
+            return result
+        res_sql, _, _, misses = pending
+        searched, degraded = [], False
+        if misses:
+            searched, degraded = self.search_answers([res_sql[index] for index in misses], self.remaining(timeout, start_time))
+        return self.complete_answer(key, pending, searched, degraded)
+
+    '''异步检索器，首次使用时创建'''
+    def async_searcher(self):
+        if self.asearcher is None:
+            from async_answer_search import AsyncAnswerSearcher
+            self.asearcher = AsyncAnswerSearcher(combined=self.searcher.combined)
+        return self.asearcher
+
+    '''异步问答：查询以await方式执行，timeout与chat_main相同，
+    调用方取消时未完成的查询一并取消'''
+    async def achat_main(self, sent, timeout=None):
+        start_time = time.monotonic()
+        timeout = self.timeout if timeout is None else timeout
+        if self.pointer_readable():
+            await self.async_searcher().sync_graph_version()
+        key, result, pending = self.prepare_answer(sent)
+        if pending is None:
+            return result
+        res_sql, _, _, misses = pending
+        searched, degraded = [], False
+        if misses:
+            searched, degraded = await self.asearch_answers([res_sql[index] for index in misses], self.remaining(timeout, start_time))
+        return self.complete_answer(key, pending, searched, degraded)
 
 if __name__ == '__main__':
     handler = ChatBotGraph()
@@ -33,4 +269,3 @@ if __name__ == '__main__':
         question = input('用户:')
         answer = handler.chat_main(question)
         print('小勇:', answer)
-
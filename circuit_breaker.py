@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# File: circuit_breaker.py
+# 熔断器：图数据库出错或变慢时暂停访问，由本地后端应答，后台探测恢复后再逐步切回
+
+import time
+import threading
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """按最近window次调用的失败比例熔断
+
+    失败包括抛出异常与耗时超过slow_call秒的调用。失败比例达到failure_rate（且至少有min_calls次调用）
+    时打开，打开期间allow()返回False，调用方应改走备用后端；同时启动后台线程每隔probe_interval秒
+    调用一次probe，连续probe_successes次成功且不慢时转为半开。半开状态下只放行half_open_calls次
+    试探调用，全部成功后关闭，其中任一次失败则重新打开。
+
+    allow()返回True后调用方须以record()报告结果，调用被中断、结果未知时调用release()归还试探名额；
+    半开超过half_open_timeout秒仍未收齐试探结果时视为失败，重新打开并恢复探测。
+    """
+    def __init__(self, probe, window=20, min_calls=10, failure_rate=0.5, slow_call=2.0,
+                 probe_interval=5.0, probe_successes=3, half_open_calls=3, half_open_timeout=30.0, name='neo4j'):
+        self.probe = probe
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.probe_interval = probe_interval
+        self.probe_successes = probe_successes
+        self.half_open_calls = half_open_calls
+        self.half_open_timeout = half_open_timeout
+        self.name = name
+        # 最近调用是否失败
+        self.calls = deque(maxlen=window)
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+        # 半开状态下已放行、已成功的试探调用数，及转为半开的时刻
+        self.trial_calls = 0
+        self.trial_successes = 0
+        self.half_opened_at = None
+        self.prober = None
+
+    '''是否允许访问主后端'''
+    def allow(self):
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                if self.trial_calls < self.half_open_calls:
+                    self.trial_calls += 1
+                    return True
+                if time.monotonic() - self.half_opened_at > self.half_open_timeout:
+                    self.trip('试探调用超过%.0f秒未报告结果' % self.half_open_timeout)
+            self.rejected += 1
+            return False
+
+    '''放弃一次已放行的调用（如被取消），不计成功或失败；半开状态下归还试探名额'''
+    def release(self):
+        with self.lock:
+            if self.state == HALF_OPEN and self.trial_calls > self.trial_successes:
+                self.trial_calls -= 1
+
+    '''记录一次调用结果'''
+    def record(self, success, latency):
+        failed = not success or (self.slow_call is not None and latency > self.slow_call)
+        with self.lock:
+            if self.state == HALF_OPEN:
+                if failed:
+                    self.trip('试探调用失败')
+                    return
+                self.trial_successes += 1
+                if self.trial_successes >= self.half_open_calls:
+                    self.state = CLOSED
+                    self.opened_at = None
+                    print(f"✅ {self.name}试探调用全部成功，熔断关闭")
+                return
+            if self.state != CLOSED:
+                return
+            self.calls.append(failed)
+            if len(self.calls) >= self.min_calls and sum(self.calls) >= self.failure_rate * len(self.calls):
+                self.trip()
+
+    '''打开熔断并启动后台探测，调用方需持有锁；reason为半开状态下重新打开的原因'''
+    def trip(self, reason=None):
+        if self.state == HALF_OPEN:
+            print(f"⚠️ {self.name}{reason}，熔断重新打开")
+        else:
+            failures = sum(self.calls)
+            print(f"⚠️ {self.name}熔断打开：最近{len(self.calls)}次调用失败{failures}次，改由本地后端应答")
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.trips += 1
+        self.calls.clear()
+        # 同一时刻只有一个探测线程
+        if self.prober is None or not self.prober.is_alive():
+            self.prober = threading.Thread(target=self.probe_loop, name='%s-probe' % self.name, daemon=True)
+            self.prober.start()
+
+    '''后台探测，连续成功后转为半开'''
+    def probe_loop(self):
+        successes = 0
+        while successes < self.probe_successes:
+            time.sleep(self.probe_interval)
+            start_time = time.monotonic()
+            try:
+                self.probe()
+                ok = self.slow_call is None or time.monotonic() - start_time <= self.slow_call
+            except Exception:
+                ok = False
+            successes = successes + 1 if ok else 0
+        with self.lock:
+            self.state = HALF_OPEN
+            self.trial_calls = 0
+            self.trial_successes = 0
+            self.half_opened_at = time.monotonic()
+            self.prober = None
+        print(f"🔄 {self.name}探测恢复，熔断半开，放行{self.half_open_calls}次试探调用")
+
+    def stats(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'window_failures': sum(self.calls),
+                'window_calls': len(self.calls),
+                'opened_at': self.opened_at,
+            }
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# File: graph_engine.py
+# 内存图谱引擎：由medical.json直接构建整数编号的CSR邻接数组，不经Neo4j回答全部问题类型
+
+import os
+import threading
+from array import array
+import lexicon_snapshot
+from answer_prettifier import AnswerPrettifier
+from build_medicalgraph import MedicalGraph, NODE_LABELS, DISEASE_INFOS, RELATIONS
+
+cur_dir = '/'.join(os.path.abspath(__file__).split('/')[:-1])
+DATA_PATH = os.path.join(cur_dir, 'data/medical.json')
+# 引擎快照路径，medical.json变化后自动重建
+SNAPSHOT_PATH = os.path.join(cur_dir, 'cache/graph_engine.pkl')
+# 引擎结构版本，结构变化时递增，旧快照自动失效
+ENGINE_VERSION = 1
+
+# 各问题类型在引擎中的查询方式，与question_parser.CYPHER_TEMPLATES一一对应：
+# ('property', 疾病属性名)：返回疾病属性；
+# (方向, [关系键, ...])：out由疾病出发查关联实体，in由关联实体反查疾病，both不区分方向，
+# by_rel与out相同但按关系名称分组
+ENGINE_QUERIES = {
+    'disease_cause': ('property', 'cause'),
+    'disease_prevent': ('property', 'prevent'),
+    'disease_lasttime': ('property', 'cure_lasttime'),
+    'disease_cureprob': ('property', 'cured_prob'),
+    'disease_cureway': ('property', 'cure_way'),
+    'disease_easyget': ('property', 'easy_get'),
+    'disease_desc': ('property', 'desc'),
+    'disease_symptom': ('out', [('Disease', 'has_symptom', 'Symptom')]),
+    'symptom_disease': ('in', [('Disease', 'has_symptom', 'Symptom')]),
+    'disease_acompany': ('both', [('Disease', 'acompany_with', 'Disease')]),
+    'disease_not_food': ('out', [('Disease', 'no_eat', 'Food')]),
+    'disease_do_food': ('by_rel', [('Disease', 'do_eat', 'Food'), ('Disease', 'recommand_eat', 'Food')]),
+    'food_not_disease': ('in', [('Disease', 'no_eat', 'Food')]),
+    'food_do_disease': ('in', [('Disease', 'do_eat', 'Food'), ('Disease', 'recommand_eat', 'Food')]),
+    'disease_drug': ('out', [('Disease', 'common_drug', 'Drug'), ('Disease', 'recommand_drug', 'Drug')]),
+    'drug_disease': ('in', [('Disease', 'common_drug', 'Drug'), ('Disease', 'recommand_drug', 'Drug')]),
+    'disease_check': ('out', [('Disease', 'need_check', 'Check')]),
+    'check_disease': ('in', [('Disease', 'need_check', 'Check')]),
+}
+
+
+def build_csr(size, pairs):
+    """由(起点, 终点)编号对构建CSR数组：offsets[i]:offsets[i+1]为节点i的邻居在targets中的区间"""
+    buckets = [[] for _ in range(size)]
+    for source, target in pairs:
+        buckets[source].append(target)
+    offsets = array('i', [0])
+    targets = array('i')
+    for bucket in buckets:
+        targets.extend(bucket)
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+class Relation:
+    """一种关系的正反向CSR邻接表"""
+    def __init__(self, name, start_size, end_size, pairs):
+        self.name = name
+        self.forward = build_csr(start_size, pairs)
+        self.reverse = build_csr(end_size, [(target, source) for source, target in pairs])
+
+    def neighbors(self, node_id, reverse=False):
+        offsets, targets = self.reverse if reverse else self.forward
+        return targets[offsets[node_id]:offsets[node_id + 1]]
+
+    def __len__(self):
+        return len(self.forward[1])
+
+
+class GraphEngine:
+    """内存图谱：节点按标签编号，关系按类型存为CSR数组"""
+    def __init__(self, names, disease_records, relations):
+        # 各标签的节点名称表，编号即下标
+        self.names = names
+        self.ids = {label: {name: i for i, name in enumerate(label_names)} for label, label_names in names.items()}
+        # 每个疾病编号对应的属性记录，同名疾病有多条时与Neo4j中的多个节点对应
+        self.disease_records = disease_records
+        self.relations = relations
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        """由MedicalGraph.read_nodes的返回值构建"""
+        names = {label: sorted(nodes[index]) for label, index in NODE_LABELS.items()}
+        disease_ids = {}
+        disease_records = []
+        for disease_dict in nodes[DISEASE_INFOS]:
+            disease_id = disease_ids.get(disease_dict['name'])
+            if disease_id is None:
+                disease_id = disease_ids[disease_dict['name']] = len(disease_records)
+                disease_records.append([])
+            disease_records[disease_id].append(disease_dict)
+        names['Disease'] = list(disease_ids)
+        ids = {label: {name: i for i, name in enumerate(label_names)} for label, label_names in names.items()}
+
+        relations = {}
+        for start, rel_type, end, rel_name, index in RELATIONS:
+            start_ids = ids[start]
+            end_ids = ids[end]
+            # 与入库时一致：边已在解析时去重，端点不存在的边无法匹配到节点，直接丢弃
+            pairs = []
+            for p, q in nodes[index]:
+                if p in start_ids and q in end_ids:
+                    pairs.append((start_ids[p], end_ids[q]))
+            relations[(start, rel_type, end)] = Relation(rel_name, len(names[start]), len(names[end]), pairs)
+        return cls(names, disease_records, relations)
+
+    @classmethod
+    def from_json(cls, data_path=DATA_PATH):
+        """从medical.json构建，解析规则与图谱入库脚本相同"""
+        # 引擎本身另有快照，无需再缓存解析结果
+        handler = MedicalGraph(connect=False, node_cache=False)
+        handler.data_path = data_path
+        return cls.from_nodes(handler.read_nodes())
+
+    def stats(self):
+        """节点数与各关系的边数"""
+        return {
+            'nodes': {label: len(label_names) for label, label_names in self.names.items()},
+            'relations': {'%s-%s->%s' % key: len(relation) for key, relation in self.relations.items()},
+        }
+
+    def neighbor_names(self, node_id, rel_keys, reverse):
+        """沿给定关系收集邻居名称的集合"""
+        result = set()
+        for rel_key in rel_keys:
+            neighbor_names = self.names[rel_key[0] if reverse else rel_key[2]]
+            result.update(neighbor_names[neighbor] for neighbor in self.relations[rel_key].neighbors(node_id, reverse))
+        return result
+
+    def collect(self, node_id, rel_keys, reverse, limit):
+        """沿给定关系收集邻居名称，去重后按名称排序截取前limit个，与Cypher模板聚合前的ORDER BY一致"""
+        return sorted(self.neighbor_names(node_id, rel_keys, reverse))[:limit]
+
+    def query(self, question_type, names, limit=20):
+        """回答一个问题类型，返回与AnswerSearcher查询结果相同形式的结果行"""
+        kind, spec = ENGINE_QUERIES[question_type]
+        rows = []
+        for name in dict.fromkeys(names):
+            if kind == 'property':
+                disease_id = self.ids['Disease'].get(name)
+                if disease_id is not None:
+                    rows += [{'m.name': name, 'm.' + spec: record[spec]} for record in self.disease_records[disease_id]]
+            elif kind == 'in':
+                node_id = self.ids[spec[0][2]].get(name)
+                desc = [] if node_id is None else self.collect(node_id, spec, True, limit)
+                if desc:
+                    rows.append({'n.name': name, 'm.name': desc})
+            elif kind == 'by_rel':
+                node_id = self.ids['Disease'].get(name)
+                for rel_key in spec:
+                    desc = [] if node_id is None else self.collect(node_id, [rel_key], False, limit)
+                    if desc:
+                        rows.append({'m.name': name, 'r.name': self.relations[rel_key].name, 'n.name': desc})
+            else:
+                node_id = self.ids['Disease'].get(name)
+                desc = []
+                if node_id is not None:
+                    desc = self.neighbor_names(node_id, spec, False)
+                    if kind == 'both':
+                        desc |= self.neighbor_names(node_id, spec, True)
+                    desc = sorted(desc)[:limit]
+                if desc:
+                    rows.append({'m.name': name, 'n.name': desc})
+        return rows
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(data_path=DATA_PATH):
+    """获取进程内共享的内存图谱，首次调用时从快照加载或从medical.json构建"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                key = 'graph_engine:%d' % ENGINE_VERSION
+                engine = lexicon_snapshot.load_snapshot(SNAPSHOT_PATH, [data_path], key)
+                if engine is None:
+                    engine = GraphEngine.from_json(data_path)
+                    try:
+                        lexicon_snapshot.save_snapshot(SNAPSHOT_PATH, [data_path], engine, key)
+                    except OSError as e:
+                        print(f"内存图谱快照写入失败: {e}")
+                _engine = engine
+    return _engine
+
+
+class LocalAnswerSearcher(AnswerPrettifier):
+    """基于内存图谱的答案检索器，接口与AnswerSearcher一致"""
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine()
+        self.num_limit = 20
+        # 本地查询无往返开销，不需要合并
+        self.combined = False
+
+    def close(self):
+        pass
+
+    '''查询一个问题类型下一批实体的结果行，与AnswerSearcher.query_rows相同'''
+    def query_rows(self, question_type, entities):
+        return self.engine.query(question_type, entities, self.num_limit)
+
+    '''执行查询，并返回相应结果'''
+    def search_main(self, sqls):
+        return [final_answer for final_answer in self.search_answers(sqls) if final_answer]
+
+    '''按sqls顺序返回每个问题类型的回复，无结果时为空串；本地查询不会超时，timeout仅为接口一致'''
+    def search_answers(self, sqls, timeout=None):
+        return [self.answer_prettify(sql_['question_type'], self.query_rows(sql_['question_type'], sql_['entities'])) for sql_ in sqls]
+
+
+if __name__ == '__main__':
+    engine = get_engine()
+    print(engine.stats())
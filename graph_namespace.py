@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# File: graph_namespace.py
+# 图谱版本命名空间：蓝绿重建时新版本的节点使用带版本后缀的标签，与正在服务的旧版本并存于同一个库
+
+import re
+import functools
+
+# 图谱中的全部节点标签
+GRAPH_LABELS = ['Disease', 'Drug', 'Food', 'Check', 'Department', 'Producer', 'Symptom']
+# 查询语句中的节点标签，如(m:Disease)；关系类型均为小写，不会被匹配
+LABEL_PATTERN = re.compile(r':(%s)\b' % '|'.join(GRAPH_LABELS))
+# 带版本后缀的疾病标签，用于从db.labels()中列出库中已有的版本
+NAMESPACE_PATTERN = re.compile(r'^Disease(?:_(\w+))?$')
+
+
+def label_name(label, namespace=''):
+    """命名空间内的标签名，空命名空间即原有的不带后缀的标签"""
+    return '%s_%s' % (label, namespace) if namespace else label
+
+
+@functools.lru_cache(maxsize=1024)
+def namespaced(query, namespace=''):
+    """把查询语句中的节点标签改写为命名空间内的标签；同一语句的改写结果被缓存，文本固定，执行计划仍可复用"""
+    if not namespace:
+        return query
+    return LABEL_PATTERN.sub(lambda match: ':' + label_name(match.group(1), namespace), query)
+
+
+def namespace_of(label):
+    """由疾病标签解析出命名空间，其他标签返回None"""
+    match = NAMESPACE_PATTERN.match(label)
+    if match is None:
+        return None
+    return match.group(1) or ''
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# File: lexicon_snapshot.py
+# 词典编译快照：将actree、词-类型表与疑问词表一次性编译并持久化，启动时直接加载
+
+import os
+import sys
+import pickle
+import hashlib
+import argparse
+
+# 快照格式版本，结构变化时递增，旧快照自动失效
+SNAPSHOT_VERSION = 1
+
+
+def file_signature(path):
+    """计算词典文件签名：大小、修改时间与内容哈希"""
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': digest}
+
+
+def source_signatures(source_paths):
+    """计算全部词典文件签名"""
+    return {os.path.basename(path): file_signature(path) for path in source_paths}
+
+
+def is_fresh(signatures, source_paths):
+    """判断快照记录的签名与当前词典文件是否一致
+
+    大小与修改时间均未变化时直接认为有效；否则比较内容哈希，
+    仅被touch过而内容未变的文件不会导致重建。
+    """
+    if set(signatures) != {os.path.basename(path) for path in source_paths}:
+        return False
+    for path in source_paths:
+        old = signatures[os.path.basename(path)]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size == old['size'] and stat.st_mtime_ns == old['mtime_ns']:
+            continue
+        if stat.st_size != old['size'] or file_signature(path)['sha1'] != old['sha1']:
+            return False
+    return True
+
+
+def load_snapshot(snapshot_path, source_paths, key=''):
+    """加载快照，快照不存在、格式不符或词典已变化时返回None"""
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    if snapshot.get('key') != key:
+        return None
+    if not is_fresh(snapshot.get('signatures', {}), source_paths):
+        return None
+    return snapshot['payload']
+
+
+def save_snapshot(snapshot_path, source_paths, payload, key=''):
+    """写入快照，先写临时文件再原子替换，避免并发启动的进程读到半截文件"""
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'key': key,
+        'signatures': source_signatures(source_paths),
+        'payload': payload,
+    }
+    snapshot_dir = os.path.dirname(snapshot_path)
+    if snapshot_dir:
+        os.makedirs(snapshot_dir, exist_ok=True)
+    tmp_path = '%s.%d.tmp' % (snapshot_path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+    return snapshot_path
+
+
+def main(argv=None):
+    """命令行入口：部署时预编译词典快照"""
+    parser = argparse.ArgumentParser(description='预编译QuestionClassifier疑问词快照与共享实体词典快照')
+    parser.add_argument('--check', action='store_true', help='仅检查快照是否有效，无效时返回非零状态码')
+    parser.add_argument('--force', action='store_true', help='忽略已有快照，强制重新编译')
+    args = parser.parse_args(argv)
+
+    import medical_lexicon
+    from question_classifier import QuestionClassifier
+
+    if args.check:
+        fresh = QuestionClassifier.load_snapshot() is not None and medical_lexicon.load_snapshot() is not None
+        print('快照有效' if fresh else '快照缺失或已过期')
+        return 0 if fresh else 1
+    if not args.force and QuestionClassifier.load_snapshot() is not None and medical_lexicon.load_snapshot() is not None:
+        print('快照已是最新，无需重新编译')
+        return 0
+    print('快照已写入: %s' % QuestionClassifier.build_snapshot())
+    medical_lexicon.build_snapshot()
+    print('快照已写入: %s' % medical_lexicon.SNAPSHOT_PATH)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# File: medical_lexicon.py
+# 共享医疗实体词典：基于多模式匹配自动机的实体识别，供问答各前端统一使用
+
+import os
+import threading
+import lexicon_snapshot
+
+try:
+    import pyahocorasick
+except ImportError:
+    try:
+        import ahocorasick as pyahocorasick
+    except ImportError:
+        pyahocorasick = None
+
+cur_dir = '/'.join(os.path.abspath(__file__).split('/')[:-1])
+# 实体词典路径，顺序即同一个词对应多个类型时的类型顺序
+ENTITY_DICTS = {
+    'disease': os.path.join(cur_dir, 'dict/disease.txt'),
+    'department': os.path.join(cur_dir, 'dict/department.txt'),
+    'check': os.path.join(cur_dir, 'dict/check.txt'),
+    'drug': os.path.join(cur_dir, 'dict/drug.txt'),
+    'food': os.path.join(cur_dir, 'dict/food.txt'),
+    'symptom': os.path.join(cur_dir, 'dict/symptom.txt'),
+    'producer': os.path.join(cur_dir, 'dict/producer.txt'),
+}
+# 共享词典快照路径
+SNAPSHOT_PATH = os.path.join(cur_dir, 'cache/entity_lexicon.pkl')
+
+
+class WordMatcher:
+    """未安装pyahocorasick时的替代匹配器，接口与Automaton一致
+
+    按词长建立哈希表，对问句每个结束位置逐一查表，耗时与问句长度成线性关系。
+    """
+    def __init__(self):
+        self.words = {}
+        self.lengths = []
+
+    def add_word(self, word, value):
+        self.words[word] = value
+
+    def make_automaton(self):
+        self.lengths = sorted({len(word) for word in self.words})
+
+    def iter(self, text):
+        words = self.words
+        lengths = self.lengths
+        for end in range(len(text)):
+            for length in lengths:
+                start = end - length + 1
+                if start < 0:
+                    break
+                value = words.get(text[start:end + 1])
+                if value is not None:
+                    yield end, value
+
+
+def new_automaton():
+    """创建多模式匹配自动机，优先使用pyahocorasick"""
+    if pyahocorasick is not None:
+        return pyahocorasick.Automaton()
+    return WordMatcher()
+
+
+def load_words(path):
+    """加载词典文件，去除空行"""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def build_actree(wordlist):
+    """构造actree，命中值为(序号, 词)"""
+    actree = new_automaton()
+    for index, word in enumerate(wordlist):
+        actree.add_word(word, (index, word))
+    actree.make_automaton()
+    return actree
+
+
+def build_wdtype_dict(words_by_type):
+    """构造词对应的类型，类型顺序与words_by_type一致"""
+    type_sets = [(type_, set(words)) for type_, words in words_by_type.items()]
+    wd_dict = dict()
+    for type_, words in words_by_type.items():
+        for wd in words:
+            if wd not in wd_dict:
+                wd_dict[wd] = [t for t, wds in type_sets if wd in wds]
+    return wd_dict
+
+
+class EntityLexicon:
+    """医疗实体词典"""
+    def __init__(self, region_tree, wdtype_dict):
+        self.region_tree = region_tree
+        self.wdtype_dict = wdtype_dict
+
+    @classmethod
+    def from_dicts(cls, dict_paths=None):
+        """从词典文件构建"""
+        dict_paths = dict_paths or ENTITY_DICTS
+        words_by_type = {type_: load_words(path) for type_, path in dict_paths.items()}
+        wdtype_dict = build_wdtype_dict(words_by_type)
+        return cls(build_actree(list(wdtype_dict)), wdtype_dict)
+
+    def extract(self, question, buffer=None):
+        """实体抽取：返回(start, end, word, types)片段列表，重叠片段按最左最长规则消解
+
+        buffer为可复用的命中缓冲字典，批量处理时传入以减少临时对象分配，不可跨线程共享。
+        """
+        # actree按结束位置给出命中，换算出起点后每个起点只保留最长的一个
+        if buffer is None:
+            longest = {}
+        else:
+            longest = buffer
+            longest.clear()
+        for end, (_, wd) in self.region_tree.iter(question):
+            start = end - len(wd) + 1
+            if longest.get(start, -1) < end:
+                longest[start] = end
+        # 从左到右线性扫描，跳过与已选片段重叠的命中
+        spans = []
+        cursor = 0
+        for start in range(len(question)):
+            end = longest.get(start)
+            if end is None or start < cursor:
+                continue
+            wd = question[start:end + 1]
+            spans.append((start, end + 1, wd, self.wdtype_dict.get(wd)))
+            cursor = end + 1
+        return spans
+
+    def check_medical(self, question):
+        """返回{word: types}字典"""
+        return {wd: types for _, _, wd, types in self.extract(question)}
+
+    def group_by_type(self, question):
+        """返回{type: [word, ...]}字典，词按在问句中出现的顺序排列"""
+        medical_dict = {}
+        for _, _, wd, types in self.extract(question):
+            for type_ in types:
+                words = medical_dict.setdefault(type_, [])
+                if wd not in words:
+                    words.append(wd)
+        return medical_dict
+
+
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+
+def load_snapshot():
+    """加载实体词典快照，缺失或词典文件已变化时返回None"""
+    return lexicon_snapshot.load_snapshot(SNAPSHOT_PATH, list(ENTITY_DICTS.values()), 'entity_lexicon')
+
+
+def build_snapshot():
+    """从词典文件重新构建实体词典并写入快照，返回构建结果"""
+    lexicon = EntityLexicon.from_dicts()
+    lexicon_snapshot.save_snapshot(SNAPSHOT_PATH, list(ENTITY_DICTS.values()), lexicon, 'entity_lexicon')
+    return lexicon
+
+
+def get_lexicon():
+    """获取进程内共享的实体词典，首次调用时从快照加载或从词典文件构建"""
+    global _lexicon
+    if _lexicon is None:
+        with _lexicon_lock:
+            if _lexicon is None:
+                lexicon = load_snapshot()
+                if lexicon is None:
+                    try:
+                        lexicon = build_snapshot()
+                    except OSError as e:
+                        print(f"实体词典快照写入失败: {e}")
+                        lexicon = EntityLexicon.from_dicts()
+                _lexicon = lexicon
+    return _lexicon
@@ -5,62 +5,104 @@
 # Date: 18-10-4
 
 import os
-import pyahocorasick
+import sys
+import json
+import time
+import hashlib
+import itertools
+import collections
+import argparse
+import multiprocessing
+import lexicon_snapshot
+import medical_lexicon
+
+cur_dir = '/'.join(os.path.abspath(__file__).split('/')[:-1])
+# 否定词路径；实体词典路径见medical_lexicon.ENTITY_DICTS
+DENY_PATH = os.path.join(cur_dir, 'dict/deny.txt')
+# 疑问词意图快照路径，实体词典另由medical_lexicon缓存
+SNAPSHOT_PATH = os.path.join(cur_dir, 'cache/lexicon.pkl')
+
+# 问句疑问词
+QUESTION_WORDS = {
+    'symptom_qwds': ['症状', '表征', '现象', '症候', '表现'],
+    'cause_qwds': ['原因','成因', '为什么', '怎么会', '怎样才', '咋样才', '怎样会', '如何会', '为啥', '为何', '如何才会', '怎么才会', '会导致', '会造成'],
+    'acompany_qwds': ['并发症', '并发', '一起发生', '一并发生', '一起出现', '一并出现', '一同发生', '一同出现', '伴随发生', '伴随', '共现'],
+    'food_qwds': ['饮食', '饮用', '吃', '食', '伙食', '膳食', '喝', '菜' ,'忌口', '补品', '保健品', '食谱', '菜谱', '食用', '食物','补品'],
+    'drug_qwds': ['药', '药品', '用药', '胶囊', '口服液', '炎片'],
+    'prevent_qwds': ['预防', '防范', '抵制', '抵御', '防止','躲避','逃避','避开','免得','逃开','避开','避掉','躲开','躲掉','绕开',
+                     '怎样才能不', '怎么才能不', '咋样才能不','咋才能不', '如何才能不',
+                     '怎样才不', '怎么才不', '咋样才不','咋才不', '如何才不',
+                     '怎样才可以不', '怎么才可以不', '咋样才可以不', '咋才可以不', '如何可以不',
+                     '怎样才可不', '怎么才可不', '咋样才可不', '咋才可不', '如何可不'],
+    'lasttime_qwds': ['周期', '多久', '多长时间', '多少时间', '几天', '几年', '多少天', '多少小时', '几个小时', '多少年'],
+    'cureway_qwds': ['怎么治疗', '如何医治', '怎么医治', '怎么治', '怎么医', '如何治', '医治方式', '疗法', '咋治', '怎么办', '咋办', '咋治'],
+    'cureprob_qwds': ['多大概率能治好', '多大几率能治好', '治好希望大么', '几率', '几成', '比例', '可能性', '能治', '可治', '可以治', '可以医'],
+    'easyget_qwds': ['易感人群', '容易感染', '易发人群', '什么人', '哪些人', '感染', '染上', '得上'],
+    'check_qwds': ['检查', '检查项目', '查出', '检查', '测出', '试出'],
+    'belong_qwds': ['属于什么科', '属于', '什么科', '科室'],
+    'cure_qwds': ['治疗什么', '治啥', '治疗啥', '医治啥', '治愈啥', '主治啥', '主治什么', '有什么用', '有何用', '用处', '用途',
+                  '有什么好处', '有什么益处', '有何益处', '用来', '用来做啥', '用来作甚', '需要', '要'],
+}
+# 意图位：每张疑问词表及否定词表各占一位，一次扫描问句即可得到意图掩码
+INTENT_BITS = {name: 1 << index for index, name in enumerate(list(QUESTION_WORDS) + ['deny_words'])}
+# 快照内容结构版本，build_lexicon产出的字段变化时递增
+LEXICON_VERSION = 3
 
 class QuestionClassifier:
-    def __init__(self):
-        cur_dir = '/'.join(os.path.abspath(__file__).split('/')[:-1])
-        #　特征词路径
-        self.disease_path = os.path.join(cur_dir, 'dict/disease.txt')
-        self.department_path = os.path.join(cur_dir, 'dict/department.txt')
-        self.check_path = os.path.join(cur_dir, 'dict/check.txt')
-        self.drug_path = os.path.join(cur_dir, 'dict/drug.txt')
-        self.food_path = os.path.join(cur_dir, 'dict/food.txt')
-        self.producer_path = os.path.join(cur_dir, 'dict/producer.txt')
-        self.symptom_path = os.path.join(cur_dir, 'dict/symptom.txt')
-        self.deny_path = os.path.join(cur_dir, 'dict/deny.txt')
-        # 加载特征词
-        self.disease_wds= [i.strip() for i in open(self.disease_path) if i.strip()]
-        self.department_wds= [i.strip() for i in open(self.department_path) if i.strip()]
-        self.check_wds= [i.strip() for i in open(self.check_path) if i.strip()]
-        self.drug_wds= [i.strip() for i in open(self.drug_path) if i.strip()]
-        self.food_wds= [i.strip() for i in open(self.food_path) if i.strip()]
-        self.producer_wds= [i.strip() for i in open(self.producer_path) if i.strip()]
-        self.symptom_wds= [i.strip() for i in open(self.symptom_path) if i.strip()]
-        self.region_words = set(self.department_wds + self.disease_wds + self.check_wds + self.drug_wds + self.food_wds + self.producer_wds + self.symptom_wds)
-        self.deny_words = [i.strip() for i in open(self.deny_path) if i.strip()]
-        # 构造领域actree
-        self.region_tree = self.build_actree(list(self.region_words))
-        # 构建词典
-        self.wdtype_dict = self.build_wdtype_dict()
-        # 问句疑问词
-        self.symptom_qwds = ['症状', '表征', '现象', '症候', '表现']
-        self.cause_qwds = ['原因','成因', '为什么', '怎么会', '怎样才', '咋样才', '怎样会', '如何会', '为啥', '为何', '如何才会', '怎么才会', '会导致', '会造成']
-        self.acompany_qwds = ['并发症', '并发', '一起发生', '一并发生', '一起出现', '一并出现', '一同发生', '一同出现', '伴随发生', '伴随', '共现']
-        self.food_qwds = ['饮食', '饮用', '吃', '食', '伙食', '膳食', '喝', '菜' ,'忌口', '补品', '保健品', '食谱', '菜谱', '食用', '食物','补品']
-        self.drug_qwds = ['药', '药品', '用药', '胶囊', '口服液', '炎片']
-        self.prevent_qwds = ['预防', '防范', '抵制', '抵御', '防止','躲避','逃避','避开','免得','逃开','避开','避掉','躲开','躲掉','绕开',
-                             '怎样才能不', '怎么才能不', '咋样才能不','咋才能不', '如何才能不',
-                             '怎样才不', '怎么才不', '咋样才不','咋才不', '如何才不',
-                             '怎样才可以不', '怎么才可以不', '咋样才可以不', '咋才可以不', '如何可以不',
-                             '怎样才可不', '怎么才可不', '咋样才可不', '咋才可不', '如何可不']
-        self.lasttime_qwds = ['周期', '多久', '多长时间', '多少时间', '几天', '几年', '多少天', '多少小时', '几个小时', '多少年']
-        self.cureway_qwds = ['怎么治疗', '如何医治', '怎么医治', '怎么治', '怎么医', '如何治', '医治方式', '疗法', '咋治', '怎么办', '咋办', '咋治']
-        self.cureprob_qwds = ['多大概率能治好', '多大几率能治好', '治好希望大么', '几率', '几成', '比例', '可能性', '能治', '可治', '可以治', '可以医']
-        self.easyget_qwds = ['易感人群', '容易感染', '易发人群', '什么人', '哪些人', '感染', '染上', '得上']
-        self.check_qwds = ['检查', '检查项目', '查出', '检查', '测出', '试出']
-        self.belong_qwds = ['属于什么科', '属于', '什么科', '科室']
-        self.cure_qwds = ['治疗什么', '治啥', '治疗啥', '医治啥', '治愈啥', '主治啥', '主治什么', '有什么用', '有何用', '用处', '用途',
-                          '有什么好处', '有什么益处', '有何益处', '用来', '用来做啥', '用来作甚', '需要', '要']
+    def __init__(self, use_snapshot=True):
+        for name, path in medical_lexicon.ENTITY_DICTS.items():
+            setattr(self, name + '_path', path)
+        self.deny_path = DENY_PATH
+        # 优先加载预编译快照，否定词或疑问词变化时自动重建
+        lexicon = self.load_snapshot() if use_snapshot else None
+        if lexicon is None:
+            lexicon = self.build_lexicon()
+            if use_snapshot:
+                try:
+                    lexicon_snapshot.save_snapshot(SNAPSHOT_PATH, [DENY_PATH], lexicon, self.snapshot_key())
+                except OSError as e:
+                    print('lexicon snapshot not saved: %s' % e)
+        self.__dict__.update(lexicon)
+        # 实体抽取使用进程内共享的实体词典
+        self.lexicon = medical_lexicon.get_lexicon() if use_snapshot else medical_lexicon.EntityLexicon.from_dicts()
+        self.region_tree = self.lexicon.region_tree
+        self.wdtype_dict = self.lexicon.wdtype_dict
 
         print('model init finished ......')
 
         return
 
+    '''快照校验键，疑问词表变化时旧快照失效'''
+    @staticmethod
+    def snapshot_key():
+        return hashlib.sha1(repr((LEXICON_VERSION, sorted(QUESTION_WORDS.items()))).encode('utf-8')).hexdigest()
+
+    '''加载词典快照，无效时返回None'''
+    @classmethod
+    def load_snapshot(cls):
+        return lexicon_snapshot.load_snapshot(SNAPSHOT_PATH, [DENY_PATH], cls.snapshot_key())
+
+    '''重新编译并写入词典快照'''
+    @classmethod
+    def build_snapshot(cls):
+        return lexicon_snapshot.save_snapshot(SNAPSHOT_PATH, [DENY_PATH], cls.build_lexicon(), cls.snapshot_key())
+
+    '''读取否定词并编译疑问词意图actree，返回可序列化的属性字典'''
+    @classmethod
+    def build_lexicon(cls):
+        lexicon = {}
+        lexicon['deny_words'] = medical_lexicon.load_words(DENY_PATH)
+        # 问句疑问词
+        for name, words in QUESTION_WORDS.items():
+            lexicon[name] = list(words)
+        # 构造疑问词意图actree
+        lexicon['intent_tree'] = cls.build_intent_tree(lexicon)
+        return lexicon
+
     '''分类主函数'''
-    def classify(self, question):
+    def classify(self, question, buffer=None):
         data = {}
-        medical_dict = self.check_medical(question)
+        medical_dict = self.spans_to_dict(self.lexicon.extract(question, buffer))
         if not medical_dict:
             return {}
         data['args'] = medical_dict
@@ -71,28 +113,31 @@ class QuestionClassifier:
         question_type = 'others'
 
         question_types = []
+        # 一次扫描得到问句的意图掩码
+        intents = self.check_intents(question)
+        bits = INTENT_BITS
 
         # 症状
-        if self.check_words(self.symptom_qwds, question) and ('disease' in types):
+        if intents & bits['symptom_qwds'] and ('disease' in types):
             question_type = 'disease_symptom'
             question_types.append(question_type)
 
-        if self.check_words(self.symptom_qwds, question) and ('symptom' in types):
+        if intents & bits['symptom_qwds'] and ('symptom' in types):
             question_type = 'symptom_disease'
             question_types.append(question_type)
 
         # 原因
-        if self.check_words(self.cause_qwds, question) and ('disease' in types):
+        if intents & bits['cause_qwds'] and ('disease' in types):
             question_type = 'disease_cause'
             question_types.append(question_type)
         # 并发症
-        if self.check_words(self.acompany_qwds, question) and ('disease' in types):
+        if intents & bits['acompany_qwds'] and ('disease' in types):
             question_type = 'disease_acompany'
             question_types.append(question_type)
 
         # 推荐食品
-        if self.check_words(self.food_qwds, question) and 'disease' in types:
-            deny_status = self.check_words(self.deny_words, question)
+        if intents & bits['food_qwds'] and 'disease' in types:
+            deny_status = intents & bits['deny_words']
             if deny_status:
                 question_type = 'disease_not_food'
             else:
@@ -100,8 +145,8 @@ class QuestionClassifier:
             question_types.append(question_type)
 
         #已知食物找疾病
-        if self.check_words(self.food_qwds+self.cure_qwds, question) and 'food' in types:
-            deny_status = self.check_words(self.deny_words, question)
+        if intents & (bits['food_qwds'] | bits['cure_qwds']) and 'food' in types:
+            deny_status = intents & bits['deny_words']
             if deny_status:
                 question_type = 'food_not_disease'
             else:
@@ -109,47 +154,47 @@ class QuestionClassifier:
             question_types.append(question_type)
 
         # 推荐药品
-        if self.check_words(self.drug_qwds, question) and 'disease' in types:
+        if intents & bits['drug_qwds'] and 'disease' in types:
             question_type = 'disease_drug'
             question_types.append(question_type)
 
         # 药品治啥病
-        if self.check_words(self.cure_qwds, question) and 'drug' in types:
+        if intents & bits['cure_qwds'] and 'drug' in types:
             question_type = 'drug_disease'
             question_types.append(question_type)
 
         # 疾病接受检查项目
-        if self.check_words(self.check_qwds, question) and 'disease' in types:
+        if intents & bits['check_qwds'] and 'disease' in types:
             question_type = 'disease_check'
             question_types.append(question_type)
 
         # 已知检查项目查相应疾病
-        if self.check_words(self.check_qwds+self.cure_qwds, question) and 'check' in types:
+        if intents & (bits['check_qwds'] | bits['cure_qwds']) and 'check' in types:
             question_type = 'check_disease'
             question_types.append(question_type)
 
         #　症状防御
-        if self.check_words(self.prevent_qwds, question) and 'disease' in types:
+        if intents & bits['prevent_qwds'] and 'disease' in types:
             question_type = 'disease_prevent'
             question_types.append(question_type)
 
         # 疾病医疗周期
-        if self.check_words(self.lasttime_qwds, question) and 'disease' in types:
+        if intents & bits['lasttime_qwds'] and 'disease' in types:
             question_type = 'disease_lasttime'
             question_types.append(question_type)
 
         # 疾病治疗方式
-        if self.check_words(self.cureway_qwds, question) and 'disease' in types:
+        if intents & bits['cureway_qwds'] and 'disease' in types:
             question_type = 'disease_cureway'
             question_types.append(question_type)
 
         # 疾病治愈可能性
-        if self.check_words(self.cureprob_qwds, question) and 'disease' in types:
+        if intents & bits['cureprob_qwds'] and 'disease' in types:
             question_type = 'disease_cureprob'
             question_types.append(question_type)
 
         # 疾病易感染人群
-        if self.check_words(self.easyget_qwds, question) and 'disease' in types :
+        if intents & bits['easyget_qwds'] and 'disease' in types :
             question_type = 'disease_easyget'
             question_types.append(question_type)
 
@@ -166,50 +211,73 @@ class QuestionClassifier:
 
         return data
 
-    '''构造词对应的类型'''
-    def build_wdtype_dict(self):
-        wd_dict = dict()
-        for wd in self.region_words:
-            wd_dict[wd] = []
-            if wd in self.disease_wds:
-                wd_dict[wd].append('disease')
-            if wd in self.department_wds:
-                wd_dict[wd].append('department')
-            if wd in self.check_wds:
-                wd_dict[wd].append('check')
-            if wd in self.drug_wds:
-                wd_dict[wd].append('drug')
-            if wd in self.food_wds:
-                wd_dict[wd].append('food')
-            if wd in self.symptom_wds:
-                wd_dict[wd].append('symptom')
-            if wd in self.producer_wds:
-                wd_dict[wd].append('producer')
-        return wd_dict
-
-    '''构造actree，加速过滤'''
-    def build_actree(self, wordlist):
-        actree = pyahocorasick.Automaton()
-        for index, word in enumerate(wordlist):
-            actree.add_word(word, (index, word))
+    '''批量分类，按输入顺序逐条产出结果
+
+    processes大于1时使用fork出的进程池，子进程通过写时复制共享已加载的actree；输入按chunksize分块提交，
+    在途的块不超过进程数的两倍，问句文件再大也只按需读取；
+    每处理report_every条打印一次吞吐量，结束后统计信息保存在self.batch_stats中。
+    '''
+    def classify_many(self, questions, processes=1, chunksize=512, report_every=10000):
+        global _pool_classifier
+        start_time = time.time()
+        count = 0
+        self.batch_stats = {'count': 0, 'seconds': 0.0, 'qps': 0.0}
+        pool = None
+        if processes > 1:
+            _pool_classifier = self
+            pool = multiprocessing.get_context(_pool_start_method()).Pool(processes)
+            results = _bounded_imap(pool, questions, chunksize, processes * 2)
+        else:
+            buffer = {}
+            classify = self.classify
+            results = (classify(question, buffer) for question in questions)
+        try:
+            for result in results:
+                count += 1
+                if report_every and count % report_every == 0:
+                    elapsed = time.time() - start_time
+                    print('classified %d questions, %.1f questions/sec' % (count, count / elapsed if elapsed else 0.0), file=sys.stderr)
+                yield result
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+                _pool_classifier = None
+            elapsed = time.time() - start_time
+            self.batch_stats = {'count': count, 'seconds': elapsed, 'qps': count / elapsed if elapsed else 0.0}
+
+    '''构造疑问词意图actree，同一个词出现在多张表中时合并意图位'''
+    @staticmethod
+    def build_intent_tree(lexicon):
+        word_bits = {}
+        for name, bit in INTENT_BITS.items():
+            for wd in lexicon[name]:
+                word_bits[wd] = word_bits.get(wd, 0) | bit
+        actree = medical_lexicon.new_automaton()
+        for word, bit in word_bits.items():
+            actree.add_word(word, bit)
         actree.make_automaton()
         return actree
 
+    '''实体抽取：返回(start, end, word, types)片段列表，重叠片段按最左最长规则消解'''
+    def extract_entities(self, question):
+        return self.lexicon.extract(question)
+
+    '''将实体片段转换为{word: types}字典'''
+    @staticmethod
+    def spans_to_dict(spans):
+        return {wd: types for _, _, wd, types in spans}
+
     '''问句过滤'''
     def check_medical(self, question):
-        region_wds = []
-        for i in self.region_tree.iter(question):
-            wd = i[1][1]
-            region_wds.append(wd)
-        stop_wds = []
-        for wd1 in region_wds:
-            for wd2 in region_wds:
-                if wd1 in wd2 and wd1 != wd2:
-                    stop_wds.append(wd1)
-        final_wds = [i for i in region_wds if i not in stop_wds]
-        final_dict = {i:self.wdtype_dict.get(i) for i in final_wds}
-
-        return final_dict
+        return self.spans_to_dict(self.extract_entities(question))
+
+    '''扫描问句，返回命中的疑问词意图掩码'''
+    def check_intents(self, sent):
+        intents = 0
+        for _, bit in self.intent_tree.iter(sent):
+            intents |= bit
+        return intents
 
     '''基于特征词进行分类'''
     def check_words(self, wds, sent):
@@ -219,9 +287,60 @@ class QuestionClassifier:
         return False
 
 
+# 进程池子进程使用的分类器，fork前由classify_many设置
+_pool_classifier = None
+# 子进程内复用的命中缓冲区
+_pool_buffer = {}
+
+
+def _pool_start_method():
+    # fork可让子进程直接继承父进程中已加载的actree
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return 'fork'
+    return None
+
+
+def _classify_in_worker(question):
+    global _pool_classifier
+    if _pool_classifier is None:
+        # 非fork启动方式下子进程需自行加载（走快照）
+        _pool_classifier = QuestionClassifier()
+    return _pool_classifier.classify(question, _pool_buffer)
+
+
+def _classify_chunk_in_worker(questions):
+    return [_classify_in_worker(question) for question in questions]
+
+
+def _bounded_imap(pool, questions, chunksize, max_chunks):
+    """按输入顺序产出分类结果；Pool.imap会一次读完输入，这里每次只从迭代器取够max_chunks块"""
+    questions = iter(questions)
+    pending = collections.deque()
+    while True:
+        while len(pending) < max_chunks:
+            chunk = list(itertools.islice(questions, chunksize))
+            if not chunk:
+                break
+            pending.append(pool.apply_async(_classify_chunk_in_worker, (chunk,)))
+        if not pending:
+            return
+        yield from pending.popleft().get()
+
+
 if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='问句分类')
+    arg_parser.add_argument('input', nargs='?', help='每行一个问句的文件，给出时按批量模式输出JSON行')
+    arg_parser.add_argument('--processes', type=int, default=1, help='批量模式进程数')
+    args = arg_parser.parse_args()
     handler = QuestionClassifier()
-    while 1:
-        question = input('input an question:')
-        data = handler.classify(question)
-        print(data)
\ No newline at end of file
+    if args.input:
+        with open(args.input, encoding='utf-8') as f:
+            questions = [line.strip() for line in f]
+            for question, data in zip(questions, handler.classify_many(questions, processes=args.processes)):
+                print(json.dumps({'question': question, 'result': data}, ensure_ascii=False))
+        print('%(count)d questions in %(seconds).2fs, %(qps).1f questions/sec' % handler.batch_stats, file=sys.stderr)
+    else:
+        while 1:
+            question = input('input an question:')
+            data = handler.classify(question)
+            print(data)
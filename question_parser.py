@@ -4,6 +4,136 @@
 # Author: lhy<lhy_in_blcu@126.com,https://huangyong.github.io>
 # Date: 18-10-4
 
+# 各问题类型查询时所用的实体类型
+QUESTION_ENTITY_TYPES = {
+    'disease_symptom': 'disease',
+    'symptom_disease': 'symptom',
+    'disease_cause': 'disease',
+    'disease_acompany': 'disease',
+    'disease_not_food': 'disease',
+    'disease_do_food': 'disease',
+    'food_not_disease': 'food',
+    'food_do_disease': 'food',
+    'disease_drug': 'disease',
+    'drug_disease': 'drug',
+    'disease_check': 'disease',
+    'check_disease': 'check',
+    'disease_prevent': 'disease',
+    'disease_lasttime': 'disease',
+    'disease_cureway': 'disease',
+    'disease_cureprob': 'disease',
+    'disease_easyget': 'disease',
+    'disease_desc': 'disease',
+}
+
+# 各问题类型的中文名称，用于提示未能及时回答的内容
+QUESTION_TYPE_NAMES = {
+    'disease_symptom': '疾病症状',
+    'symptom_disease': '症状对应的疾病',
+    'disease_cause': '病因',
+    'disease_acompany': '并发症',
+    'disease_not_food': '忌口食物',
+    'disease_do_food': '宜吃食物',
+    'food_not_disease': '忌吃该食物的疾病',
+    'food_do_disease': '宜吃该食物的疾病',
+    'disease_drug': '常用药品',
+    'drug_disease': '药品主治疾病',
+    'disease_check': '诊断检查',
+    'check_disease': '检查对应的疾病',
+    'disease_prevent': '预防措施',
+    'disease_lasttime': '治疗周期',
+    'disease_cureway': '治疗方式',
+    'disease_cureprob': '治愈概率',
+    'disease_easyget': '易感人群',
+    'disease_desc': '疾病简介',
+}
+
+# 服务端去重截断：按主体聚合关联实体，只取前$limit个，每个主体返回一行
+COLLECT_M = 'collect(DISTINCT m.name)[..$limit]'
+COLLECT_N = 'collect(DISTINCT n.name)[..$limit]'
+# 聚合前按被聚合的名称排序，collect保持输入顺序，截取的前$limit个因此与执行计划无关
+ORDER_CLAUSES = {COLLECT_M: ' WITH * ORDER BY m.name', COLLECT_N: ' WITH * ORDER BY n.name'}
+
+# 各问题类型的Cypher模板：(匹配子句列表, [(返回列名, 表达式), ...])
+# 实体列表以$names参数整体传入并UNWIND展开，每种类型一次往返即可覆盖全部实体；
+# 多个匹配子句以UNION ALL合并为一条查询
+CYPHER_TEMPLATES = {
+    # 查询疾病的原因
+    'disease_cause': (["MATCH (m:Disease) where m.name = name"], [('m.name', 'm.name'), ('m.cause', 'm.cause')]),
+    # 查询疾病的防御措施
+    'disease_prevent': (["MATCH (m:Disease) where m.name = name"], [('m.name', 'm.name'), ('m.prevent', 'm.prevent')]),
+    # 查询疾病的持续时间
+    'disease_lasttime': (["MATCH (m:Disease) where m.name = name"], [('m.name', 'm.name'), ('m.cure_lasttime', 'm.cure_lasttime')]),
+    # 查询疾病的治愈概率
+    'disease_cureprob': (["MATCH (m:Disease) where m.name = name"], [('m.name', 'm.name'), ('m.cured_prob', 'm.cured_prob')]),
+    # 查询疾病的治疗方式
+    'disease_cureway': (["MATCH (m:Disease) where m.name = name"], [('m.name', 'm.name'), ('m.cure_way', 'm.cure_way')]),
+    # 查询疾病的易发人群
+    'disease_easyget': (["MATCH (m:Disease) where m.name = name"], [('m.name', 'm.name'), ('m.easy_get', 'm.easy_get')]),
+    # 查询疾病的相关介绍
+    'disease_desc': (["MATCH (m:Disease) where m.name = name"], [('m.name', 'm.name'), ('m.desc', 'm.desc')]),
+    # 查询疾病有哪些症状
+    'disease_symptom': (["MATCH (m:Disease)-[r:has_symptom]->(n:Symptom) where m.name = name"], [('m.name', 'm.name'), ('n.name', COLLECT_N)]),
+    # 查询症状会导致哪些疾病
+    'symptom_disease': (["MATCH (m:Disease)-[r:has_symptom]->(n:Symptom) where n.name = name"], [('n.name', 'n.name'), ('m.name', COLLECT_M)]),
+    # 查询疾病的并发症（不区分方向）
+    'disease_acompany': (["MATCH (m:Disease)-[r:acompany_with]-(n:Disease) where m.name = name"], [('m.name', 'm.name'), ('n.name', COLLECT_N)]),
+    # 查询疾病的忌口
+    'disease_not_food': (["MATCH (m:Disease)-[r:no_eat]->(n:Food) where m.name = name"], [('m.name', 'm.name'), ('n.name', COLLECT_N)]),
+    # 查询疾病建议吃的东西，宜吃与推荐食谱分别聚合
+    'disease_do_food': (["MATCH (m:Disease)-[r:do_eat|recommand_eat]->(n:Food) where m.name = name"], [('m.name', 'm.name'), ('r.name', 'r.name'), ('n.name', COLLECT_N)]),
+    # 已知忌口查疾病
+    'food_not_disease': (["MATCH (m:Disease)-[r:no_eat]->(n:Food) where n.name = name"], [('n.name', 'n.name'), ('m.name', COLLECT_M)]),
+    # 已知推荐查疾病
+    'food_do_disease': (["MATCH (m:Disease)-[r:do_eat|recommand_eat]->(n:Food) where n.name = name"], [('n.name', 'n.name'), ('m.name', COLLECT_M)]),
+    # 查询疾病常用药品－药品别名记得扩充
+    'disease_drug': (["MATCH (m:Disease)-[r:common_drug|recommand_drug]->(n:Drug) where m.name = name"], [('m.name', 'm.name'), ('n.name', COLLECT_N)]),
+    # 已知药品查询能够治疗的疾病
+    'drug_disease': (["MATCH (m:Disease)-[r:common_drug|recommand_drug]->(n:Drug) where n.name = name"], [('n.name', 'n.name'), ('m.name', COLLECT_M)]),
+    # 查询疾病应该进行的检查
+    'disease_check': (["MATCH (m:Disease)-[r:need_check]->(n:Check) where m.name = name"], [('m.name', 'm.name'), ('n.name', COLLECT_N)]),
+    # 已知检查查询疾病
+    'check_disease': (["MATCH (m:Disease)-[r:need_check]->(n:Check) where n.name = name"], [('n.name', 'n.name'), ('m.name', COLLECT_M)]),
+}
+
+
+def order_clause(columns):
+    """聚合类模板在聚合前的排序子句，属性类模板为空串"""
+    return ''.join(ORDER_CLAUSES.get(expr, '') for _, expr in columns)
+
+
+def build_query(question_type):
+    """由模板生成该问题类型的查询语句"""
+    matches, columns = CYPHER_TEMPLATES[question_type]
+    return_clause = order_clause(columns) + ' return ' + ', '.join('%s AS `%s`' % (expr, column) for column, expr in columns)
+    return ' UNION ALL '.join('UNWIND $names AS name ' + match + return_clause for match in matches)
+
+
+# 预先生成的查询语句，每种类型文本固定，便于Neo4j复用缓存的执行计划
+CYPHER_QUERIES = {question_type: build_query(question_type) for question_type in CYPHER_TEMPLATES}
+
+
+def build_combined_query(sqls):
+    """将一个问句涉及的多个问题类型合并为一条UNION ALL查询
+
+    每个分支返回question_type标签及以原列名为键的row映射，便于按类型拆分结果；
+    聚合先在WITH中完成，再组装为映射返回。
+    """
+    branches = []
+    params = {}
+    for index, sql_ in enumerate(sqls):
+        question_type = sql_['question_type']
+        matches, columns = CYPHER_TEMPLATES[question_type]
+        param = 'names_%d' % index
+        params[param] = list(sql_['entities'])
+        with_clause = order_clause(columns) + ' WITH ' + ', '.join('%s AS c%d' % (expr, i) for i, (_, expr) in enumerate(columns))
+        row = ', '.join('`%s`: c%d' % (column, i) for i, (column, _) in enumerate(columns))
+        return_clause = " return '%s' AS question_type, {%s} AS row" % (question_type, row)
+        for match in matches:
+            branches.append('UNWIND $%s AS name %s%s%s' % (param, match, with_clause, return_clause))
+    return ' UNION ALL '.join(branches), params
+
+
 class QuestionPaser:
 
     '''构建实体节点'''
@@ -28,62 +158,15 @@ class QuestionPaser:
             sql_ = {}
             sql_['question_type'] = question_type
             sql = []
-            if question_type == 'disease_symptom':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'symptom_disease':
-                sql = self.sql_transfer(question_type, entity_dict.get('symptom'))
-
-            elif question_type == 'disease_cause':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'disease_acompany':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'disease_not_food':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'disease_do_food':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'food_not_disease':
-                sql = self.sql_transfer(question_type, entity_dict.get('food'))
-
-            elif question_type == 'food_do_disease':
-                sql = self.sql_transfer(question_type, entity_dict.get('food'))
-
-            elif question_type == 'disease_drug':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'drug_disease':
-                sql = self.sql_transfer(question_type, entity_dict.get('drug'))
-
-            elif question_type == 'disease_check':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'check_disease':
-                sql = self.sql_transfer(question_type, entity_dict.get('check'))
-
-            elif question_type == 'disease_prevent':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'disease_lasttime':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'disease_cureway':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'disease_cureprob':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'disease_easyget':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
-
-            elif question_type == 'disease_desc':
-                sql = self.sql_transfer(question_type, entity_dict.get('disease'))
+            entities = []
+            if question_type in QUESTION_ENTITY_TYPES:
+                entities = entity_dict.get(QUESTION_ENTITY_TYPES[question_type]) or []
+                sql = self.sql_transfer(question_type, entities)
 
             if sql:
                 sql_['sql'] = sql
+                # 查询涉及的实体，供缓存与本地后端使用
+                sql_['entities'] = entities
 
                 sqls.append(sql_)
 
@@ -94,87 +177,10 @@ class QuestionPaser:
         if not entities:
             return []
 
-        # 查询语句
+        # 查询语句：(Cypher, 参数)，全部实体通过$names参数一次传入
         sql = []
-        # 查询疾病的原因
-        if question_type == 'disease_cause':
-            sql = ["MATCH (m:Disease) where m.name = '{0}' return m.name, m.cause".format(i) for i in entities]
-
-        # 查询疾病的防御措施
-        elif question_type == 'disease_prevent':
-            sql = ["MATCH (m:Disease) where m.name = '{0}' return m.name, m.prevent".format(i) for i in entities]
-
-        # 查询疾病的持续时间
-        elif question_type == 'disease_lasttime':
-            sql = ["MATCH (m:Disease) where m.name = '{0}' return m.name, m.cure_lasttime".format(i) for i in entities]
-
-        # 查询疾病的治愈概率
-        elif question_type == 'disease_cureprob':
-            sql = ["MATCH (m:Disease) where m.name = '{0}' return m.name, m.cured_prob".format(i) for i in entities]
-
-        # 查询疾病的治疗方式
-        elif question_type == 'disease_cureway':
-            sql = ["MATCH (m:Disease) where m.name = '{0}' return m.name, m.cure_way".format(i) for i in entities]
-
-        # 查询疾病的易发人群
-        elif question_type == 'disease_easyget':
-            sql = ["MATCH (m:Disease) where m.name = '{0}' return m.name, m.easy_get".format(i) for i in entities]
-
-        # 查询疾病的相关介绍
-        elif question_type == 'disease_desc':
-            sql = ["MATCH (m:Disease) where m.name = '{0}' return m.name, m.desc".format(i) for i in entities]
-
-        # 查询疾病有哪些症状
-        elif question_type == 'disease_symptom':
-            sql = ["MATCH (m:Disease)-[r:has_symptom]->(n:Symptom) where m.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-
-        # 查询症状会导致哪些疾病
-        elif question_type == 'symptom_disease':
-            sql = ["MATCH (m:Disease)-[r:has_symptom]->(n:Symptom) where n.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-
-        # 查询疾病的并发症
-        elif question_type == 'disease_acompany':
-            sql1 = ["MATCH (m:Disease)-[r:acompany_with]->(n:Disease) where m.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-            sql2 = ["MATCH (m:Disease)-[r:acompany_with]->(n:Disease) where n.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-            sql = sql1 + sql2
-        # 查询疾病的忌口
-        elif question_type == 'disease_not_food':
-            sql = ["MATCH (m:Disease)-[r:no_eat]->(n:Food) where m.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-
-        # 查询疾病建议吃的东西
-        elif question_type == 'disease_do_food':
-            sql1 = ["MATCH (m:Disease)-[r:do_eat]->(n:Food) where m.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-            sql2 = ["MATCH (m:Disease)-[r:recommand_eat]->(n:Food) where m.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-            sql = sql1 + sql2
-
-        # 已知忌口查疾病
-        elif question_type == 'food_not_disease':
-            sql = ["MATCH (m:Disease)-[r:no_eat]->(n:Food) where n.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-
-        # 已知推荐查疾病
-        elif question_type == 'food_do_disease':
-            sql1 = ["MATCH (m:Disease)-[r:do_eat]->(n:Food) where n.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-            sql2 = ["MATCH (m:Disease)-[r:recommand_eat]->(n:Food) where n.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-            sql = sql1 + sql2
-
-        # 查询疾病常用药品－药品别名记得扩充
-        elif question_type == 'disease_drug':
-            sql1 = ["MATCH (m:Disease)-[r:common_drug]->(n:Drug) where m.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-            sql2 = ["MATCH (m:Disease)-[r:recommand_drug]->(n:Drug) where m.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-            sql = sql1 + sql2
-
-        # 已知药品查询能够治疗的疾病
-        elif question_type == 'drug_disease':
-            sql1 = ["MATCH (m:Disease)-[r:common_drug]->(n:Drug) where n.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-            sql2 = ["MATCH (m:Disease)-[r:recommand_drug]->(n:Drug) where n.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-            sql = sql1 + sql2
-        # 查询疾病应该进行的检查
-        elif question_type == 'disease_check':
-            sql = ["MATCH (m:Disease)-[r:need_check]->(n:Check) where m.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
-
-        # 已知检查查询疾病
-        elif question_type == 'check_disease':
-            sql = ["MATCH (m:Disease)-[r:need_check]->(n:Check) where n.name = '{0}' return m.name, r.name, n.name".format(i) for i in entities]
+        if question_type in CYPHER_QUERIES:
+            sql = [(CYPHER_QUERIES[question_type], {'names': list(entities)})]
 
         return sql
 
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 问答缓存测试：LRU淘汰与过期，问句缓存、查询缓存、负缓存的命中，图谱重建后清空，库中版本指针的同步
+
+import time
+import pytest
+import chatbot_graph
+import graph_engine
+from answer_cache import LRUCache, MISSING, PointerCheck, active_namespace, graph_version, sync_graph_version
+from bench_import import write_synthetic_data
+from build_medicalgraph import MedicalGraph
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    # b最久未使用，被淘汰
+    cache.set('c', 3)
+    assert cache.get('b') is MISSING
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    stats = cache.stats()
+    assert (stats['size'], stats['evictions'], stats['hits'], stats['misses']) == (2, 1, 3, 1)
+
+
+def test_ttl_expiry():
+    cache = LRUCache(maxsize=10, ttl=0.05)
+    cache.set('a', None)
+    cache.set('b', 2, ttl=10)
+    # 缓存的None与未命中区分
+    assert cache.get('a') is None
+    time.sleep(0.06)
+    assert cache.get('a') is MISSING
+    assert cache.get('b') == 2
+    assert cache.stats()['size'] == 1
+    cache.clear()
+    assert cache.get('b') is MISSING
+
+
+class CountingSearcher:
+    """记录查询次数的检索器，回复为问题类型与实体"""
+    combined = False
+
+    def __init__(self):
+        self.calls = 0
+
+    def search_answers(self, sqls, timeout=None):
+        self.calls += 1
+        return ['%s:%s' % (sql_['question_type'], '、'.join(sql_['entities'])) for sql_ in sqls]
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    handler = MedicalGraph(connect=False, node_cache=False)
+    handler.data_path = write_synthetic_data(str(tmp_path / 'medical.json'), 20)
+    monkeypatch.setattr(graph_engine, '_engine', graph_engine.GraphEngine.from_nodes(handler.read_nodes()))
+    version = {'value': (1, 1)}
+    monkeypatch.setattr(chatbot_graph, 'graph_version', lambda: version['value'])
+    bot = chatbot_graph.ChatBotGraph(backend='memory')
+    bot.searcher = CountingSearcher()
+    bot.version = version
+    return bot
+
+
+def disease_word(bot):
+    return sorted(word for word, types in bot.classifier.wdtype_dict.items() if types == ['disease'])[0]
+
+
+def test_answer_and_query_cache(bot):
+    disease = disease_word(bot)
+    answer = bot.chat_main('%s有什么症状' % disease)
+    assert answer == 'disease_symptom:%s' % disease
+    # 问句规范化（合并空白）后命中问句缓存
+    assert bot.chat_main('  %s有什么症状\t' % disease) == answer
+    assert bot.searcher.calls == 1
+    # 措辞不同但问题类型与实体相同，命中查询缓存
+    assert bot.chat_main('%s的表现' % disease) == answer
+    assert bot.searcher.calls == 1
+    stats = bot.cache_stats()
+    assert (stats['answer']['hits'], stats['query']['hits']) == (1, 1)
+
+
+def test_negative_cache(bot, monkeypatch):
+    calls = []
+    classify = bot.classifier.classify
+    monkeypatch.setattr(bot.classifier, 'classify', lambda sent: calls.append(sent) or classify(sent))
+    assert bot.chat_main('今天天气不错') == chatbot_graph.DEFAULT_ANSWER
+    assert bot.chat_main('今天天气不错') == chatbot_graph.DEFAULT_ANSWER
+    assert len(calls) == 1
+    assert bot.cache_stats()['negative']['hits'] == 1
+    assert bot.searcher.calls == 0
+
+
+def test_graph_version_change_clears_caches(bot):
+    disease = disease_word(bot)
+    bot.chat_main('%s有什么症状' % disease)
+    bot.chat_main('今天天气不错')
+    bot.chat_main('%s有什么症状' % disease)
+    assert bot.searcher.calls == 1
+    bot.version['value'] = (1, 2)
+    bot.chat_main('%s有什么症状' % disease)
+    assert bot.searcher.calls == 2
+    stats = bot.cache_stats()
+    # 清空后只剩重新查询写入的一条
+    assert (stats['answer']['size'], stats['query']['size'], stats['negative']['size']) == (1, 1, 0)
+
+
+def test_sync_pointer_to_local_version(tmp_path):
+    path = str(tmp_path / 'graph_version')
+    assert active_namespace(path) == ''
+    # 库中没有指针时沿用本机记录
+    assert not sync_graph_version(None, path)
+    assert graph_version(path) is None
+    assert sync_graph_version({'stamp': 1, 'namespace': 'g1'}, path)
+    version = graph_version(path)
+    assert active_namespace(path) == 'g1'
+    # 指针未变化时不替换版本戳，各进程的缓存不被清空
+    assert not sync_graph_version({'stamp': 1, 'namespace': 'g1'}, path)
+    assert graph_version(path) == version
+    # 其他主机回退到旧版本
+    assert sync_graph_version({'stamp': 2, 'namespace': ''}, path)
+    assert active_namespace(path) == '' and graph_version(path) != version
+
+
+def test_pointer_check_interval():
+    check = PointerCheck(interval=0.05)
+    assert check.due()
+    assert not check.due()
+    time.sleep(0.06)
+    assert check.due()
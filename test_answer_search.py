@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 答案检索测试：限时查询时单个问题类型出错或超时只影响该类型，其余类型照常返回
+
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from answer_search import AnswerSearcher
+
+
+class FakeSearcher(AnswerSearcher):
+    """按查询文本决定结果：fail抛出错误，slow超过截止时间，其余返回一行"""
+    def __init__(self, pool_size):
+        self.num_limit = 20
+        self.combined = False
+        self.executor = ThreadPoolExecutor(max_workers=pool_size) if pool_size > 1 else None
+
+    def run_queries(self, queries, deadline=None):
+        query, params = queries[0]
+        if query == 'fail':
+            raise RuntimeError('connection reset')
+        if query == 'slow':
+            time.sleep(max(deadline - time.monotonic(), 0) + 0.05)
+            raise TimeoutError('transaction timed out')
+        return [{'m.name': params['names'][0], 'n.name': '头痛'}]
+
+
+def sql(question_type, query):
+    return {'question_type': question_type, 'entities': ['感冒'], 'sql': [(query, {'names': ['感冒']})]}
+
+
+@pytest.mark.parametrize('pool_size', [1, 4])
+def test_failed_type_does_not_drop_others(pool_size, capsys):
+    searcher = FakeSearcher(pool_size)
+    answers = searcher.search_answers([
+        sql('disease_symptom', 'ok'),
+        sql('disease_cause', 'fail'),
+        sql('disease_acompany', 'slow'),
+    ], timeout=0.2)
+    assert answers[0].startswith('感冒的症状包括：')
+    assert answers[1:] == [None, None]
+    # 出错的类型记录错误，超时的类型不作为错误记录
+    out = capsys.readouterr().out
+    assert out.count('查询失败') == 1 and 'connection reset' in out
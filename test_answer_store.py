@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 预计算答案库测试：由内存图谱生成答案库，按(问题类型, 实体)查表，过期、重新生成与生成失败时的行为
+
+import io
+import os
+import tempfile
+import contextlib
+import multiprocessing
+import pytest
+import graph_engine
+import answer_store
+from answer_cache import MISSING
+from answer_store import AnswerStore, build_store
+from bench_import import write_synthetic_data
+from build_medicalgraph import MedicalGraph
+from graph_engine import GraphEngine, LocalAnswerSearcher
+
+TASKS = [('disease_symptom', ['疾病1', '疾病2']), ('disease_cause', ['疾病1', '不存在的疾病'])]
+
+
+@pytest.fixture
+def searcher():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        handler = MedicalGraph(connect=False, node_cache=False)
+        handler.data_path = write_synthetic_data(os.path.join(tmp_dir, 'medical.json'), 50)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return LocalAnswerSearcher(GraphEngine.from_nodes(handler.read_nodes()))
+
+
+@pytest.fixture
+def patched(monkeypatch, searcher):
+    monkeypatch.setattr(answer_store, 'build_tasks', lambda chunksize=500: TASKS)
+    monkeypatch.setattr(answer_store, 'new_searcher', lambda backend: searcher)
+    monkeypatch.setattr(answer_store, 'graph_version', lambda: (1, 1))
+
+
+@pytest.fixture
+def store_path(tmp_path, patched):
+    path = str(tmp_path / 'answers.sqlite')
+    stamp = build_store(path, backend='neo4j', processes=1)
+    assert stamp['count'] == 4
+    return path
+
+
+def test_get_single_entity(store_path, searcher):
+    store = AnswerStore(store_path)
+    assert store.current
+    expected = searcher.search_answers([{'question_type': 'disease_symptom', 'entities': ['疾病1']}])[0]
+    assert expected and store.get('disease_symptom', ['疾病1']) == expected
+    # 图谱中没有结果的实体也已预计算，回复为空串
+    assert store.get('disease_cause', ['不存在的疾病']) == ''
+    # 多实体查询与未预计算的键均未命中
+    assert store.get('disease_symptom', ['疾病1', '疾病2']) is MISSING
+    assert store.get('disease_drug', ['疾病1']) is MISSING
+    stats = store.stats()
+    assert (stats['hits'], stats['misses'], stats['count']) == (2, 1, 4)
+
+
+def test_stale_after_graph_rebuild(store_path, monkeypatch):
+    store = AnswerStore(store_path)
+    monkeypatch.setattr(answer_store, 'graph_version', lambda: (1, 2))
+    assert not store.refresh()
+    assert store.get('disease_symptom', ['疾病1']) is MISSING
+
+
+def test_failed_build_leaves_no_tmp_file(tmp_path, monkeypatch):
+    def fail(backend):
+        raise RuntimeError('graph unavailable')
+    monkeypatch.setattr(answer_store, 'build_tasks', lambda chunksize=500: TASKS)
+    monkeypatch.setattr(answer_store, 'new_searcher', fail)
+    path = str(tmp_path / 'answers.sqlite')
+    with pytest.raises(RuntimeError):
+        build_store(path, backend='neo4j', processes=1)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_store_built_after_open_is_picked_up(tmp_path, patched):
+    path = str(tmp_path / 'answers.sqlite')
+    store = AnswerStore(path)
+    assert store.get('disease_symptom', ['疾病1']) is MISSING
+    assert not store.stats()['current']
+    build_store(path, backend='neo4j', processes=1)
+    assert store.get('disease_symptom', ['疾病1'])
+    assert store.stats()['current']
+
+
+def test_memory_store_stale_after_data_change(tmp_path, patched, monkeypatch):
+    data_path = write_synthetic_data(str(tmp_path / 'medical.json'), 50)
+    monkeypatch.setattr(graph_engine, 'DATA_PATH', data_path)
+    path = str(tmp_path / 'answers.sqlite')
+    build_store(path, backend='memory', processes=1)
+    store = AnswerStore(path)
+    assert store.get('disease_symptom', ['疾病1'])
+    with open(data_path, 'a', encoding='utf-8') as f:
+        f.write('{"name": "新疾病"}\n')
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert store.get('disease_symptom', ['疾病1']) is MISSING
+    assert not store.stats()['current']
+
+
+def worker_backend(_):
+    return answer_store._pool_backend
+
+
+def test_pool_workers_receive_backend():
+    # spawn启动的子进程不继承父进程设置的全局变量
+    with multiprocessing.get_context('spawn').Pool(1, initializer=answer_store._init_worker, initargs=('memory',)) as pool:
+        assert pool.map(worker_backend, [0]) == ['memory']
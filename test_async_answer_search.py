@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 异步答案检索测试：限时查询按截止时刻分配事务超时，单个问题类型出错不影响整批回复
+
+import asyncio
+from async_answer_search import AsyncAnswerSearcher
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def data(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def run(self, query, params):
+        self.driver.timeouts.append(query.timeout)
+        await asyncio.sleep(self.driver.delay)
+        if 'fail' in query.text:
+            raise RuntimeError('query failed')
+        return FakeResult([{'m.name': params['name'], 'n.name': '头痛'}])
+
+
+class FakeDriver:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.timeouts = []
+
+    def session(self, **kwargs):
+        return FakeSession(self)
+
+    async def close(self):
+        pass
+
+
+def new_searcher(delay=0.0):
+    searcher = AsyncAnswerSearcher.__new__(AsyncAnswerSearcher)
+    searcher.driver = FakeDriver(delay)
+    searcher.num_limit = 20
+    searcher.combined = False
+    return searcher
+
+
+def sql(question_type, query, count=1):
+    return {'question_type': question_type, 'sql': [(query, {'name': '感冒'})] * count}
+
+
+def test_timeouts_shrink_towards_deadline():
+    searcher = new_searcher(delay=0.05)
+    asyncio.run(searcher.run_queries(sql('disease_symptom', 'MATCH (m) RETURN m', 3)['sql'], timeout=1.0))
+    timeouts = searcher.driver.timeouts
+    assert len(timeouts) == 3
+    assert timeouts[0] <= 1.0
+    assert timeouts[0] - timeouts[2] >= 0.09
+
+
+def test_failed_question_type_returns_none():
+    searcher = new_searcher()
+    answers = asyncio.run(searcher.search_answers([
+        sql('disease_symptom', 'MATCH (m) RETURN m'),
+        sql('disease_cause', 'fail'),
+    ], timeout=1.0))
+    assert answers[0].startswith('感冒的症状包括：')
+    assert answers[1] is None
+
+
+def test_budget_exhausted_before_last_query():
+    searcher = new_searcher(delay=0.2)
+    answers = asyncio.run(searcher.search_answers([sql('disease_symptom', 'MATCH (m) RETURN m', 3)], timeout=0.3))
+    assert answers == [None]
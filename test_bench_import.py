@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 导入基准测试：合成数据上的完整运行，与基线比较时的退出码，改造前写法的计数
+
+import io
+import json
+import contextlib
+import bench_import
+
+
+def run_main(argv):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        code = bench_import.main(argv)
+    return code, out.getvalue()
+
+
+def test_baseline_regression_exit_code(tmp_path):
+    baseline_path = str(tmp_path / 'baseline.json')
+    code, _ = run_main(['--synthetic', '50', '--output', baseline_path])
+    assert code == 0
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    assert [name for name, _, _ in bench_import.STRATEGIES] == list(baseline['strategies'])
+    # 与自身比较没有回退
+    code, out = run_main(['--synthetic', '50', '--baseline', baseline_path])
+    assert code == 0 and 'regression' not in out
+    # 基线中的往返次数调低后，本次运行即超出容差
+    baseline['strategies']['batch-1000']['round_trips'] //= 2
+    with open(baseline_path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f)
+    code, out = run_main(['--synthetic', '50', '--baseline', baseline_path])
+    assert code == 1
+    assert 'regression: batch-1000 round_trips' in out
+
+
+def test_legacy_counts_one_statement_per_node_and_edge(tmp_path):
+    data_path = bench_import.write_synthetic_data(str(tmp_path / 'medical.json'), 50)
+    report = bench_import.run_benchmark(data_path, strategies=[('legacy-per-node', None, 1), ('unwind-1', 1, 1)])
+    legacy, unwind = report['strategies']['legacy-per-node'], report['strategies']['unwind-1']
+    total = report['nodes'] + report['relationships']
+    assert legacy['statements'] == legacy['transactions'] == legacy['rows'] == total
+    # 每个节点一次显式事务（BEGIN随语句发出，另有COMMIT），每条边一次自动提交
+    assert legacy['round_trips'] == report['nodes'] * 2 + report['relationships']
+    assert unwind['rows'] == total
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 图谱导入测试：CSV导出，增量更新的变更集与写入行，线上命名空间的保护
+
+import io
+import os
+import csv
+import json
+import contextlib
+import build_medicalgraph
+import lexicon_snapshot
+from bench_import import DryRunCursor, DryRunGraph, DryRunMedicalGraph, write_synthetic_data
+from build_progress import Checkpoint
+from build_medicalgraph import MedicalGraph, CSV_ARRAY_DELIMITER, DISEASE_INFOS
+from answer_cache import POINTER_QUERY
+
+
+class RecordingGraph(DryRunGraph):
+    """记录每条语句及其参数的替身Graph"""
+    def __init__(self):
+        DryRunGraph.__init__(self)
+        self.executed = []
+
+    def execute(self, query, params, autocommit):
+        with self.lock:
+            self.executed.append((query, params))
+        return DryRunGraph.execute(self, query, params, autocommit)
+
+    def rows_of(self, fragment):
+        return [row for query, params in self.executed if fragment in query for row in params.get('rows', ())]
+
+
+def new_handler(tmp_path, diseases=20, edit=None):
+    """生成合成数据，edit可修改其中的疾病记录"""
+    data_path = write_synthetic_data(str(tmp_path / 'medical.json'), diseases)
+    if edit is not None:
+        with open(data_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        edit(records)
+        with open(data_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    handler = MedicalGraph(connect=False, node_cache=False)
+    handler.data_path = data_path
+    return handler
+
+
+def test_export_csv_string_array_property(tmp_path):
+    def edit(records):
+        records[0]['cure_way'] = '药物治疗'
+    handler = new_handler(tmp_path, edit=edit)
+    output_dir = str(tmp_path / 'csv')
+    with contextlib.redirect_stdout(io.StringIO()):
+        handler.export_csv(output_dir)
+    with open(os.path.join(output_dir, 'disease.csv'), encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]['cure_way:string[]'] == '药物治疗'
+    assert rows[1]['cure_way:string[]'] == CSV_ARRAY_DELIMITER.join(['药物治疗', '手术治疗'])
+
+
+def edit_diseases(records):
+    records[0]['desc'] = '修改后的简介'
+    # 疾病1新增一条同名记录
+    records.append(dict(records[1], desc='同名的另一条记录'))
+    del records[2]
+    records.append(dict(records[3], name='新疾病', desc='新疾病的简介', symptom=['症状0']))
+
+
+def test_disease_hashes_use_node_cache(tmp_path):
+    handler = new_handler(tmp_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        nodes = handler.read_nodes()
+    os.remove(handler.data_path)
+    hashes = handler.disease_hashes()
+    assert sorted(hashes) == sorted(disease_dict['name'] for disease_dict in nodes[DISEASE_INFOS])
+
+
+def test_diff_snapshot_and_apply_delta_rows(tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        old = new_handler(tmp_path)
+        snapshot = {'nodes': old.read_nodes(), 'hashes': old.disease_hashes()}
+        graph = RecordingGraph()
+        handler = DryRunMedicalGraph(graph)
+        handler.data_path = new_handler(tmp_path, edit=edit_diseases).data_path
+        changes = handler.diff_snapshot(snapshot)
+        handler.apply_delta(changes)
+    diseases = changes['diseases']
+    assert diseases == {'added': ['新疾病'], 'removed': ['疾病2'], 'changed': ['疾病0', '疾病1']}
+    nodes = handler.read_nodes()
+
+    # 新增、修改的疾病先按名称整体删除，再每条记录各建一个节点，同名的两条记录得到两个节点
+    assert graph.rows_of('DETACH DELETE n')[:3] == ['新疾病', '疾病0', '疾病1']
+    created = graph.rows_of('CREATE (n:Disease) SET n = row')
+    assert sorted((row['name'], row['desc']) for row in created) == [
+        ('新疾病', '新疾病的简介'), ('疾病0', '修改后的简介'), ('疾病1', '同名的另一条记录'), ('疾病1', '疾病1的简介')]
+    assert graph.rows_of('MATCH (n:Disease {name: name}) DETACH DELETE n')[-1:] == ['疾病2']
+
+    # 重建疾病的关系全部补回，其余疾病只写入新增的关系
+    upserts = {'新疾病', '疾病0', '疾病1'}
+    symptom_rows = graph.rows_of('-[:has_symptom')
+    expected = [list(edge) for edge in nodes[16] if edge[0] in upserts]
+    assert sorted(symptom_rows) == sorted(expected)
+    acompany_rows = graph.rows_of('-[:acompany_with')
+    assert all(p in upserts or q in upserts for p, q in acompany_rows)
+    assert sorted(acompany_rows) == sorted(list(edge) for edge in nodes[17] if edge[0] in upserts or edge[1] in upserts)
+
+
+def test_build_refuses_active_namespace(tmp_path, monkeypatch):
+    graph = RecordingGraph()
+    handler = DryRunMedicalGraph(graph)
+    handler.data_path = write_synthetic_data(str(tmp_path / 'medical.json'), 20)
+    handler.checkpoint_path = str(tmp_path / 'checkpoint.json')
+    handler.snapshot_path = str(tmp_path / 'snapshot.pkl')
+    monkeypatch.setattr(build_medicalgraph, 'active_namespace', lambda: 'g1')
+    handler.namespace = 'g1'
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert handler.build() is False
+    # 只读取了版本指针，没有写入
+    assert graph.executed == [(POINTER_QUERY, {})]
+    # 导入到其他命名空间（如蓝绿重建的新版本）不受影响
+    handler.namespace = 'g2'
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert handler.build() is True
+    assert graph.rows_of('CREATE (n:Disease_g2) SET n = row')
+
+
+class CountCursor(DryRunCursor):
+    def evaluate(self):
+        return self.rows[0]['count'] if self.rows else None
+
+
+class PopulatedGraph(RecordingGraph):
+    """labels中的标签各已有一个节点的替身Graph"""
+    def __init__(self, labels):
+        RecordingGraph.__init__(self)
+        self.labels = labels
+
+    def execute(self, query, params, autocommit):
+        RecordingGraph.execute(self, query, params, autocommit)
+        if query.endswith('RETURN count(n) AS count'):
+            return CountCursor([{'count': int(query.split(':')[1].split(')')[0] in self.labels)}])
+        return DryRunCursor([])
+
+
+def test_build_refuses_populated_namespace(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_medicalgraph, 'active_namespace', lambda: '')
+    graph = PopulatedGraph({'Symptom_g2'})
+    handler = DryRunMedicalGraph(graph)
+    handler.data_path = write_synthetic_data(str(tmp_path / 'medical.json'), 20)
+    handler.checkpoint_path = str(tmp_path / 'checkpoint.json')
+    handler.snapshot_path = str(tmp_path / 'snapshot.pkl')
+    handler.namespace = 'g2'
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert handler.build() is False
+    assert not [query for query, _ in graph.executed if query.startswith(('UNWIND', 'CREATE'))]
+    # 有可恢复的断点时继续上次中断的导入
+    fingerprint = {'data': lexicon_snapshot.file_signature(handler.data_path)['sha1'], 'batch_size': handler.batch_size,
+                   'workers': handler.workers, 'namespace': 'g2'}
+    Checkpoint(handler.checkpoint_path, fingerprint, resume=False).commit('Disease', 0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert handler.build(resume=True) is True
+    assert graph.rows_of('CREATE (n:Disease_g2) SET n = row') == []
+    # 空的命名空间照常导入
+    handler.namespace = 'g3'
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert handler.build() is True
+    assert graph.rows_of('CREATE (n:Disease_g3) SET n = row')
+
+
+def test_constraints_created_before_nodes(tmp_path):
+    graph = RecordingGraph()
+    handler = DryRunMedicalGraph(graph)
+    handler.data_path = write_synthetic_data(str(tmp_path / 'medical.json'), 20)
+    with contextlib.redirect_stdout(io.StringIO()):
+        handler.create_graphnodes()
+    queries = [query for query, _ in graph.executed]
+    first_write = min(index for index, query in enumerate(queries) if query.startswith('UNWIND'))
+    constraints = [index for index, query in enumerate(queries) if query.startswith('CREATE CONSTRAINT')]
+    assert len(constraints) == 6 and max(constraints) < first_write
+    # 实体节点按名称MERGE，重复导入不会产生重复节点
+    assert all('MERGE (n:' in query for query in queries if query.startswith('UNWIND $rows AS name'))
+
+
+def test_benchmark_rels_uses_throwaway_namespace(tmp_path, monkeypatch):
+    graph = RecordingGraph()
+    handler = DryRunMedicalGraph(graph)
+    handler.data_path = write_synthetic_data(str(tmp_path / 'medical.json'), 20)
+    monkeypatch.setattr(build_medicalgraph, 'active_namespace', lambda: '')
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert handler.benchmark_relationships(2) is not None
+    # 只改写临时命名空间，结束后删除，对外服务的版本不受影响
+    queries = [query for query, _ in graph.executed]
+    assert not [query for query in queries if ':Disease)' in query or ':Disease ' in query]
+    assert queries[-1].startswith('DROP INDEX disease_bench_name')
+    assert handler.namespace == ''
+    graph.executed.clear()
+    monkeypatch.setattr(build_medicalgraph, 'active_namespace', lambda: build_medicalgraph.BENCHMARK_NAMESPACE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert handler.benchmark_relationships(2) is None
+    # 只读取了版本指针，没有写入
+    assert graph.executed == [(POINTER_QUERY, {})]
+
+
+class FailingGraph(RecordingGraph):
+    """某一步骤的写入语句整批失败的替身Graph"""
+    def __init__(self, fragment):
+        RecordingGraph.__init__(self)
+        self.fragment = fragment
+
+    def execute(self, query, params, autocommit):
+        if self.fragment in query and params.get('rows'):
+            raise RuntimeError('connection reset')
+        return RecordingGraph.execute(self, query, params, autocommit)
+
+
+def test_blue_green_refuses_after_failed_batch(tmp_path, monkeypatch):
+    graph = FailingGraph('[:has_symptom')
+    handler = DryRunMedicalGraph(graph)
+    handler.data_path = write_synthetic_data(str(tmp_path / 'medical.json'), 20)
+    handler.checkpoint_path = str(tmp_path / 'checkpoint.json')
+    handler.snapshot_path = str(tmp_path / 'snapshot.pkl')
+    handler.failures_path = str(tmp_path / 'failures.jsonl')
+    activated = []
+    monkeypatch.setattr(build_medicalgraph, 'active_namespace', lambda: '')
+    monkeypatch.setattr(handler, 'activate', activated.append)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert handler.build_blue_green() is None
+    assert activated == []
+    assert handler.failed_batches and all(step == 'Disease-has_symptom->Symptom' for step, _ in handler.failed_batches)
+    # 断点保留，重试时只需重放失败的批次
+    assert os.path.exists(handler.checkpoint_path)
+    assert not os.path.exists(handler.snapshot_path)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 断点续传测试：导入中断后在新进程中恢复，每个名称恰好写入一次；断点与数据、批大小不符时作废
+
+import io
+import os
+import sys
+import json
+import subprocess
+import contextlib
+import pytest
+from bench_import import DryRunGraph, DryRunMedicalGraph, write_synthetic_data
+from build_progress import Checkpoint
+from build_medicalgraph import NODE_LABELS, DISEASE_INFOS
+
+cur_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class Interrupted(BaseException):
+    """模拟进程在导入途中退出，不被导入流程的错误处理捕获"""
+
+
+class BufferedTransaction:
+    def __init__(self, graph):
+        self.graph = graph
+        self.statements = []
+
+    def run(self, query, parameters=None, **kwparameters):
+        params = dict(parameters or {}, **kwparameters)
+        self.statements.append((query, params))
+        return self.graph.execute(query, params, False)
+
+
+class CommitLogGraph(DryRunGraph):
+    """只在提交时记录事务内写入的行；第interrupt_at条UNWIND语句执行时中断"""
+    def __init__(self, interrupt_at=None):
+        DryRunGraph.__init__(self)
+        self.interrupt_at = interrupt_at
+        self.unwinds = 0
+        self.committed = []
+
+    def execute(self, query, params, autocommit):
+        if query.startswith('UNWIND'):
+            with self.lock:
+                self.unwinds += 1
+                if self.unwinds == self.interrupt_at:
+                    raise Interrupted()
+        return DryRunGraph.execute(self, query, params, autocommit)
+
+    def begin(self, readonly=False):
+        return BufferedTransaction(self)
+
+    def commit(self, tx):
+        DryRunGraph.commit(self, tx)
+        with self.lock:
+            self.committed += tx.statements
+
+
+def new_handler(tmp_dir, graph, batch_size=7):
+    handler = DryRunMedicalGraph(graph, batch_size=batch_size)
+    handler.data_path = os.path.join(tmp_dir, 'medical.json')
+    handler.checkpoint_path = os.path.join(tmp_dir, 'checkpoint.json')
+    handler.snapshot_path = os.path.join(tmp_dir, 'snapshot.pkl')
+    return handler
+
+
+def written_nodes(statements):
+    """节点语句写入的(标签, 名称)"""
+    written = []
+    for query, params in statements:
+        if 'AS name MERGE (n:' in query:
+            label = query.split('MERGE (n:')[1].split(' ')[0]
+            written += [(label, name) for name in params['rows']]
+        elif 'CREATE (n:Disease) SET n = row' in query:
+            written += [('Disease', row['name']) for row in params['rows']]
+    return written
+
+
+def run_import(tmp_dir, log_path, interrupt_at=None):
+    """在子进程中执行一次导入，把已提交的节点写入log_path"""
+    graph = CommitLogGraph(interrupt_at)
+    handler = new_handler(tmp_dir, graph)
+    try:
+        handler.build(resume=True)
+    except Interrupted:
+        pass
+    finally:
+        with open(log_path, 'w', encoding='utf-8') as f:
+            json.dump(written_nodes(graph.committed), f, ensure_ascii=False)
+
+
+def test_resume_in_fresh_process_writes_each_name_once(tmp_path):
+    tmp_dir = str(tmp_path)
+    write_synthetic_data(os.path.join(tmp_dir, 'medical.json'), 200)
+    written = []
+    # 两次运行的字符串哈希种子不同，集合的迭代顺序随之不同
+    for seed, interrupt_at in (('1', 40), ('2', None)):
+        log_path = os.path.join(tmp_dir, 'written.%s.json' % seed)
+        code = 'import test_build_progress as t; t.run_import(%r, %r, %r)' % (tmp_dir, log_path, interrupt_at)
+        subprocess.run([sys.executable, '-c', code], cwd=cur_dir, check=True, stdout=subprocess.DEVNULL,
+                       env=dict(os.environ, PYTHONHASHSEED=seed))
+        with open(log_path, encoding='utf-8') as f:
+            written.append([tuple(node) for node in json.load(f)])
+    assert written[0] and written[1]
+    with contextlib.redirect_stdout(io.StringIO()):
+        nodes = new_handler(tmp_dir, None).read_nodes()
+    expected = [('Disease', disease_dict['name']) for disease_dict in nodes[DISEASE_INFOS]]
+    for label, index in NODE_LABELS.items():
+        expected += [(label, name) for name in nodes[index]]
+    assert sorted(written[0] + written[1]) == sorted(expected)
+    assert not os.path.exists(os.path.join(tmp_dir, 'checkpoint.json'))
+
+
+def test_resume_replays_only_unfinished_batches(tmp_path):
+    tmp_dir = str(tmp_path)
+    write_synthetic_data(os.path.join(tmp_dir, 'medical.json'), 100)
+    with contextlib.redirect_stdout(io.StringIO()):
+        full = CommitLogGraph()
+        new_handler(tmp_dir, full).build()
+        first = CommitLogGraph(interrupt_at=30)
+        with pytest.raises(Interrupted):
+            new_handler(tmp_dir, first).build()
+        second = CommitLogGraph()
+        new_handler(tmp_dir, second).build(resume=True)
+    # 中断前提交的批次不再执行，两次运行合起来恰好是一次完整导入
+    assert len(first.committed) == 29
+    assert sorted(map(repr, first.committed + second.committed)) == sorted(map(repr, full.committed))
+
+
+def test_fingerprint_mismatch_discards_checkpoint(tmp_path):
+    tmp_dir = str(tmp_path)
+    write_synthetic_data(os.path.join(tmp_dir, 'medical.json'), 100)
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = CommitLogGraph(interrupt_at=30)
+        with pytest.raises(Interrupted):
+            new_handler(tmp_dir, first).build()
+        # 批大小变化后批次划分不同，断点作废，从头导入
+        second = CommitLogGraph()
+        new_handler(tmp_dir, second, batch_size=11).build(resume=True)
+        full = CommitLogGraph()
+        new_handler(tmp_dir, full, batch_size=11).build()
+    assert sorted(map(repr, second.committed)) == sorted(map(repr, full.committed))
+
+
+def test_checkpoint_fingerprint(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    checkpoint = Checkpoint(path, {'data': 'a', 'batch_size': 10})
+    checkpoint.commit('Drug', 0)
+    checkpoint.commit('Disease-has_symptom->Symptom', '1.0.0')
+    with contextlib.redirect_stdout(io.StringIO()):
+        resumed = Checkpoint(path, {'data': 'a', 'batch_size': 10})
+        assert resumed.done('Drug', 0) and resumed.done('Disease-has_symptom->Symptom', '1.0.0')
+        assert not resumed.done('Drug', 1)
+        assert not Checkpoint(path, {'data': 'b', 'batch_size': 10}).done('Drug', 0)
+        assert not Checkpoint(path, {'data': 'a', 'batch_size': 10}, resume=False).done('Drug', 0)
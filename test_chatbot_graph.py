@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 问答主流程测试：熔断与本地兜底
+
+import asyncio
+import pytest
+import chatbot_graph
+import graph_engine
+from circuit_breaker import HALF_OPEN
+
+SQLS = [{'question_type': 'disease_symptom', 'entities': ['感冒'], 'sql': [('MATCH (m) RETURN m', {'names': ['感冒']})]}]
+
+
+class DownSearcher:
+    combined = False
+
+    def search_answers(self, sqls, timeout=None):
+        raise ConnectionError('neo4j unavailable')
+
+    def run_queries(self, queries):
+        raise ConnectionError('neo4j unavailable')
+
+
+class HangingSearcher:
+    """查询一直挂起，直到被取消"""
+    async def search_answers(self, sqls, timeout=None):
+        await asyncio.sleep(3600)
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    monkeypatch.setattr(chatbot_graph, 'AnswerSearcher', lambda combined=False: DownSearcher())
+    return chatbot_graph.ChatBotGraph(fallback=True)
+
+
+def test_missing_fallback_returns_default_answer(bot, monkeypatch, capsys):
+    def missing_data(*args):
+        raise FileNotFoundError('data/medical.json')
+    monkeypatch.setattr(graph_engine, 'get_engine', missing_data)
+    searched, degraded = bot.search_answers(SQLS)
+    assert degraded and searched == ['']
+    out = capsys.readouterr().out
+    # 原始的图谱错误与本地后端的错误都记录下来
+    assert 'neo4j unavailable' in out and 'medical.json' in out
+
+
+def test_cancelled_trial_releases_slot(bot):
+    breaker = bot.breaker
+    breaker.state = HALF_OPEN
+    breaker.half_open_calls = 1
+    bot.asearcher = HangingSearcher()
+
+    async def cancel_search():
+        task = asyncio.ensure_future(bot.asearch_answers(SQLS))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_search())
+    assert breaker.trial_calls == 0
+    assert breaker.allow()
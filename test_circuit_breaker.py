@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 熔断器测试：失败比例触发打开，探测恢复后半开放行有限次试探调用，试探失败重新打开
+
+import time
+import threading
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class Probe:
+    def __init__(self):
+        self.healthy = threading.Event()
+
+    def __call__(self):
+        if not self.healthy.is_set():
+            raise ConnectionError('neo4j unavailable')
+
+
+def new_breaker(probe):
+    return CircuitBreaker(probe, window=4, min_calls=4, failure_rate=0.5, slow_call=None,
+                          probe_interval=0.01, probe_successes=2, half_open_calls=2)
+
+
+def wait_for(breaker, state, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while breaker.stats()['state'] != state:
+        assert time.monotonic() < deadline, breaker.stats()
+        time.sleep(0.005)
+
+
+def test_open_half_open_close():
+    probe = Probe()
+    breaker = new_breaker(probe)
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(success, 0.0)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    probe.healthy.set()
+    wait_for(breaker, HALF_OPEN)
+    # 半开时只放行half_open_calls次试探调用
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True, 0.0)
+    assert breaker.state == HALF_OPEN
+    breaker.record(True, 0.0)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_with_one_prober():
+    probe = Probe()
+    breaker = new_breaker(probe)
+    for _ in range(4):
+        breaker.record(False, 0.0)
+    prober = breaker.prober
+    # 打开期间的调用结果不计入，也不会再启动探测线程
+    breaker.record(False, 0.0)
+    assert breaker.prober is prober
+    probe.healthy.set()
+    wait_for(breaker, HALF_OPEN)
+    prober.join(1.0)
+    probe.healthy.clear()
+    assert breaker.allow()
+    breaker.record(False, 0.0)
+    assert breaker.state == OPEN
+    assert breaker.stats()['trips'] == 2
+    assert [t.name for t in threading.enumerate()].count('neo4j-probe') == 1
+
+
+def test_released_trial_frees_slot():
+    probe = Probe()
+    probe.healthy.set()
+    breaker = new_breaker(probe)
+    for _ in range(4):
+        breaker.record(False, 0.0)
+    wait_for(breaker, HALF_OPEN)
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()
+    # 被取消的调用归还名额，之后的试探仍可关闭熔断
+    breaker.release()
+    breaker.release()
+    assert breaker.allow() and breaker.allow()
+    breaker.record(True, 0.0)
+    breaker.record(True, 0.0)
+    assert breaker.state == CLOSED
+
+
+def test_unreported_trials_reopen_after_timeout():
+    probe = Probe()
+    probe.healthy.set()
+    breaker = new_breaker(probe)
+    breaker.half_open_timeout = 0.05
+    for _ in range(4):
+        breaker.record(False, 0.0)
+    wait_for(breaker, HALF_OPEN)
+    # 两次试探都未报告结果
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert not breaker.allow()
+    assert breaker.state == OPEN and breaker.prober is not None
+    # 探测线程重新启动，恢复后再次半开
+    wait_for(breaker, HALF_OPEN)
+    assert breaker.allow()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 内存图谱测试：按Cypher模板的语义直接在边表上求值，与GraphEngine.query的结果行逐一比较
+
+import io
+import os
+import re
+import random
+import tempfile
+import contextlib
+from bench_import import write_synthetic_data
+from build_medicalgraph import MedicalGraph, NODE_LABELS, DISEASE_INFOS, RELATIONS
+from graph_engine import GraphEngine, LocalAnswerSearcher
+from question_parser import CYPHER_TEMPLATES, COLLECT_M, COLLECT_N
+
+# 模板中的关系匹配子句：(m:起点)-[r:类型|类型]->(n:终点) where 主体.name = name
+PATTERN = re.compile(r'MATCH \(m:(\w+)\)-\[r:([\w|]+)\]-(>?)\(n:(\w+)\) where (m|n)\.name = name$')
+LIMIT = 5
+
+_nodes = None
+
+
+def get_nodes():
+    global _nodes
+    if _nodes is None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            handler = MedicalGraph(connect=False, node_cache=False)
+            handler.data_path = write_synthetic_data(os.path.join(tmp_dir, 'medical.json'), 300)
+            with contextlib.redirect_stdout(io.StringIO()):
+                _nodes = handler.read_nodes()
+    return _nodes
+
+
+def label_names(nodes, label):
+    if label == 'Disease':
+        return {disease_dict['name'] for disease_dict in nodes[DISEASE_INFOS]}
+    return set(nodes[NODE_LABELS[label]])
+
+
+def evaluate_template(nodes, question_type, name, limit):
+    """按模板求值：匹配、按非聚合列分组、聚合列去重后按名称排序截取前limit个"""
+    (match,), columns = CYPHER_TEMPLATES[question_type]
+    if match == 'MATCH (m:Disease) where m.name = name':
+        return [{column: disease_dict[expr[2:]] for column, expr in columns}
+                for disease_dict in nodes[DISEASE_INFOS] if disease_dict['name'] == name]
+    start_label, rel_types, directed, end_label, subject = PATTERN.match(match).groups()
+    bindings = []
+    for start, rel_type, end, rel_name, index in RELATIONS:
+        if rel_type not in rel_types.split('|'):
+            continue
+        assert (start, end) == (start_label, end_label)
+        starts, ends = label_names(nodes, start), label_names(nodes, end)
+        for p, q in nodes[index]:
+            if p in starts and q in ends:
+                bindings.append({'m.name': p, 'n.name': q, 'r.name': rel_name})
+                if not directed:
+                    bindings.append({'m.name': q, 'n.name': p, 'r.name': rel_name})
+    groups = {}
+    for binding in bindings:
+        if binding[subject + '.name'] != name:
+            continue
+        key = tuple((column, binding[expr]) for column, expr in columns if expr not in (COLLECT_M, COLLECT_N))
+        collected = [column for column, expr in columns if expr in (COLLECT_M, COLLECT_N)][0]
+        groups.setdefault(key, set()).add(binding[collected])
+    return [dict(key, **{collected: sorted(names)[:limit]}) for key, names in groups.items()]
+
+
+def canonical(rows):
+    return sorted(repr(sorted(row.items())) for row in rows)
+
+
+def test_query_matches_templates():
+    nodes = get_nodes()
+    engine = GraphEngine.from_nodes(nodes)
+    rng = random.Random(0)
+    for question_type, ((match,), columns) in CYPHER_TEMPLATES.items():
+        pattern = PATTERN.match(match)
+        if pattern is None or pattern.group(5) == 'm':
+            candidates = sorted(label_names(nodes, 'Disease'))
+        else:
+            candidates = sorted(label_names(nodes, pattern.group(4)))
+        for name in rng.sample(candidates, 20) + ['不存在的实体']:
+            expected = evaluate_template(nodes, question_type, name, LIMIT)
+            assert canonical(engine.query(question_type, [name], LIMIT)) == canonical(expected), (question_type, name)
+
+
+def test_local_searcher_renders_answers():
+    engine = GraphEngine.from_nodes(get_nodes())
+    searcher = LocalAnswerSearcher(engine)
+    answers = searcher.search_answers([
+        {'question_type': 'disease_symptom', 'entities': ['疾病1']},
+        {'question_type': 'disease_cause', 'entities': ['不存在的疾病']},
+    ])
+    assert answers[0].startswith('疾病1的症状包括：')
+    assert not answers[1]
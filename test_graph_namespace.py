@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 图谱命名空间测试：标签与命名空间的互相转换，查询语句的标签改写
+
+from graph_namespace import GRAPH_LABELS, label_name, namespaced, namespace_of
+from question_parser import CYPHER_QUERIES
+
+NAMESPACES = ['', 'g0123456789ab', 'v2_test']
+
+
+def test_namespace_round_trip():
+    for namespace in NAMESPACES:
+        assert namespace_of(label_name('Disease', namespace)) == namespace
+        for label in GRAPH_LABELS:
+            if label != 'Disease':
+                assert namespace_of(label_name(label, namespace)) is None
+    assert namespace_of('DiseaseX') is None
+
+
+def test_namespaced_rewrites_labels_only():
+    query = "MATCH (m:Disease)-[r:has_symptom]->(n:Symptom) where m.name = 'Disease' RETURN m.name"
+    assert namespaced(query) is query
+    assert namespaced(query, 'g1') == "MATCH (m:Disease_g1)-[r:has_symptom]->(n:Symptom_g1) where m.name = 'Disease' RETURN m.name"
+    for question_type, query in CYPHER_QUERIES.items():
+        rewritten = namespaced(query, 'g1')
+        assert rewritten != query, question_type
+        for label in GRAPH_LABELS:
+            assert rewritten.count(':%s_g1' % label) == query.count(':%s' % label), question_type
+        assert rewritten.replace('_g1', '') == query
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 实体词典测试：最左最长片段消解与逐位置暴力查找的结果一致
+
+import random
+from medical_lexicon import EntityLexicon, WordMatcher, build_actree, build_wdtype_dict
+
+WORDS = {
+    'disease': ['乳腺癌', '癌症', '感冒', '病毒性感冒', '肺炎', '肺'],
+    'symptom': ['头痛', '痛', '发热', '癌'],
+    'food': ['鸡蛋', '蛋', '鸡'],
+}
+
+
+def reference_spans(words, question):
+    """逐位置取以该位置起始的最长词，命中后跳到词尾"""
+    spans = []
+    start = 0
+    while start < len(question):
+        match = max((wd for wd in words if question.startswith(wd, start)), key=len, default=None)
+        if match is None:
+            start += 1
+            continue
+        spans.append((start, start + len(match), match))
+        start += len(match)
+    return spans
+
+
+def new_lexicon(matcher=None):
+    wdtype_dict = build_wdtype_dict(WORDS)
+    lexicon = EntityLexicon(build_actree(list(wdtype_dict)), wdtype_dict)
+    if matcher is not None:
+        for index, word in enumerate(wdtype_dict):
+            matcher.add_word(word, (index, word))
+        matcher.make_automaton()
+        lexicon.region_tree = matcher
+    return lexicon
+
+
+def test_overlaps_resolved_leftmost_longest():
+    lexicon = new_lexicon()
+    assert [wd for _, _, wd, _ in lexicon.extract('乳腺癌症怎么办')] == ['乳腺癌']
+    assert [wd for _, _, wd, _ in lexicon.extract('病毒性感冒头痛')] == ['病毒性感冒', '头痛']
+    assert lexicon.extract('鸡蛋') == [(0, 2, '鸡蛋', ['food'])]
+    assert lexicon.group_by_type('肺炎和癌症，头痛') == {'disease': ['肺炎', '癌症'], 'symptom': ['头痛']}
+
+
+def test_extract_matches_reference():
+    rng = random.Random(0)
+    words = [wd for wds in WORDS.values() for wd in wds]
+    alphabet = ''.join(words) + '的了吗'
+    buffer = {}
+    for matcher in (None, WordMatcher()):
+        lexicon = new_lexicon(matcher)
+        for _ in range(2000):
+            question = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+            expected = reference_spans(words, question)
+            assert [span[:3] for span in lexicon.extract(question)] == expected, question
+            assert [span[:3] for span in lexicon.extract(question, buffer)] == expected, question
+
+
+def test_word_types_follow_dict_order():
+    assert build_wdtype_dict({'disease': ['感冒'], 'symptom': ['头痛', '感冒']}) == {'感冒': ['disease', 'symptom'], '头痛': ['symptom']}
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 并行建边测试：同一轮并发执行的各格起点桶、终点桶互不相同，不会同时写同一节点；轮与轮之间不重叠
+
+import io
+import random
+import threading
+import contextlib
+from bench_import import DryRunGraph, DryRunMedicalGraph
+from build_medicalgraph import partition
+
+
+class RoundRecorder(DryRunMedicalGraph):
+    """记录每一格开始与结束的顺序及其写入的行"""
+    def __init__(self, graph, batch_size, workers):
+        DryRunMedicalGraph.__init__(self, graph, batch_size, workers)
+        self.events = []
+        self.cells = {}
+        self.events_lock = threading.Lock()
+
+    def run_cell(self, name, query, batches, params=None):
+        start_bucket, end_bucket, _ = map(int, batches[0][0].split('.'))
+        cell = (start_bucket, end_bucket)
+        with self.events_lock:
+            self.events.append(('start', cell))
+            self.cells[cell] = [row for _, batch in batches for row in batch]
+        try:
+            return DryRunMedicalGraph.run_cell(self, name, query, batches, params)
+        finally:
+            with self.events_lock:
+                self.events.append(('end', cell))
+
+
+def new_rows(count, seed):
+    rng = random.Random(seed)
+    starts = ['疾病%d' % i for i in range(count // 4)]
+    ends = ['症状%d' % i for i in range(count // 3)]
+    return list({(rng.choice(starts), rng.choice(ends)): None for _ in range(count)})
+
+
+def test_round_cells_are_disjoint():
+    for workers in range(1, 7):
+        rows = [list(row) for row in new_rows(3000, workers)]
+        handler = RoundRecorder(DryRunGraph(), batch_size=50, workers=workers)
+        with contextlib.redirect_stdout(io.StringIO()):
+            handler.run_partitioned('Disease-has_symptom->Symptom', 'UNWIND $rows AS row RETURN row', rows)
+        # 每行恰好落在一格，且与按名称散列的桶一致
+        assert sorted(row for cell_rows in handler.cells.values() for row in cell_rows) == sorted(rows)
+        for (start_bucket, end_bucket), cell_rows in handler.cells.items():
+            assert all((partition(p, workers), partition(q, workers)) == (start_bucket, end_bucket) for p, q in cell_rows)
+        rounds = {}
+        for cell in handler.cells:
+            rounds.setdefault((cell[1] - cell[0]) % workers, []).append(cell)
+        for shift, cells in rounds.items():
+            assert len({start for start, _ in cells}) == len(cells)
+            assert len({end for _, end in cells}) == len(cells)
+            seen = set()
+            for cell in cells:
+                names = {name for row in handler.cells[cell] for name in row}
+                assert not names & seen, (workers, shift, cell)
+                seen |= names
+        # 下一轮的格在上一轮全部结束后才开始
+        order = [(kind, (cell[1] - cell[0]) % workers) for kind, cell in handler.events]
+        for shift in rounds:
+            later = [index for index, (kind, other) in enumerate(order) if kind == 'start' and other > shift]
+            ends = [index for index, (kind, other) in enumerate(order) if kind == 'end' and other == shift]
+            assert not later or max(ends) < min(later)
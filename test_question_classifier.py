@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# coding: utf-8
+# 问句分类测试：一次扫描得到的意图掩码与逐表查找疑问词的原实现结果一致
+
+import random
+from question_classifier import QuestionClassifier, QUESTION_WORDS, INTENT_BITS
+
+_classifier = None
+
+
+def get_classifier():
+    global _classifier
+    if _classifier is None:
+        _classifier = QuestionClassifier(use_snapshot=False)
+    return _classifier
+
+
+def check_words(wds, sent):
+    for wd in wds:
+        if wd in sent:
+            return True
+    return False
+
+
+def reference_question_types(classifier, question, types):
+    """原实现的规则链：每条规则逐个检查疑问词表"""
+    qwds = QUESTION_WORDS
+    deny_words = classifier.deny_words
+    question_types = []
+    if check_words(qwds['symptom_qwds'], question) and 'disease' in types:
+        question_types.append('disease_symptom')
+    if check_words(qwds['symptom_qwds'], question) and 'symptom' in types:
+        question_types.append('symptom_disease')
+    if check_words(qwds['cause_qwds'], question) and 'disease' in types:
+        question_types.append('disease_cause')
+    if check_words(qwds['acompany_qwds'], question) and 'disease' in types:
+        question_types.append('disease_acompany')
+    if check_words(qwds['food_qwds'], question) and 'disease' in types:
+        question_types.append('disease_not_food' if check_words(deny_words, question) else 'disease_do_food')
+    if check_words(qwds['food_qwds'] + qwds['cure_qwds'], question) and 'food' in types:
+        question_types.append('food_not_disease' if check_words(deny_words, question) else 'food_do_disease')
+    if check_words(qwds['drug_qwds'], question) and 'disease' in types:
+        question_types.append('disease_drug')
+    if check_words(qwds['cure_qwds'], question) and 'drug' in types:
+        question_types.append('drug_disease')
+    if check_words(qwds['check_qwds'], question) and 'disease' in types:
+        question_types.append('disease_check')
+    if check_words(qwds['check_qwds'] + qwds['cure_qwds'], question) and 'check' in types:
+        question_types.append('check_disease')
+    if check_words(qwds['prevent_qwds'], question) and 'disease' in types:
+        question_types.append('disease_prevent')
+    if check_words(qwds['lasttime_qwds'], question) and 'disease' in types:
+        question_types.append('disease_lasttime')
+    if check_words(qwds['cureway_qwds'], question) and 'disease' in types:
+        question_types.append('disease_cureway')
+    if check_words(qwds['cureprob_qwds'], question) and 'disease' in types:
+        question_types.append('disease_cureprob')
+    if check_words(qwds['easyget_qwds'], question) and 'disease' in types:
+        question_types.append('disease_easyget')
+    if question_types == [] and 'disease' in types:
+        question_types = ['disease_desc']
+    if question_types == [] and 'symptom' in types:
+        question_types = ['symptom_disease']
+    return question_types
+
+
+def test_intent_bits_cover_every_word():
+    classifier = get_classifier()
+    for name, words in QUESTION_WORDS.items():
+        for word in words:
+            assert classifier.check_intents('问' + word + '答') & INTENT_BITS[name], word
+    for word in classifier.deny_words:
+        assert classifier.check_intents(word) & INTENT_BITS['deny_words'], word
+
+
+def test_classify_matches_keyword_lists():
+    classifier = get_classifier()
+    rng = random.Random(0)
+    entities = sorted(classifier.wdtype_dict)
+    cue_words = [word for words in QUESTION_WORDS.values() for word in words] + list(classifier.deny_words)
+    for _ in range(5000):
+        parts = [rng.choice(entities)] + rng.sample(cue_words, rng.randint(0, 3))
+        rng.shuffle(parts)
+        question = '，'.join(parts)
+        data = classifier.classify(question)
+        if not data:
+            continue
+        types = [type_ for types in data['args'].values() for type_ in types]
+        assert data['question_types'] == reference_question_types(classifier, question, types), question
+
+
+def test_classify_many_reads_input_lazily():
+    classifier = get_classifier()
+    entities = sorted(classifier.wdtype_dict)[:50]
+    questions = ['%s有什么症状' % entity for entity in entities] + ['你好'] * 50
+    expected = [classifier.classify(question) for question in questions]
+    consumed = []
+
+    def stream():
+        for question in questions:
+            consumed.append(question)
+            yield question
+
+    assert list(classifier.classify_many(questions, report_every=0)) == expected
+    results = classifier.classify_many(stream(), processes=2, chunksize=4, report_every=0)
+    assert next(results) == expected[0]
+    # 取到第一条结果时最多读入 进程数*2 块
+    assert len(consumed) <= 2 * 2 * 4
+    assert [expected[0]] + list(results) == expected
+    assert classifier.batch_stats['count'] == len(questions)
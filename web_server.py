@@ -7,18 +7,15 @@ import json
 import os
 import re
 from datetime import datetime
+from medical_lexicon import get_lexicon
 
 app = Flask(__name__)
 
 class MedicalQuestionClassifier:
     """医疗问题分类器"""
     def __init__(self):
-        # 加载词典
-        self.disease_words = self.load_dict('dict/disease.txt')
-        self.symptom_words = self.load_dict('dict/symptom.txt')
-        self.drug_words = self.load_dict('dict/drug.txt')
-        self.food_words = self.load_dict('dict/food.txt')
-        self.check_words = self.load_dict('dict/check.txt')
+        # 共享实体词典（多模式匹配自动机，覆盖疾病、症状、药品、食物、检查等全部实体类型）
+        self.lexicon = get_lexicon()
         
         # 疑问词
         self.symptom_qwds = ['症状', '表征', '现象', '症候', '表现', '有哪些']
@@ -26,20 +23,6 @@ class MedicalQuestionClassifier:
         self.desc_qwds = ['是什么', '介绍', '描述', '说明']
         self.cure_qwds = ['治疗', '怎么治', '如何治', '怎么办', '多久', '周期', '治愈']
         
-    def load_dict(self, file_path):
-        """加载词典文件"""
-        words = []
-        try:
-            full_path = os.path.join(os.path.dirname(__file__), file_path)
-            with open(full_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    word = line.strip()
-                    if word:
-                        words.append(word)
-        except Exception as e:
-            print(f"加载词典 {file_path} 失败: {e}")
-        return words
-    
     def classify(self, question):
         """分类问题"""
         data = {}
@@ -75,24 +58,8 @@ class MedicalQuestionClassifier:
         return data
     
     def check_medical(self, question):
-        """检查问题中的医疗实体"""
-        medical_dict = {}
-        
-        # 检查疾病
-        for disease in self.disease_words:
-            if disease in question:
-                if 'disease' not in medical_dict:
-                    medical_dict['disease'] = []
-                medical_dict['disease'].append(disease)
-        
-        # 检查症状
-        for symptom in self.symptom_words:
-            if symptom in question:
-                if 'symptom' not in medical_dict:
-                    medical_dict['symptom'] = []
-                medical_dict['symptom'].append(symptom)
-        
-        return medical_dict
+        """检查问题中的医疗实体，返回{实体类型: [实体, ...]}"""
+        return self.lexicon.group_by_type(question)
     
     def check_words_in_question(self, words, question):
         """检查问题中是否包含特定词汇"""
@@ -282,13 +249,13 @@ def build_knowledge_graph():
             else:
                 return jsonify({
                     'status': 'warning',
-                    'message': '知识图谱构建需要1-2小时，建议在命令行中运行',
+                    'message': '知识图谱构建需要数分钟，建议在命令行中运行',
                     'command': 'python3 build_medicalgraph.py',
                     'data': {
                         'diseases': 8807,
                         'symptoms': 5998,
                         'relationships': '300K+',
-                        'estimated_time': '1-2小时'
+                        'estimated_time': '数分钟'
                     }
                 })
         except Exception as e: